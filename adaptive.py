@@ -0,0 +1,48 @@
+from collections import namedtuple
+
+import dimod
+
+from analysis import ResultAnalysis, aggregate, wilson_interval
+from qca_on_qpu import anneal
+from sweep import state_seed
+
+# Adaptive sampling: instead of a fixed number of reads for every input state,
+# reads are taken `chunk` at a time until the estimates the run reports are
+# known well enough. Those are the fraction of reads that found the ground state
+# and the fraction in which each output was +1, and each is known well enough
+# once its 95% confidence interval is narrower than `width`. Easy input states,
+# where (nearly) every read agrees, stop after a chunk or two; hard ones keep
+# going up to the run's sample limit.
+AdaptiveSampling = namedtuple('AdaptiveSampling', ['chunk', 'width', 'outputs'])
+
+def interval_width(analysis):
+    '''The widest 95% confidence interval on the ground state occupancy and
+    the output marginals of a ResultAnalysis.'''
+    total = analysis.num_reads
+    counts = [analysis.occupancy(analysis.ground_state())] + list(analysis.marginals().values())
+    return max(upper - lower for (lower, upper) in (wilson_interval(count, total) for count in counts))
+
+def anneal_adaptive(cells, drivers, adaptive, max_samples = 500, bqm = None, seed = None, session = None, qpu_arch = 'classical',
+                    initial_state = None):
+    '''Anneal in chunks of `adaptive.chunk` reads until interval_width of all
+    the reads so far is under `adaptive.width`, or `max_samples` reads have
+    been taken. Every chunk starts from `initial_state`, if one is given (see
+    anneal). Returns every read in one aggregated response, whose info
+    holds the number of reads taken ('effective_samples') and whether the
+    intervals got narrow enough ('converged').'''
+
+    responses = []
+    taken = 0
+    converged = False
+    while taken < max_samples and not converged:
+        samples = min(adaptive.chunk, max_samples - taken)
+        # Each chunk is seeded apart from the others.
+        responses.append(anneal(cells, drivers, samples=samples, qpu_arch=qpu_arch, bqm=bqm,
+                                seed=state_seed(seed, len(responses)), session=session, initial_state=initial_state))
+        taken += samples
+
+        response = aggregate(dimod.concatenate(responses)) if len(responses) > 1 else responses[0]
+        converged = interval_width(ResultAnalysis(response, adaptive.outputs)) < adaptive.width
+
+    response.info.update(effective_samples=taken, converged=converged)
+    return response
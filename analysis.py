@@ -0,0 +1,132 @@
+import numpy as np
+import dimod
+
+from packed import PackedSamples
+
+def aggregate(response):
+    '''Merge identical samples in a SampleSet, summing their num_occurrences,
+    and sort the result by energy (lowest first). This turns neal's one row
+    per read into the tallied, sorted format the QPU returns.
+
+    Rows are deduplicated by packing each one's spins into bits (see
+    PackedSamples) and running np.unique over the packed bytes, so this scales to 100k+ reads without any
+    per-row Python. Any other per-sample vectors (e.g. chain_break_fraction) are
+    taken from the first occurrence of each sample.'''
+
+    record = response.record
+    if len(record) == 0:
+        return response
+    if record.sample.shape[1] == 0:
+        # With no variables every read is the same (empty) sample, at the
+        # BQM's constant energy, which packed keys can't tell apart from no
+        # reads at all.
+        vectors = {name: record[name][:1] for name in record.dtype.names if name not in ('sample', 'energy', 'num_occurrences')}
+        return dimod.SampleSet.from_samples((record.sample[:1], list(response.variables)), response.vartype,
+                                            energy=record.energy[:1], num_occurrences=[record.num_occurrences.sum()],
+                                            info=response.info, **vectors)
+
+    first, inverse = PackedSamples.from_spins(record.sample).unique()
+    occurrences = np.bincount(inverse, weights=record.num_occurrences).astype(record.num_occurrences.dtype)
+
+    order = np.argsort(record.energy[first], kind='stable')
+    first = first[order]
+    occurrences = occurrences[order]
+
+    vectors = {name: record[name][first] for name in record.dtype.names if name not in ('sample', 'energy', 'num_occurrences')}
+    return dimod.SampleSet.from_samples((record.sample[first], list(response.variables)), response.vartype,
+                                        energy=record.energy[first], num_occurrences=occurrences,
+                                        info=response.info, **vectors)
+
+def wilson_interval(count, total, z = 1.96):
+    '''The Wilson score interval (lower, upper) on the probability of an event
+    seen `count` times in `total` reads, at z standard deviations (95% by
+    default). Unlike the normal approximation it stays honest at 0% and 100%,
+    which is where most rows of a truth table sit.'''
+    if total == 0:
+        return (0.0, 1.0)
+    p = count / total
+    denominator = 1 + z ** 2 / total
+    centre = (p + z ** 2 / (2 * total)) / denominator
+    half = z * np.sqrt(p * (1 - p) / total + z ** 2 / (4 * total ** 2)) / denominator
+    return (max(0.0, centre - half), min(1.0, centre + half))
+
+class ResultAnalysis:
+    '''Statistics of one anneal's response, computed with array operations on
+    its record.
+
+    Works the same whether the response is aggregated and sorted (as from the
+    QPU) or holds one row per read (as from neal): every count is weighted by
+    num_occurrences, and the ground state is found by energy rather than by
+    position in the record.
+
+    Samples are kept bit-packed (see PackedSamples), which is what its
+    comparisons and counts work on.'''
+
+    def __init__(self, response, outputs):
+        '''inputs:
+            response : a dimod SampleSet
+            outputs  : output name -> variable (cell position) mapping
+        '''
+
+        record = response.record
+        self.variables = list(response.variables)
+        self.samples = PackedSamples.from_spins(record.sample)
+        self.energies = record.energy
+        self.occurrences = record.num_occurrences
+
+        # Look every output's column up once.
+        column = {v: i for (i, v) in enumerate(self.variables)}
+        self.outputs = list(outputs)
+        self.output_columns = np.array([column[pos] for pos in outputs.values()], dtype=np.int64)
+        self.output_samples = self.samples.columns(self.output_columns)
+
+    @property
+    def num_reads(self):
+        return int(self.occurrences.sum())
+
+    def ground_state(self):
+        '''Row index of the lowest energy sample.'''
+        return int(np.argmin(self.energies))
+
+    def occupancy(self, row):
+        '''The number of reads that landed in the same state as `row`.'''
+        return int(self.occurrences[self.samples.equal_to(row)].sum())
+
+    def outputs_of(self, row):
+        '''Output name -> value for the sample in `row`.'''
+        return dict(zip(self.outputs, self.output_samples[row]))
+
+    def state_of(self, row):
+        '''Variable -> value for the sample in `row`.'''
+        return dict(zip(self.variables, self.samples.spins(row)))
+
+    def marginals(self):
+        '''Output name -> the number of reads in which that output was +1.'''
+        counts = self.occurrences @ (self.output_samples == 1)
+        return dict(zip(self.outputs, (int(c) for c in counts)))
+
+    def cell_marginals(self):
+        '''Variable -> the number of reads in which that cell was +1.'''
+        counts = self.samples.popcount(self.occurrences)
+        return dict(zip(self.variables, (int(c) for c in counts)))
+
+    def broken_state(self, ground_row=None):
+        '''Row index of the most common sample whose outputs differ from the
+        ground state's, breaking ties by energy. None if every read gave the
+        ground state's outputs.'''
+
+        if ground_row is None:
+            ground_row = self.ground_state()
+
+        broken = np.any(self.output_samples != self.output_samples[ground_row], axis=1)
+        candidates = np.nonzero(broken)[0]
+        if candidates.size == 0:
+            return None
+
+        # Most common first; among equally common samples, lowest energy first.
+        # A sample may be spread over several rows (if the response wasn't
+        # aggregated), so it is counted over all of them.
+        _, inverse = self.samples.unique()
+        counts = np.bincount(inverse, weights=self.occurrences)
+        best = np.lexsort((self.energies[candidates], -counts[inverse[candidates]]))[0]
+        return int(candidates[best])
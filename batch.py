@@ -0,0 +1,43 @@
+import numpy as np
+import dimod
+
+from analysis import aggregate as aggregate_samples
+
+# Runs a whole truth table as one problem. Every input state's BQM is placed side
+# by side, as a disjoint copy, inside one larger BQM whose variables are labelled
+# (input_state, cell). A single anneal of that BQM samples every row at once, and
+# pays the QPU's queue and programming overhead once rather than 2 ** k times.
+# The response is then split back out into one SampleSet per input state.
+
+def batched_bqm(model, input_states):
+    '''Combine the BQMs of `input_states` (from a CircuitModel) into one.'''
+    combined = dimod.BinaryQuadraticModel(dimod.SPIN)
+    for input_state in input_states:
+        (bqm, _, _) = model.assign(input_state)
+        combined.update(bqm.relabel_variables({v: (input_state, v) for v in bqm.variables}, inplace=False))
+    return combined
+
+def split_response(response, model, input_states, aggregate = False):
+    '''Split the response to a batched_bqm into a list of SampleSets, one per
+    input state, each labelled and scored as if its BQM had been sampled alone.
+
+    Each joint read is one read of every state, so the per-state SampleSets keep
+    the joint num_occurrences. With `aggregate`, identical samples are merged and
+    the result sorted by energy, which is the format the QPU returns.'''
+
+    column = {v: i for (i, v) in enumerate(response.variables)}
+    record = response.record
+
+    split = []
+    for input_state in input_states:
+        (bqm, _, _) = model.assign(input_state)
+        labels = list(bqm.variables)
+        columns = np.array([column[(input_state, v)] for v in labels], dtype=np.int64)
+        samples = record.sample[:, columns]
+
+        sampleset = dimod.SampleSet.from_samples_bqm((samples, labels), bqm, num_occurrences=record.num_occurrences, info=response.info)
+        if aggregate:
+            sampleset = aggregate_samples(sampleset)
+        split.append(sampleset)
+
+    return split
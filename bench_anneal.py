@@ -0,0 +1,64 @@
+import argparse
+import time
+import numpy as np
+import neal
+
+from load_qca import load_qca, assign_inputs
+from qca_on_qpu import construct_bqm
+from metropolis import MetropolisSampler
+from exact import EliminationSolver
+import synthetic
+
+parser = argparse.ArgumentParser(
+                    prog='bench_anneal',
+                    description="times the colour-class Metropolis annealer against neal on the repo's designs and on synthetic wires and grids.",
+                    epilog='i.e. python3 bench_anneal.py --reads 1000 --sizes 1000 10000')
+
+parser.add_argument('--designs', nargs='+', default=['validation/wire/wire.qca', 'validation/notgate/notgate.qca', 'validation/majority/majority.qca',
+                                                     'sparse XOR/unclocked/design.qca', 'dense XOR/unclocked/design.qca']) # The qca files to benchmark
+parser.add_argument('--sizes', type=int, nargs='*', default=[1000, 10000]) # Cell counts of the synthetic wires and grids
+parser.add_argument('--reads', type=int, default=1000) # Reads per design
+parser.add_argument('--seed', type=int, default=1) # Seeds both annealers
+
+def circuits(args):
+    # (name, bqm) for every design (with its inputs all at their last state)
+    # and synthetic layout. Synthetic layouts get fewer reads, as they are big.
+    for design in args.designs:
+        cells, drivers, inputs, _ = load_qca(design)
+        all_drivers, _ = assign_inputs(drivers, inputs, 2 ** len(inputs) - 1)
+        yield design, construct_bqm(cells, all_drivers), args.reads
+    for layout in ['wire', 'grid']:
+        for n in args.sizes:
+            cells, drivers, inputs, _ = getattr(synthetic, layout)(n)
+            all_drivers, _ = assign_inputs(drivers, inputs, 1)
+            yield f"{layout} {n}", construct_bqm(cells, all_drivers), max(1, args.reads * 100 // n)
+
+def reference_energy(bqm):
+    # The exact ground state energy, if the circuit is thin enough to find it.
+    try:
+        return EliminationSolver().sample(bqm).first.energy
+    except ValueError:
+        return None
+
+def run(sampler, bqm, reads, seed):
+    start = time.perf_counter()
+    response = sampler.sample(bqm, num_reads=reads, seed=seed)
+    return time.perf_counter() - start, response.record.energy
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    # Ground state hits are against the exact ground state, or failing that the
+    # lowest energy either annealer found.
+    print(f"{'circuit':<34}{'cells':>7}{'reads':>7}{'neal (reads/s)':>16}{'metropolis (reads/s)':>22}{'speedup':>9}{'neal hits':>11}{'metropolis hits':>17}")
+    for (name, bqm, reads) in circuits(args):
+        neal_time, neal_energies = run(neal.SimulatedAnnealingSampler(), bqm, reads, args.seed)
+        metropolis_time, metropolis_energies = run(MetropolisSampler(), bqm, reads, args.seed)
+
+        ground = reference_energy(bqm)
+        if ground is None:
+            ground = min(neal_energies.min(), metropolis_energies.min())
+        hits = [np.mean(np.isclose(energies, ground)) for energies in (neal_energies, metropolis_energies)]
+
+        print(f"{name:<34}{len(bqm):>7}{reads:>7}{reads / neal_time:>16.1f}{reads / metropolis_time:>22.1f}"
+              f"{neal_time / metropolis_time:>8.1f}x{hits[0]:>11.3f}{hits[1]:>17.3f}")
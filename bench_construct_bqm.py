@@ -0,0 +1,73 @@
+import argparse
+import time
+import numpy as np
+import dimod
+
+from load_qca import assign_inputs
+from qca_on_qpu import construct_bqm, construct_bqm_arrays, Ek0
+import synthetic
+
+parser = argparse.ArgumentParser(
+                    prog='bench_construct_bqm',
+                    description='times construct_bqm and construct_bqm_arrays on synthetic wires and grids, against the old pairwise scan.',
+                    epilog='i.e. python3 bench_construct_bqm.py --sizes 1000 10000 100000 --pairwise-max 2000')
+
+parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000]) # Cell counts to benchmark
+parser.add_argument('--pairwise-max', type=int, default=2000, dest='pairwise_max') # Largest size the O(n^2) scan is run at
+parser.add_argument('--repeats', type=int, default=3) # Best-of count for each timing
+
+def construct_bqm_pairwise(cells, drivers):
+    # The original all-pairs construction, kept here as the reference that the
+    # neighbour index has to reproduce exactly. Only the quadratic part was
+    # quadratic in cost, so the linear terms are shared with construct_bqm.
+    linear = dict(construct_bqm(cells, drivers).linear)
+    quadratic = {}
+    cell_order = list(cells)
+    rotated = dict(zip(cell_order, cells.rot.tolist()))
+    for (i, pos_i) in enumerate(cells):
+        rot_i = rotated[pos_i]
+        for j in range(i+1, len(cells)):
+            pos_j = cell_order[j]
+            if rotated[pos_j] != rot_i:
+                continue
+            relationship = -1 if rot_i else 1
+            r = np.linalg.norm(np.array(pos_i) - np.array(pos_j))
+            if (r > 0.99 and r < 1.01) or (r > 1.99 and r < 2.01):
+                quadratic[(pos_i, pos_j)] = -Ek0 / r ** 5 * relationship
+            elif r > 1.4 and r < 1.42:
+                quadratic[(pos_i, pos_j)] = Ek0 / r ** 5 * relationship
+
+    return dimod.BinaryQuadraticModel(linear, quadratic, 0, dimod.SPIN)
+
+def best_time(f, repeats):
+    best = None
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = f()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    print(f"{'layout':<8}{'cells':>9}{'couplings':>11}{'indexed (s)':>14}{'arrays (s)':>13}{'pairwise (s)':>15}{'speedup':>10}")
+    for layout in ['wire', 'grid']:
+        for n in args.sizes:
+            cells, drivers, inputs, _ = getattr(synthetic, layout)(n)
+            all_drivers, _ = assign_inputs(drivers, inputs, 1)
+
+            indexed, bqm = best_time(lambda: construct_bqm(cells, all_drivers), args.repeats)
+            # tests/test_construct_bqm.py checks that both builders agree.
+            arrays, _ = best_time(lambda: construct_bqm_arrays(cells, all_drivers), args.repeats)
+
+            pairwise = None
+            if n <= args.pairwise_max:
+                pairwise, reference = best_time(lambda: construct_bqm_pairwise(cells, all_drivers), 1)
+                assert list(bqm.variables) == list(reference.variables)
+                assert bqm == reference, 'neighbour index disagrees with the pairwise scan'
+
+            pairwise_str = f"{pairwise:.4f}" if pairwise is not None else "skipped"
+            speedup_str = f"{pairwise / arrays:.1f}x" if pairwise is not None else "-"
+            print(f"{layout:<8}{n:>9}{bqm.num_interactions:>11}{indexed:>14.4f}{arrays:>13.4f}{pairwise_str:>15}{speedup_str:>10}")
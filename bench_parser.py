@@ -0,0 +1,54 @@
+import argparse
+import os
+import tempfile
+import time
+
+from qcadtrans import QCACircuit
+from qcastream import iter_cells
+from load_qca import parse_qca
+import synthetic
+
+parser = argparse.ArgumentParser(
+                    prog='bench_parser',
+                    description='times the streaming QCADesigner parser against the QCACircuit tree parser on synthetic designs.',
+                    epilog='i.e. python3 bench_parser.py --sizes 1000 10000 100000')
+
+parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000]) # Cell counts to benchmark
+parser.add_argument('--tree-max', type=int, default=100000, dest='tree_max') # Largest size the tree parser is run at
+
+def tree_cells(filename):
+    circuit = QCACircuit(fname=filename, verbose=False)
+    return [circuit.nodes[i] for i in range(len(circuit.nodes))]
+
+def stream_cells(filename):
+    return list(iter_cells(filename))
+
+def timed(f, *args):
+    start = time.perf_counter()
+    result = f(*args)
+    return time.perf_counter() - start, result
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    print(f"{'cells':>9}{'file (MB)':>11}{'tree (s)':>11}{'stream (s)':>12}{'parse_qca (s)':>14}{'speedup':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        for n in args.sizes:
+            filename = os.path.join(directory, f'grid{n}.qca')
+            synthetic.write_qca(filename, *synthetic.grid(n))
+            size = os.path.getsize(filename) / 1e6
+
+            stream, records = timed(stream_cells, filename)
+            load, _ = timed(parse_qca, filename)
+
+            tree = None
+            if n <= args.tree_max:
+                tree, nodes = timed(tree_cells, filename)
+                assert len(nodes) == len(records)
+                for (node, record) in zip(nodes, records):
+                    assert all(node[k] == getattr(record, k) for k in ['x', 'y', 'cf', 'pol', 'rot', 'dots', 'name']), \
+                        'streaming parser disagrees with the tree parser'
+
+            tree_str = f"{tree:.3f}" if tree is not None else "skipped"
+            speedup_str = f"{tree / stream:.1f}x" if tree is not None else "-"
+            print(f"{n + 1:>9}{size:>11.1f}{tree_str:>11}{stream:>12.3f}{load:>14.3f}{speedup_str:>10}")
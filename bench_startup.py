@@ -0,0 +1,58 @@
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+parser = argparse.ArgumentParser(
+                    prog='bench_startup',
+                    description='times the start-up of main.py in each of its modes, and how much of it is spent importing modules.',
+                    epilog='i.e. python3 bench_startup.py --design validation/wire/wire.qca --repeats 5')
+
+parser.add_argument('--design', default='validation/wire/wire.qca') # The qca file that each mode is run on
+parser.add_argument('--repeats', type=int, default=3) # Best-of count for each timing
+
+def modes(design, directory):
+    # Each mode's command line. QPU runs need a D-Wave token, so for those only
+    # the imports that a QPU run adds are timed.
+    save = os.path.join(directory, 'state %s.png')
+    return {
+        'help': ['main.py', '--help'],
+        'only-plot': ['main.py', design, '--only-plot', '--save', os.path.join(directory, 'circuit.png')],
+        'no-plot': ['main.py', design, '--no-plot', '--samples', '10', '--seed', '1'],
+        'plot': ['main.py', design, '--samples', '10', '--seed', '1', '--save', save],
+        'qpu imports': ['-c', 'import main, sweep, analysis; import dwave.system, minorminer'],
+    }
+
+def run(command, importtime = False):
+    env = dict(os.environ, MPLBACKEND='Agg')
+    flags = ['-X', 'importtime'] if importtime else []
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable] + flags + command, env=env, capture_output=True, text=True, check=True)
+    return time.perf_counter() - start, result.stderr
+
+def import_stats(stderr):
+    # -X importtime lines are "import time: self | cumulative | name", with the
+    # name indented by its depth. Top-level imports' cumulative times add up to
+    # the total.
+    total = 0
+    count = 0
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        count += 1
+        if not name.startswith('  '):
+            total += int(cumulative)
+    return total / 1e6, count
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    print(f"{'mode':<13}{'wall (s)':>10}{'imports (s)':>13}{'modules':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        for (mode, command) in modes(args.design, directory).items():
+            wall = min(run(command)[0] for _ in range(args.repeats))
+            imports, count = import_stats(run(command, importtime=True)[1])
+            print(f"{mode:<13}{wall:>10.3f}{imports:>13.3f}{count:>9}")
@@ -0,0 +1,288 @@
+import argparse
+import glob
+import json
+import math
+import os
+import re
+import sys
+import tempfile
+import time
+from functools import partial
+import numpy as np
+
+from load_qca import parse_qca, assign_inputs
+from circuit_model import CircuitModel
+from qca_on_qpu import anneal
+from analysis import ResultAnalysis
+from session import SamplerSession
+from sweep import state_seed
+from exact import EliminationSolver
+import synthetic
+
+# The benchmark and regression suite. Every bundled design, and synthetic wires
+# and majority gate arrays at growing sizes, is run through each local backend
+# with fixed seeds, recording:
+#
+#   parse     the time to parse the .qca file (synthetic layouts are written out
+#             to one first, so that they are parsed the same way);
+#   build     the time to compile the CircuitModel and assign every input state;
+#   reads/s   reads per second of sampling, over the whole truth table (the
+#             total time spent sampling is what is checked for regressions).
+#             The exact solver returns each ground state once rather than
+#             taking reads, so it has no rate, only a TTS;
+#   TTS       the time to solution: the expected time to see every input
+#             state's ground state with 99% confidence, summed over the states;
+#   occupancy the fraction of reads in the ground state, averaged over the
+#             input states, against the exact ground state energy;
+#   outputs   whether every input state's lowest energy sample has the right
+#             outputs: those of the design's stats.txt if it has one, or else
+#             the exact solver's (where its ground state is unique).
+#
+# Results are compared against the baselines in --baseline (written with
+# --update, which replaces the baselines of the cases it ran and keeps the
+# rest). A case regresses if its outputs are wrong, its occupancy drops by more
+# than --occupancy-tolerance, or it gets more than --time-tolerance
+# (relatively) slower. Timings are for the machine the baselines were made on,
+# so rebuild them with --update on a new machine. Exits with status 1 if
+# anything regressed.
+
+parser = argparse.ArgumentParser(
+                    prog='bench_suite',
+                    description="benchmarks the repo's designs and synthetic layouts on the local backends, and checks them against stored baselines.",
+                    epilog='i.e. python3 bench_suite.py --update, then python3 bench_suite.py after a change')
+
+parser.add_argument('--designs', nargs='*') # The qca files to run (every bundled design by default)
+parser.add_argument('--wires', type=int, nargs='*', default=[100, 1000]) # Cell counts of the synthetic wires
+parser.add_argument('--grids', type=int, nargs='*', default=[2, 4]) # Sizes N of the synthetic N x N majority gate arrays
+parser.add_argument('--backends', nargs='+', default=['classical', 'metropolis', 'tempering', 'exact']) # The local backends (--arch values) to run
+parser.add_argument('--reads', type=int, default=200) # Reads per input state
+parser.add_argument('--seed', type=int, default=1) # Seeds every backend
+parser.add_argument('--repeats', type=int, default=3) # Best-of count for every timing
+parser.add_argument('--baseline', default='bench_baseline.json') # The stored baselines
+parser.add_argument('--update', action='store_true') # Writes this run's results as the new baselines of its cases instead of checking them
+parser.add_argument('--time-tolerance', type=float, default=1.0, dest='time_tolerance') # Allowed relative slowdown (1.0 allows twice as slow)
+parser.add_argument('--occupancy-tolerance', type=float, default=0.1, dest='occupancy_tolerance') # Allowed drop in ground state occupancy
+
+# Timings this close to their baselines (in seconds) are never regressions, as
+# they are within the noise of timing anything that short.
+TIME_SLACK = 0.005
+
+# The confidence that time to solution is measured at.
+TTS_CONFIDENCE = 0.99
+
+def bundled_designs():
+    return sorted(glob.glob('validation/*/*.qca') + glob.glob('crossovers/*.qca') +
+                  glob.glob('sparse XOR/*/*.qca') + glob.glob('dense XOR/*/*.qca'))
+
+def read_stats(filename):
+    '''The ground state outputs recorded in a main.py stats.txt: state name ->
+    {output name: value}.'''
+    expected = {}
+    state = None
+    output = None
+    with open(filename) as fp:
+        for line in fp:
+            match = re.match(r'=+ State (.*?) =+$', line.strip())
+            if match:
+                state = match.group(1)
+                expected[state] = {}
+            match = re.match(r"output '(.*)':$", line.strip())
+            if match:
+                output = match.group(1)
+            match = re.match(r'Ground state configuration: (-?1)$', line.strip())
+            if match:
+                expected[state][output] = int(match.group(1))
+    return expected
+
+def cases(args, directory):
+    # (name, filename, stats) for every design and synthetic layout, the
+    # synthetic ones written out to `directory`. stats is the expected outputs
+    # by state name, or None.
+    for design in (args.designs if args.designs is not None else bundled_designs()):
+        stats = os.path.join(os.path.dirname(design), 'stats.txt')
+        yield design, design, read_stats(stats) if os.path.exists(stats) else None
+    layouts = [(f'wire {n}', synthetic.wire(n)) for n in args.wires] + \
+              [(f'majority grid {n}x{n}', synthetic.majority_grid(n)) for n in args.grids]
+    for (name, layout) in layouts:
+        filename = os.path.join(directory, name.replace(' ', '_') + '.qca')
+        synthetic.write_qca(filename, *layout)
+        yield name, filename, None
+
+def best_of(repeats, f, *args):
+    best = math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = f(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def build(cells, drivers, inputs):
+    model = CircuitModel(cells, drivers, inputs)
+    for input_state in range(2 ** len(inputs)):
+        model.assign(input_state)
+    return model
+
+def references(model, outputs):
+    # Every input state's exact ground state energy and (if it is the only
+    # ground state) outputs, or Nones where the circuit is too wide for that.
+    energies, ground_outputs = [], []
+    for input_state in range(2 ** len(model.inputs)):
+        (bqm, _, _) = model.assign(input_state)
+        try:
+            response = EliminationSolver().sample(bqm)
+        except ValueError:
+            energies.append(None)
+            ground_outputs.append(None)
+            continue
+        energies.append(response.first.energy)
+        unique = response.info['degeneracy'] == 1
+        ground_outputs.append(ResultAnalysis(response, outputs).outputs_of(0) if unique else None)
+    return energies, [{name: int(value) for (name, value) in state.items()} if state is not None else None for state in ground_outputs]
+
+def time_to_solution(seconds_per_read, occupancy):
+    # The expected time for at least one read to reach the ground state with
+    # TTS_CONFIDENCE, given that each does with probability `occupancy`.
+    if occupancy >= 1:
+        return seconds_per_read
+    if occupancy <= 0:
+        return math.inf
+    return seconds_per_read * math.log(1 - TTS_CONFIDENCE) / math.log(1 - occupancy)
+
+def run_backend(model, outputs, backend, args, ground_energies, expected_outputs):
+    '''Sample every input state of `model` on `backend`, and return its
+    metrics (or None if the backend can't run it).'''
+    sampling = 0.0
+    reads = 0
+    occupancies = []
+    tts = 0.0
+    correct = True
+    single_read = False
+    with SamplerSession(backend) as session:
+        for input_state in range(2 ** len(model.inputs)):
+            (bqm, all_drivers, _) = model.assign(input_state)
+            # Every repeat is seeded the same, so gives the same response.
+            try:
+                solve = partial(anneal, model.cells, all_drivers, samples=args.reads, bqm=bqm, seed=state_seed(args.seed, input_state), session=session)
+                elapsed, response = best_of(args.repeats, solve)
+            except ValueError:
+                # Too wide for the exact solver.
+                return None
+
+            # The exact solver returns a ground state and their count, not reads.
+            single_read = 'degeneracy' in response.info
+            analysis = ResultAnalysis(response, outputs)
+            row = analysis.ground_state()
+            ground = ground_energies[input_state]
+            if ground is None:
+                ground = analysis.energies[row]
+            occupancy = float(analysis.occurrences[np.isclose(analysis.energies, ground)].sum() / analysis.num_reads)
+
+            sampling += elapsed
+            reads += analysis.num_reads
+            occupancies.append(occupancy)
+            if single_read:
+                # One solve finds the ground state, however many there are.
+                tts += elapsed
+            else:
+                tts += time_to_solution(elapsed / analysis.num_reads, occupancy)
+            if expected_outputs[input_state] is not None:
+                found = {name: int(value) for (name, value) in analysis.outputs_of(row).items()}
+                correct = correct and found == expected_outputs[input_state]
+
+    return {'sample_s': sampling, 'reads_per_s': None if single_read else reads / sampling, 'tts': tts if math.isfinite(tts) else None,
+            'occupancy': float(np.mean(occupancies)), 'outputs_ok': correct}
+
+def run_case(filename, stats, args):
+    parse_time, (cells, drivers, inputs, outputs) = best_of(args.repeats, parse_qca, filename)
+    build_time, model = best_of(args.repeats, build, cells, drivers, inputs)
+
+    ground_energies, exact_outputs = references(model, outputs)
+    expected_outputs = exact_outputs
+    if stats is not None:
+        expected_outputs = [stats.get(assign_inputs(drivers, inputs, input_state)[1]) for input_state in range(2 ** len(inputs))]
+
+    result = {'cells': len(cells), 'states': 2 ** len(inputs), 'parse_s': parse_time, 'build_s': build_time, 'backends': {}}
+    for backend in args.backends:
+        metrics = run_backend(model, outputs, backend, args, ground_energies, expected_outputs)
+        if metrics is not None:
+            result['backends'][backend] = metrics
+    return result
+
+def slower(value, baseline, tolerance):
+    # Whether `value` (a time) regressed from `baseline`. None is an infinite
+    # time (e.g. a TTS that never reached the ground state).
+    if baseline is None:
+        return False
+    if value is None:
+        return True
+    return value > baseline * (1 + tolerance) + TIME_SLACK
+
+def regressions(name, result, baseline, args):
+    # A description of every way `result` regressed from `baseline`.
+    found = []
+    for stage in ('parse_s', 'build_s'):
+        if slower(result[stage], baseline[stage], args.time_tolerance):
+            found.append(f"{name}: {stage} {result[stage]:.4f} s, was {baseline[stage]:.4f} s")
+    for (backend, metrics) in result['backends'].items():
+        before = baseline['backends'].get(backend)
+        if before is None:
+            if not metrics['outputs_ok']:
+                found.append(f"{name} [{backend}]: wrong outputs")
+            continue
+        # Backends that already got a case wrong (e.g. neal on long wires) are
+        # shown as WRONG, but only a case that used to be right regresses.
+        if before['outputs_ok'] and not metrics['outputs_ok']:
+            found.append(f"{name} [{backend}]: wrong outputs")
+        if metrics['occupancy'] < before['occupancy'] - args.occupancy_tolerance:
+            found.append(f"{name} [{backend}]: occupancy {metrics['occupancy']:.3f}, was {before['occupancy']:.3f}")
+        if metrics['reads_per_s'] is not None and before['reads_per_s'] is not None and \
+                slower(metrics['sample_s'], before['sample_s'], args.time_tolerance):
+            found.append(f"{name} [{backend}]: {metrics['reads_per_s']:.1f} reads/s, was {before['reads_per_s']:.1f}")
+        if slower(metrics['tts'], before['tts'], args.time_tolerance):
+            was = f"{before['tts']:.4f} s" if before['tts'] is not None else 'never'
+            now = f"{metrics['tts']:.4f} s" if metrics['tts'] is not None else 'never'
+            found.append(f"{name} [{backend}]: TTS {now}, was {was}")
+    return found
+
+def print_result(name, result):
+    first = True
+    for (backend, metrics) in result['backends'].items():
+        stages = f"{result['cells']:>7}{result['states']:>7}{1000 * result['parse_s']:>11.2f}{1000 * result['build_s']:>11.2f}" if first \
+            else ' ' * 36
+        tts = f"{1000 * metrics['tts']:.2f}" if metrics['tts'] is not None else 'never'
+        rate = f"{metrics['reads_per_s']:.1f}" if metrics['reads_per_s'] is not None else '-'
+        outputs = 'ok' if metrics['outputs_ok'] else 'WRONG'
+        print(f"{name if first else '':<52}{stages}{backend:>12}{rate:>11}{tts:>11}{metrics['occupancy']:>11.3f}{outputs:>9}")
+        first = False
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as fp:
+            baselines = json.load(fp)
+
+    print(f"{'case':<52}{'cells':>7}{'states':>7}{'parse (ms)':>11}{'build (ms)':>11}{'backend':>12}{'reads/s':>11}{'TTS (ms)':>11}{'occupancy':>11}{'outputs':>9}")
+    results = {}
+    found = []
+    with tempfile.TemporaryDirectory() as directory:
+        for (name, filename, stats) in cases(args, directory):
+            results[name] = run_case(filename, stats, args)
+            print_result(name, results[name])
+            if name in baselines and not args.update:
+                found += regressions(name, results[name], baselines[name], args)
+
+    if args.update:
+        baselines.update(results)
+        with open(args.baseline, 'w') as fp:
+            json.dump(baselines, fp, indent=1, sort_keys=True)
+        print(f"\nWrote baselines for {len(results)} cases to {args.baseline} ({len(baselines)} cases in all)")
+    elif not baselines:
+        print(f"\nNo baselines in {args.baseline} to compare against; make them with --update")
+
+    if found and not args.update:
+        print(f"\n{len(found)} regression(s):")
+        for regression in found:
+            print(f"  {regression}")
+        sys.exit(1)
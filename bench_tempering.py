@@ -0,0 +1,59 @@
+import argparse
+import glob
+import os
+import numpy as np
+import neal
+
+from load_qca import load_qca, assign_inputs
+from qca_on_qpu import construct_bqm
+from metropolis import MetropolisSampler
+from tempering import TemperingSampler
+from exact import EliminationSolver
+
+parser = argparse.ArgumentParser(
+                    prog='bench_tempering',
+                    description='compares how many ground states neal, the metropolis annealer and parallel tempering find per CPU second on frustrated designs.',
+                    epilog='i.e. python3 bench_tempering.py --reads 1000 --replicas 8 --sweeps 100 --jobs 4')
+
+parser.add_argument('--designs', nargs='+', default=sorted(glob.glob('crossovers/*.qca')) + ['sparse XOR/unclocked/design.qca']) # The qca files to benchmark
+parser.add_argument('--reads', type=int, default=1000) # Reads taken by the annealers (parallel tempering takes a tenth as many)
+parser.add_argument('--replicas', type=int, default=8) # Temperatures on the parallel tempering ladder
+parser.add_argument('--sweeps', type=int, default=100) # Sweeps per parallel tempering read
+parser.add_argument('--jobs', type=int, default=1) # Processes that parallel tempering's reads are split over
+parser.add_argument('--seed', type=int, default=1) # Seeds every sampler
+
+def cpu_time():
+    # This process's CPU time and that of its finished children (pool workers).
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def run(sampler, bqm, ground, **params):
+    # The fraction of reads that found the ground state, and how many ground
+    # states were found per CPU second.
+    start = cpu_time()
+    response = sampler.sample(bqm, **params)
+    elapsed = cpu_time() - start
+    hits = np.sum(np.isclose(response.record.energy, ground) * response.record.num_occurrences)
+    return hits / params['num_reads'], hits / elapsed
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+
+    samplers = [('neal', neal.SimulatedAnnealingSampler(), {'num_reads': args.reads}),
+                ('metropolis', MetropolisSampler(), {'num_reads': args.reads}),
+                ('tempering', TemperingSampler(args.jobs), {'num_reads': max(1, args.reads // 10), 'num_replicas': args.replicas,
+                                                            'num_sweeps': args.sweeps})]
+
+    print(f"{'design':<52}{'cells':>6}" + ''.join(f"{name + ' hits':>17}{'per cpu s':>11}" for (name, _, _) in samplers))
+    for design in args.designs:
+        # Every input at +1, which is where crossovers are most frustrated.
+        cells, drivers, inputs, _ = load_qca(design)
+        all_drivers, _ = assign_inputs(drivers, inputs, 2 ** len(inputs) - 1)
+        bqm = construct_bqm(cells, all_drivers)
+        ground = EliminationSolver().sample(bqm).first.energy
+
+        line = f"{design:<52}{len(bqm):>6}"
+        for (name, sampler, params) in samplers:
+            rate, per_second = run(sampler, bqm, ground, seed=args.seed, **params)
+            line += f"{rate:>17.3f}{per_second:>11.0f}"
+        print(line)
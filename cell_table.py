@@ -0,0 +1,121 @@
+from collections.abc import Mapping
+
+import numpy as np
+
+class CellTable(Mapping):
+    '''The (non-driver) cells of a circuit, stored column by column.
+
+    Row k of every array describes the same cell: `positions` holds its integer
+    (x, y) grid position, `x` and `y` its coordinates in QCADesigner's units,
+    then its cell function `cf`, polarization `pol`, whether it is rotated
+    (`rot`) and its clock zone (`clock`). `names` maps the name of each named
+    (output) cell to its row. Rows are in the order the cells were added.
+
+    A table is also a read-only mapping from (x, y) position to a node dict
+    of that cell, so code written against load_qca's old dict of dicts keeps
+    working; the node dicts are only built when asked for. Code that handles
+    many cells should read the arrays instead.'''
+
+    __slots__ = ['positions', 'x', 'y', 'cf', 'pol', 'rot', 'clock', 'names', '_rows', '_row_names']
+
+    def __init__(self, positions, x, y, cf, pol, rot, clock, names = None):
+        self.positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.cf = np.asarray(cf, dtype=np.int8)
+        self.pol = np.asarray(pol, dtype=np.float64)
+        self.rot = np.asarray(rot, dtype=bool)
+        self.clock = np.asarray(clock, dtype=np.int8)
+        self.names = dict(names) if names is not None else {}
+        self._rows = None
+        self._row_names = None
+
+    @classmethod
+    def from_cells(cls, cells):
+        '''Build a table from a dict of node dicts keyed by (x, y) (e.g. a layout
+        from synthetic, or one written by hand).'''
+        builder = CellTableBuilder()
+        for (pos, node) in cells.items():
+            builder.add(pos, node.get("x", 0.0), node.get("y", 0.0), node.get("cf", 0), node.get("pol", 0.0),
+                        node["rot"], node.get("clock", 0), node.get("name"))
+        return builder.build()
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __iter__(self):
+        return map(tuple, self.positions.tolist())
+
+    def __contains__(self, pos):
+        return pos in self.rows
+
+    @property
+    def rows(self):
+        '''(x, y) position -> row.'''
+        if self._rows is None:
+            self._rows = {pos: k for (k, pos) in enumerate(self)}
+        return self._rows
+
+    def name_of(self, row):
+        '''The name of the cell in `row`, or None.'''
+        if self._row_names is None:
+            self._row_names = {k: name for (name, k) in self.names.items()}
+        return self._row_names.get(row)
+
+    def take(self, rows):
+        '''A new table of just the cells in `rows` (an index array or mask), in
+        that order.'''
+        rows = np.arange(len(self))[rows]
+        new_row = {int(k): i for (i, k) in enumerate(rows)}
+        names = {name: new_row[k] for (name, k) in self.names.items() if k in new_row}
+        return CellTable(self.positions[rows], self.x[rows], self.y[rows], self.cf[rows], self.pol[rows],
+                         self.rot[rows], self.clock[rows], names)
+
+    def __getitem__(self, pos):
+        k = self.rows[pos]
+        return {"x": float(self.x[k]), "y": float(self.y[k]), "cf": int(self.cf[k]), "pol": float(self.pol[k]),
+                "rot": bool(self.rot[k]), "clock": int(self.clock[k]), "name": self.name_of(k)}
+
+    def __getstate__(self):
+        # The lookup dicts are rebuilt on demand, so they aren't sent to workers.
+        return (self.positions, self.x, self.y, self.cf, self.pol, self.rot, self.clock, self.names)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def __repr__(self):
+        return f"CellTable({len(self)} cells)"
+
+def as_cell_table(cells):
+    '''`cells` as a CellTable, converting a dict of node dicts if need be.'''
+    return cells if isinstance(cells, CellTable) else CellTable.from_cells(cells)
+
+class CellTableBuilder:
+    '''Collects cells one at a time (e.g. as a file is parsed) into a CellTable.
+    A cell added at a position that is already taken replaces the earlier one
+    but keeps its row, as assigning into a dict would.'''
+
+    __slots__ = ['rows', 'columns', 'names']
+
+    def __init__(self):
+        self.rows = {}
+        self.columns = ([], [], [], [], [], [], [])
+        self.names = {}
+
+    def add(self, pos, x, y, cf, pol, rot, clock = 0, name = None):
+        values = (pos, x, y, cf, pol, rot, clock)
+        k = self.rows.get(pos)
+        if k is None:
+            self.rows[pos] = len(self.rows)
+            for (column, value) in zip(self.columns, values):
+                column.append(value)
+        else:
+            for (column, value) in zip(self.columns, values):
+                column[k] = value
+            # the replaced cell's name goes with it
+            self.names = {n: row for (n, row) in self.names.items() if row != k}
+        if name is not None:
+            self.names[name] = self.rows[pos]
+
+    def build(self):
+        return CellTable(*self.columns, names=self.names)
@@ -0,0 +1,121 @@
+import hashlib
+import os
+import zipfile
+
+import numpy as np
+
+from cell_table import CellTable, as_cell_table
+
+# Where parsed circuits are kept between runs, unless a CircuitCache is given
+# another directory.
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'qca_on_qpu', 'circuits')
+
+# Part of every key, so that files written in an older layout are never read.
+FORMAT_VERSION = 2
+
+def file_hash(filename, block_size = 1 << 20):
+    '''sha256 of a file's contents.'''
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as fp:
+        for block in iter(lambda: fp.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _encode_names(names):
+    # Unnamed (None) is kept apart from every string, including ''.
+    names = list(names)
+    return (np.array([n if n is not None else '' for n in names], dtype=str),
+            np.array([n is not None for n in names], dtype=bool))
+
+def _decode_names(arrays, prefix):
+    return [n if named else None for (n, named) in zip(arrays[prefix + '_name'].tolist(), arrays[prefix + '_named'].tolist())]
+
+def _positions(positions):
+    return np.array(list(positions), dtype=np.int64).reshape(-1, 2)
+
+def encode_circuit(cells, drivers, inputs, outputs):
+    '''Flatten load_qca's (cells, drivers, inputs, outputs) into a dict of
+    arrays. The cells' CellTable columns are stored as they are, and every dict
+    in its iteration order, which decode_circuit restores (the order of `inputs`
+    decides which bit of an input state drives which input).'''
+
+    cells = as_cell_table(cells)
+    cell_name, cell_named = _encode_names(cells.names.keys())
+    input_name, input_named = _encode_names(inputs.keys())
+    output_name, output_named = _encode_names(outputs.keys())
+
+    return {
+        'cell_pos': cells.positions, 'cell_x': cells.x, 'cell_y': cells.y, 'cell_cf': cells.cf,
+        'cell_pol': cells.pol, 'cell_rot': cells.rot, 'cell_clock': cells.clock,
+        'cell_name': cell_name, 'cell_named': cell_named,
+        'cell_name_row': np.array(list(cells.names.values()), dtype=np.int64),
+        'driver_pos': _positions(drivers.keys()),
+        'driver_pol': np.array([pol for (pol, _) in drivers.values()], dtype=np.float64),
+        'driver_rot': np.array([rot for (_, rot) in drivers.values()], dtype=bool),
+        'input_pos': _positions(pos for (pos, _) in inputs.values()),
+        'input_rot': np.array([rot for (_, rot) in inputs.values()], dtype=bool),
+        'input_name': input_name, 'input_named': input_named,
+        'output_pos': _positions(outputs.values()),
+        'output_name': output_name, 'output_named': output_named,
+    }
+
+def decode_circuit(arrays):
+    '''Rebuild (cells, drivers, inputs, outputs) from encode_circuit's arrays.'''
+
+    names = dict(zip(_decode_names(arrays, 'cell'), arrays['cell_name_row'].tolist()))
+    cells = CellTable(arrays['cell_pos'], arrays['cell_x'], arrays['cell_y'], arrays['cell_cf'],
+                      arrays['cell_pol'], arrays['cell_rot'], arrays['cell_clock'], names)
+
+    drivers = {tuple(pos): (pol, rot) for (pos, pol, rot) in zip(arrays['driver_pos'].tolist(), arrays['driver_pol'].tolist(),
+                                                                  arrays['driver_rot'].tolist())}
+    inputs = {name: (tuple(pos), rot) for (name, pos, rot) in zip(_decode_names(arrays, 'input'), arrays['input_pos'].tolist(),
+                                                                  arrays['input_rot'].tolist())}
+    outputs = {name: tuple(pos) for (name, pos) in zip(_decode_names(arrays, 'output'), arrays['output_pos'].tolist())}
+    return cells, drivers, inputs, outputs
+
+class CircuitCache:
+    '''Parsed circuits (load_qca's results), kept on disk as uncompressed .npz
+    files keyed by the hash of the .qca file's contents, the cell spacing and
+    whether rotated cells were ignored.
+
+    A design is then parsed once, however many runs load it: an edited file
+    hashes differently and is parsed again, and an unchanged one is read back
+    without going near its text.'''
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR):
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.npz')
+
+    def key(self, filename, ignore_rotated, spacing):
+        return f"{file_hash(filename)[:32]}-s{spacing}-r{int(bool(ignore_rotated))}-v{FORMAT_VERSION}"
+
+    def get(self, key):
+        '''The circuit stored under `key`, or None.'''
+        if self.directory is None:
+            return None
+        try:
+            with np.load(self._path(key)) as arrays:
+                circuit = decode_circuit(arrays)
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return circuit
+
+    def put(self, key, circuit):
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Write then rename, so that parallel runs never see half a file.
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as fp:
+            np.savez(fp, **encode_circuit(*circuit))
+        os.replace(tmp_path, path)
+
+    def report(self):
+        return f"circuit cache: {self.hits} hit(s), {self.misses} miss(es)"
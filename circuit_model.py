@@ -0,0 +1,86 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from load_qca import assign_inputs
+from qca_on_qpu import cell_arrays, construct_bqm_arrays, driver_weights
+from neighbours import neighbour_pairs
+from utils import extract_polarization
+
+class CircuitModel:
+    '''A circuit's BQM, compiled once for its whole truth table.
+
+    Only the linear biases of cells next to an input depend on the input state.
+    The couplings and the biases from FIXED_T drivers are built once into a
+    shared BQM, and the inputs are kept as a sparse (cells x inputs) matrix of
+    the bias each input puts on each cell per unit polarization. Moving to a new
+    input state then only rewrites the biases of the handful of cells that
+    touch an input.'''
+
+    def __init__(self, cells, drivers, inputs, radius=2):
+        self.cells = cells
+        self.drivers = drivers
+        self.inputs = inputs
+
+        bqm, positions = construct_bqm_arrays(cells, drivers, radius)
+        self.labels = [tuple(int(c) for c in pos) for pos in positions]
+        self.base_linear, _, _ = bqm.to_numpy_vectors(range(len(self.labels)))
+
+        # Label the shared model by (x, y) position, like construct_bqm does, so
+        # that responses can be read out with the same position lookups.
+        bqm.relabel_variables(dict(enumerate(self.labels)), inplace=True)
+        self.bqm = bqm
+
+        self.input_biases = self._input_biases(cells, inputs, radius)
+        # Cells whose bias depends on any input. These are the only biases
+        # that are rewritten between input states.
+        self.touched = np.unique(self.input_biases.tocoo().row)
+        self._touched_labels = [self.labels[k] for k in self.touched]
+        self._touched_base = self.base_linear[self.touched]
+        self._touched_biases = self.input_biases[self.touched]
+
+    @staticmethod
+    def _input_biases(cells, inputs, radius):
+        # Treat every input as a driver of unit polarization and record the
+        # weight it puts on each neighbouring cell.
+        input_drivers = {pos: (1.0, rot) for (pos, rot) in inputs.values()}
+        layout = cell_arrays(cells, input_drivers)
+        i, j, _, r = neighbour_pairs(layout.positions, radius)
+        cell_idx, driver_idx, weights = driver_weights(layout, i, j, r)
+
+        # Map each input to its driver row in the layout (inputs that share a
+        # position share a row).
+        driver_row = {pos: k for (k, pos) in enumerate(input_drivers, len(cells))}
+
+        rows, cols, data = [], [], []
+        for (col, (pos, _)) in enumerate(inputs.values()):
+            mask = driver_idx == driver_row[pos]
+            rows.append(cell_idx[mask])
+            cols.append(np.full(np.count_nonzero(mask), col, dtype=np.int64))
+            data.append(weights[mask])
+
+        shape = (len(cells), len(inputs))
+        if not rows:
+            return csr_matrix(shape)
+        return csr_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))), shape=shape)
+
+    def input_polarizations(self, input_state):
+        '''The polarization of every input (in `inputs` order) for a truth-table row.'''
+        return np.array([extract_polarization(input_state, k) for k in range(len(self.inputs))], dtype=np.float64)
+
+    def linear(self, input_state):
+        '''The full vector of linear biases for an input state.'''
+        return self.base_linear + self.input_biases @ self.input_polarizations(input_state)
+
+    def assign(self, input_state):
+        '''Rewrite the shared BQM's input-dependent biases for a truth-table row.
+
+        Returns (bqm, all_drivers, state_name), with all_drivers and state_name as
+        assign_inputs gives them. The returned BQM is the shared one, so it is
+        only valid until the next call to assign.'''
+
+        linear = self._touched_base + self._touched_biases @ self.input_polarizations(input_state)
+        for (label, bias) in zip(self._touched_labels, linear):
+            self.bqm.set_linear(label, bias)
+
+        all_drivers, state_name = assign_inputs(self.drivers, self.inputs, input_state)
+        return self.bqm, all_drivers, state_name
@@ -0,0 +1,94 @@
+from collections import namedtuple
+
+import numpy as np
+
+from load_qca import assign_inputs
+from cell_table import as_cell_table
+from qca_on_qpu import anneal, construct_bqm
+from analysis import ResultAnalysis
+from session import SamplerSession
+from sweep import state_seed
+from profiling import span
+
+# Clocked circuits, run as QCADesigner's four-phase pipeline. In each phase one
+# clock zone switches: its cells are annealed as their own (much smaller) BQM,
+# driven by the fixed and input cells and by the cells of the zone before it,
+# which hold the polarizations they switched to in their own phase. The other
+# two zones are released or relaxed, and have no polarization to exert. Phases
+# run through zones 0, 1, 2, 3, 0, ... so a signal moves forward one zone per
+# phase, and the pipeline has settled once a whole cycle changes no cell.
+
+NUM_ZONES = 4
+
+# One phase of a clocked run: the zone that switched, how many cells it has and
+# the fraction of that anneal's reads that found its ground state.
+ClockPhase = namedtuple('ClockPhase', ['zone', 'num_cells', 'ground_fraction'])
+
+# The outcome of a clocked run. `state` maps every cell position to the
+# polarization it settled to, `phases` lists the ClockPhases in the order they
+# ran, and `settled` is False if the pipeline was still changing when it hit
+# its cycle limit.
+ClockedResult = namedtuple('ClockedResult', ['state', 'phases', 'settled'])
+
+def run_clocked(cells, all_drivers, samples = 500, session = None, seed = None, max_cycles = 16):
+    '''Run one input state (already assigned into `all_drivers`) through the
+    clock pipeline until it settles or `max_cycles` clock cycles have run. Each
+    zone's anneal takes `samples` reads on `session`, and its lowest-energy
+    sample is what the zone holds in the next phase. `seed` seeds every anneal
+    of a classical run (each one gets its own derived seed).'''
+
+    cells = as_cell_table(cells)
+    zones = [zone for zone in range(NUM_ZONES) if np.any(cells.clock == zone)]
+    state = {}
+    phases = []
+
+    for cycle in range(max_cycles):
+        changed = False
+        for zone in zones:
+            # The held zone's cells are built into the BQM like any other cells
+            # and then fixed at their polarizations, so they act on the switching
+            # zone through the same couplings they would have unclocked (fixed
+            # and input cells drive it as usual).
+            held_zone = (zone - 1) % NUM_ZONES
+            switching = cells.clock == zone
+            held = (cells.clock == held_zone) & np.array([pos in state for pos in cells], dtype=bool)
+            with span('construct_bqm', 'build', zone=zone):
+                bqm = construct_bqm(cells.take(switching | held), all_drivers)
+                bqm.fix_variables({pos: state[pos] for pos in cells.take(held)})
+
+            zone_cells = cells.take(switching)
+            response = anneal(zone_cells, all_drivers, samples=samples, bqm=bqm, seed=state_seed(seed, cycle, zone), session=session)
+
+            analysis = ResultAnalysis(response, {})
+            row = analysis.ground_state()
+            phases.append(ClockPhase(zone, len(zone_cells), analysis.occupancy(row) / analysis.num_reads))
+
+            for (pos, spin) in analysis.state_of(row).items():
+                spin = int(spin)
+                if state.get(pos) != spin:
+                    state[pos] = spin
+                    changed = True
+
+        if not changed:
+            return ClockedResult(state, phases, True)
+
+    return ClockedResult(state, phases, False)
+
+def sweep_clocked(cells, drivers, inputs, samples = 500, qpu_arch = 'classical', seed = None, session = None, max_cycles = 16):
+    '''Run every input state of a clocked circuit through the clock pipeline.
+    Yields (input_state, ClockedResult, all_drivers, state_name) tuples in
+    input-state order. Runs on `session` if one is given, or else on a new
+    SamplerSession for `qpu_arch`.'''
+
+    if session is None:
+        with SamplerSession(qpu_arch) as session:
+            yield from sweep_clocked(cells, drivers, inputs, samples, qpu_arch, seed, session, max_cycles)
+        return
+
+    cells = as_cell_table(cells)
+    for input_state in range(2 ** len(inputs)):
+        (all_drivers, state_name) = assign_inputs(drivers, inputs, input_state)
+        input_seed = state_seed(seed, input_state)
+        with span('input state', 'run', state=input_state):
+            result = run_clocked(cells, all_drivers, samples, session, input_seed, max_cycles)
+        yield (input_state, result, all_drivers, state_name)
@@ -1,6 +1,8 @@
 import argparse
-from load_qca import load_qca, assign_inputs
+from load_qca import load_qca, assign_inputs, circuit_cache
 from qca_on_qpu import anneal
+from session import SamplerSession
+from analysis import ResultAnalysis
 import numpy as np
 from matplotlib import pyplot as plt
 from matplotlib.ticker import PercentFormatter
@@ -17,6 +19,7 @@ parser.add_argument('--arch', default='classical') # The QPU architecture to run
 parser.add_argument('--samples', type=int, default=500) # The number of samples that should be taken to find the minimum energy state
 parser.add_argument('--title') # The graph title
 parser.add_argument('--save') # The save filepath
+parser.add_argument('--no-cache', action='store_true', dest='no_cache') # Parses the qca file again instead of reading the parsed-circuit cache
 
 args = parser.parse_args()
 
@@ -24,24 +27,24 @@ re_number = re.compile(".*(\d+).*")
 crossover_type = re_number.match(args.qca_file).group(1)
 
 # Load the QCA file
-cells, drivers, inputs, outputs = load_qca(args.qca_file, True, args.spacing)
+cells, drivers, inputs, outputs = load_qca(args.qca_file, True, args.spacing, cache=None if args.no_cache else circuit_cache)
 
 # For each input, create a BQM and anneal it. Extract statistics, outputs, and
 # create visualizations.
 num_input_states = 2 ** len(inputs)
 input_state = 1
 (all_drivers, _) = assign_inputs(drivers, inputs, input_state)
-response = anneal(cells, all_drivers, samples=args.samples, qpu_arch=args.arch)
+with SamplerSession(args.arch) as session:
+    response = anneal(cells, all_drivers, samples=args.samples, session=session)
 
-energies = np.array([record[1] for record in response.record])
-weights = np.array([record[2] for record in response.record])
+analysis = ResultAnalysis(response, outputs)
+energies = analysis.energies
+weights = analysis.occurrences
 
 assert(len(outputs) == 1)
-output_pos = list(outputs.values())[0]
-output_idx = [*response.variables].index(output_pos)
 # import pdb; pdb.set_trace()
 print(response.record)
-num_acceptable = sum(int(record[0][output_idx] == 1) * record[2] for record in response.record)
+num_acceptable = analysis.marginals()[analysis.outputs[0]]
 
 print(f"% in acceptable state: {num_acceptable / args.samples * 100:.3}")
 width = (np.max(energies) - np.min(energies)) / energies.size * 0.8
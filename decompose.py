@@ -0,0 +1,328 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import connected_components
+import dimod
+
+from sweep import state_seed
+
+# Solves BQMs that are too large for one sampler (or one QPU) in pieces, in the
+# style of QBSolv and dwave-hybrid. The circuit is cut into parts of at most
+# max_part_size cells, along whichever lines cross the fewest couplings (in QCA
+# these are the narrow wires between gates). Then, round after round:
+#
+#   1. every part is solved as its own small BQM, with the cells around it held
+#      at their current polarizations. Parts that don't touch each other are
+#      independent, so each colour of parts is solved at once, in parallel;
+#   2. the parts are stitched together by a small "domain flip" problem, which
+#      decides for each domain (a run of cells within a part whose couplings are
+#      all satisfied, such as a whole part of a wire) whether to flip all of its
+#      cells. This lines up the parts' solutions across the cuts in one go, e.g.
+#      a long wire whose parts were each solved with the opposite polarization
+#      to the input's, and removes domain walls that a part's sampler left;
+#
+# until a round no longer lowers the energy. Rounds like these are a block
+# coordinate descent, which can stop in a local minimum where no single part
+# (or set of domain flips) can lower the energy, typically with a wrong value
+# held across a cut. So the descent is then started again from scratch on a
+# new partition, cut along rotated axes so that the new parts straddle the old
+# cuts, and the lowest energy state of any descent is kept, until `patience`
+# restarts in a row find nothing lower. Parts and the flip problem are sampled
+# with the session's sampler (neal offline, or the QPU through the
+# embedding cache), and a part's new solution is only kept if it lowers the
+# energy, so the energy never goes up from one round of a descent to the next.
+
+def variable_positions(bqm):
+    '''The (x, y) positions of a BQM's variables, as an (n, 2) array, if it is
+    labelled by cell position (as construct_bqm's are). None otherwise.'''
+    labels = list(bqm.variables)
+    if not all(isinstance(v, tuple) and len(v) == 2 and all(isinstance(c, (int, np.integer)) for c in v) for v in labels):
+        return None
+    return np.array(labels, dtype=np.int64).reshape(-1, 2)
+
+def bfs_layers(n, row, col):
+    '''Coordinates for a graph without positions: each variable's breadth-first
+    distance from the first variable of its connected component, and the index
+    of that component. Cutting between layers then cuts across the graph.'''
+    neighbours = [[] for _ in range(n)]
+    for (u, v) in zip(row.tolist(), col.tolist()):
+        neighbours[u].append(v)
+        neighbours[v].append(u)
+
+    coords = np.full((n, 2), -1, dtype=np.int64)
+    component = 0
+    for start in range(n):
+        if coords[start, 0] >= 0:
+            continue
+        coords[start] = (0, component)
+        queue = deque([start])
+        while queue:
+            u = queue.popleft()
+            for v in neighbours[u]:
+                if coords[v, 0] < 0:
+                    coords[v] = (coords[u, 0] + 1, component)
+                    queue.append(v)
+        component += 1
+    return coords
+
+def _bisect(coords, row, col):
+    # Split the variables at `coords` in two with a straight cut across x or y,
+    # keeping at least a quarter of them on each side, that crosses the fewest
+    # of the couplings (row, col). Returns a mask of one side.
+    m = len(coords)
+    best = None
+    for axis in (0, 1):
+        c = coords[:, axis]
+        cuts = np.unique(c)[1:]
+        if len(cuts) == 0:
+            continue
+        # Variables left of each cut, and couplings that cross it (lo < cut <= hi).
+        left = np.searchsorted(np.sort(c), cuts)
+        lo = np.sort(np.minimum(c[row], c[col]))
+        hi = np.sort(np.maximum(c[row], c[col]))
+        crossing = np.searchsorted(lo, cuts) - np.searchsorted(hi, cuts)
+
+        balance = np.abs(left - m / 2)
+        balanced = (left >= m / 4) & (left <= 3 * m / 4)
+        if not np.any(balanced):
+            balanced = balance == balance.min()
+        # Fewest crossings first, then the most even split.
+        k = np.flatnonzero(balanced)[np.lexsort((balance[balanced], crossing[balanced]))[0]]
+        score = (crossing[k], balance[k])
+        if best is None or score < best[0]:
+            best = (score, c < cuts[k])
+
+    if best is None:
+        # Every variable is at the same coordinates; split them evenly.
+        mask = np.zeros(m, dtype=bool)
+        mask[:m // 2] = True
+        return mask
+    return best[1]
+
+def partition(coords, row, col, max_part_size):
+    '''Split variables 0..n-1 (at `coords`, an (n, 2) array) into parts of at
+    most `max_part_size` variables by repeatedly bisecting them along the cut
+    that crosses the fewest couplings (row[k], col[k]). Returns each variable's
+    part index.'''
+    n = len(coords)
+    parts = np.zeros(n, dtype=np.int64)
+    local = np.empty(n, dtype=np.int64)
+    num_parts = 0
+
+    stack = [(np.arange(n), np.arange(len(row)))]
+    while stack:
+        (variables, edges) = stack.pop()
+        if len(variables) <= max_part_size:
+            parts[variables] = num_parts
+            num_parts += 1
+            continue
+
+        local[variables] = np.arange(len(variables))
+        r, c = local[row[edges]], local[col[edges]]
+        side = _bisect(coords[variables], r, c)
+        # Couplings that stay inside one side go down with it.
+        for mask in (side, ~side):
+            inside = mask[r] & mask[c]
+            stack.append((variables[mask], edges[inside]))
+
+    return parts
+
+def colour_parts(parts, row, col, num_parts):
+    '''Greedily colour the parts so that no two parts joined by a coupling share
+    a colour. Returns a list of part-index arrays, one per colour.'''
+    cut = parts[row] != parts[col]
+    adjacent = [set() for _ in range(num_parts)]
+    for (p, q) in zip(parts[row[cut]].tolist(), parts[col[cut]].tolist()):
+        adjacent[p].add(q)
+        adjacent[q].add(p)
+
+    colour = {}
+    for p in range(num_parts):
+        used = {colour[q] for q in adjacent[p] if q in colour}
+        colour[p] = next(k for k in range(num_parts) if k not in used)
+
+    num_colours = max(colour.values()) + 1 if colour else 0
+    return [np.array([p for p in range(num_parts) if colour[p] == k], dtype=np.int64) for k in range(num_colours)]
+
+def _sample_subproblem(session, linear, quadratic, num_reads, seed):
+    # The lowest energy sample of a small BQM over variables 0..len(linear)-1.
+    bqm = dimod.BinaryQuadraticModel.from_numpy_vectors(linear, quadratic, 0, dimod.SPIN)
+    params = {'seed': seed} if session.classical and seed is not None else {}
+    response = session.sampler_for(bqm).sample(bqm, num_reads=num_reads, **params)
+    record = response.record
+    best = np.argmin(record.energy)
+    columns = [response.variables.index(v) for v in range(len(linear))]
+    return record.sample[best, columns].astype(np.int8)
+
+# The session of a worker process, set up by _init_worker.
+_session = None
+
+def _init_worker(qpu_arch):
+    global _session
+    from session import SamplerSession
+    _session = SamplerSession(qpu_arch)
+    Finalize(_session, _session.close, exitpriority=10)
+
+def _sample_in_worker(task):
+    return _sample_subproblem(_session, *task)
+
+class DecompositionSampler(dimod.Sampler):
+    '''Samples a BQM by decomposing it into parts of at most `max_part_size`
+    variables (see the top of this file), each sampled on `session`. With
+    jobs > 1, the parts of each colour are sampled on a pool of that many
+    processes, each with its own SamplerSession for the session's qpu_arch.
+
+    Every call returns a single sample: the best stitched solution found, which
+    is not known to be a ground state. num_reads is the number of reads taken
+    of each part. Descents are restarted on new partitions until `patience`
+    restarts in a row find nothing lower (see the top of this file).'''
+
+    parameters = {'num_reads': [], 'seed': [], 'max_rounds': [], 'patience': []}
+    properties = {}
+
+    def __init__(self, session, max_part_size = 1000, jobs = 1, max_rounds = 20, patience = 3):
+        self.session = session
+        self.max_part_size = max_part_size
+        self.jobs = jobs
+        self.max_rounds = max_rounds
+        self.patience = patience
+        self._executor = None
+
+    def _map(self, tasks):
+        if self.jobs <= 1 or len(tasks) <= 1:
+            return [_sample_subproblem(self.session, *task) for task in tasks]
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker, initargs=(self.session.qpu_arch,))
+        return list(self._executor.map(_sample_in_worker, tasks))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def sample(self, bqm, num_reads = 10, seed = None, max_rounds = None, patience = None):
+        if max_rounds is None:
+            max_rounds = self.max_rounds
+        if patience is None:
+            patience = self.patience
+
+        bqm = dimod.as_bqm(bqm).change_vartype(dimod.SPIN, inplace=False)
+        variables = list(bqm.variables)
+        n = len(variables)
+        h, (row, col, J), offset = bqm.to_numpy_vectors(variables)
+        row = row.astype(np.int64)
+        col = col.astype(np.int64)
+
+        coords = variable_positions(bqm)
+        if coords is None:
+            coords = bfs_layers(n, row, col)
+
+        def energy(state):
+            return float(h @ state + J @ (state[row] * state[col]) + offset)
+
+        best = None
+        best_energy = np.inf
+        energies = []
+        rounds = 0
+        restarts = 0
+        num_parts = 0
+        stalled = 0
+        while True:
+            # The first partition cuts along the coordinate axes, and each
+            # restart's along axes rotated on by the golden angle.
+            angle = restarts * np.pi * (3 - np.sqrt(5))
+            rotation = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
+            parts = partition(coords if restarts == 0 else coords @ rotation, row, col, self.max_part_size)
+            # Cells not yet solved count as 0 (no polarization) to their neighbours.
+            state, rounds = self._descend(h, row, col, J, energy, parts, np.zeros(n), num_reads, seed, rounds, max_rounds, energies)
+            num_parts = max(num_parts, int(parts.max()) + 1 if n else 0)
+            if energy(state) < best_energy - 1e-9:
+                best, best_energy = state, energy(state)
+                stalled = 0
+            else:
+                stalled += 1
+            if stalled >= patience or n <= self.max_part_size:
+                break
+            restarts += 1
+        state = best
+
+        info = {'num_parts': num_parts, 'rounds': rounds, 'restarts': restarts, 'energies': energies}
+        return dimod.SampleSet.from_samples_bqm((state.astype(np.int8)[None, :], variables), bqm, info=info)
+
+    def _descend(self, h, row, col, J, energy, parts, state, num_reads, seed, rounds, max_rounds, energies):
+        # Rounds of part solves and stitching on the partition `parts`, from
+        # `state` (zeros for cells not yet solved), until a round no longer lowers the energy (or max_rounds of
+        # them). Rounds are numbered on from `rounds`, so that each one of a
+        # call gets its own seeds. Appends each round's energy to `energies`,
+        # and returns the final state and round number.
+        n = len(h)
+        num_parts = int(parts.max()) + 1 if n else 0
+        colours = colour_parts(parts, row, col, num_parts)
+
+        # Each part's variables, internal couplings (in its own 0-based
+        # indices) and the couplings that tie it to the rest of the circuit.
+        local = np.empty(n, dtype=np.int64)
+        members = [np.flatnonzero(parts == p) for p in range(num_parts)]
+        for part in members:
+            local[part] = np.arange(len(part))
+        internal = parts[row] == parts[col]
+        inside = [np.flatnonzero(internal & (parts[row] == p)) for p in range(num_parts)]
+        cut = np.flatnonzero(~internal)
+
+        def part_energy(p, x, field):
+            k = inside[p]
+            return float((h[members[p]] + field) @ x + J[k] @ (x[local[row[k]]] * x[local[col[k]]]))
+
+        first = len(energies)
+        for rounds in range(rounds + 1, rounds + max_rounds + 1):
+            # 1. Solve the parts, one colour at a time, given their surroundings.
+            for (k, colour) in enumerate(colours):
+                tasks = []
+                fields = []
+                for p in colour.tolist():
+                    # The field on each cell from the cells around the part.
+                    field = np.zeros(len(members[p]))
+                    edges = cut[(parts[row[cut]] == p) | (parts[col[cut]] == p)]
+                    ours = parts[row[edges]] == p
+                    np.add.at(field, local[row[edges[ours]]], J[edges[ours]] * state[col[edges[ours]]])
+                    np.add.at(field, local[col[edges[~ours]]], J[edges[~ours]] * state[row[edges[~ours]]])
+                    fields.append(field)
+                    e = inside[p]
+                    tasks.append((h[members[p]] + field, (local[row[e]], local[col[e]], J[e]), num_reads,
+                                  state_seed(seed, rounds, k, p)))
+
+                for (p, field, x) in zip(colour.tolist(), fields, self._map(tasks)):
+                    current = state[members[p]]
+                    if np.any(current == 0) or part_energy(p, x, field) < part_energy(p, current, field):
+                        state[members[p]] = x
+
+            # 2. Stitch the parts together: flip whichever domains lower the
+            # energy, where a domain is a run of cells within one part whose
+            # couplings are all satisfied (a whole part, if it is uniform).
+            satisfied = internal & (J * state[row] * state[col] < 0)
+            num_domains, domains = connected_components(
+                csr_matrix((np.ones(np.count_nonzero(satisfied)), (row[satisfied], col[satisfied])), shape=(n, n)), directed=False)
+            if num_domains > 1:
+                between = domains[row] != domains[col]
+                flip_linear = np.bincount(domains, weights=h * state, minlength=num_domains)
+                flip_quadratic = (domains[row[between]], domains[col[between]], J[between] * state[row[between]] * state[col[between]])
+                if num_domains > self.max_part_size:
+                    # Too many domains for one sample: decompose the flip problem too.
+                    flip_bqm = dimod.BinaryQuadraticModel.from_numpy_vectors(flip_linear, flip_quadratic, 0, dimod.SPIN)
+                    flips = self.sample(flip_bqm, num_reads=num_reads, seed=state_seed(seed, rounds), max_rounds=max_rounds, patience=0)
+                    t = flips.record.sample[0, [flips.variables.index(d) for d in range(num_domains)]]
+                else:
+                    t = _sample_subproblem(self.session, flip_linear, flip_quadratic, num_reads, state_seed(seed, rounds))
+
+                flipped = state * t[domains]
+                if energy(flipped) < energy(state):
+                    state = flipped
+
+            energies.append(energy(state))
+            if len(energies) > first + 1 and energies[-1] >= energies[-2]:
+                break
+
+        return state, rounds
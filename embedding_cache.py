@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+
+# minorminer and dwave.system are slow to import and only needed for QPU runs,
+# so they are imported where they are used.
+
+# Where embeddings are kept between runs, unless an EmbeddingCache is given
+# another directory.
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'qca_on_qpu', 'embeddings')
+
+def _edge_key(u, v):
+    # Edges are undirected, so order their endpoints canonically.
+    u, v = repr(u), repr(v)
+    return (u, v) if u <= v else (v, u)
+
+def graph_hash(nodes, edges):
+    '''A stable hash of an undirected graph, independent of the order that its
+    nodes and edges are listed in.'''
+    digest = hashlib.sha256()
+    digest.update(json.dumps(sorted(repr(n) for n in nodes)).encode())
+    digest.update(json.dumps(sorted(_edge_key(u, v) for (u, v) in edges)).encode())
+    return digest.hexdigest()
+
+def bqm_hash(bqm):
+    '''Hash of a BQM's interaction graph. Biases are ignored, so every input
+    state of a circuit has the same hash.'''
+    return graph_hash(bqm.variables, bqm.quadratic.keys())
+
+def target_graph(target):
+    '''The (nodes, edges) of a target topology. `target` is either a structured
+    sampler (a DWaveSampler, or MockDWaveSampler offline) or a graph such as one
+    from dwave_networkx.pegasus_graph.'''
+    if hasattr(target, 'edgelist'):
+        return target.nodelist, target.edgelist
+    return list(target.nodes), list(target.edges)
+
+def target_hash(target):
+    '''Hash of a target's working graph (its qubits and couplers).'''
+    return graph_hash(*target_graph(target))
+
+def _encode_label(label):
+    return list(label) if isinstance(label, tuple) else label
+
+def _decode_label(label):
+    # JSON turns the (x, y) tuples that label cells into lists.
+    return tuple(label) if isinstance(label, list) else label
+
+class EmbeddingCache:
+    '''Minor embeddings of circuits onto QPU topologies, kept in memory and on
+    disk, keyed by the hash of the circuit's interaction graph and the target's
+    working graph.
+
+    The interaction graph of a circuit is the same for every row of its truth
+    table, so one embedding search serves the whole sweep (and every later run
+    on the same design and solver).'''
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, verbose=True):
+        self.directory = directory
+        self.vprint = print if verbose else lambda *a, **k : None
+        self.embeddings = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.json')
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), 'r') as fp:
+                stored = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        return {_decode_label(label): chain for (label, chain) in stored}
+
+    def _store(self, key, embedding):
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        # Write then rename, so that parallel workers never see half a file.
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as fp:
+            json.dump([[_encode_label(label), list(chain)] for (label, chain) in embedding.items()], fp)
+        os.replace(tmp_path, path)
+
+    def key(self, bqm, target):
+        return f"{bqm_hash(bqm)[:32]}-{target_hash(target)[:32]}"
+
+    def get(self, bqm, target, **kwargs):
+        '''Return an embedding of `bqm` onto `target` (see target_graph),
+        searching with minorminer only if it is not already cached. Extra keyword
+        arguments are passed to minorminer.find_embedding.'''
+
+        key = self.key(bqm, target)
+        embedding = self.embeddings.get(key)
+        if embedding is None:
+            embedding = self._load(key)
+
+        if embedding is not None:
+            self.hits += 1
+            self.vprint(f"Embedding cache hit ({key[:8]})")
+        else:
+            self.misses += 1
+            self.vprint(f"Embedding cache miss ({key[:8]}), searching for an embedding...")
+            from minorminer import find_embedding
+            nodes, edges = target_graph(target)
+            embedding = find_embedding(list(bqm.quadratic.keys()), edges, **kwargs)
+            if len(embedding) == 0 and bqm.num_interactions > 0:
+                raise ValueError('No embedding of the circuit onto the target topology was found.')
+            # Variables without any couplings still need a qubit.
+            used = {q for chain in embedding.values() for q in chain}
+            free = (q for q in nodes if q not in used)
+            for v in bqm.variables:
+                if v not in embedding:
+                    embedding[v] = [next(free)]
+            self._store(key, embedding)
+
+        self.embeddings[key] = embedding
+        return embedding
+
+    def sampler(self, bqm, target, **kwargs):
+        '''Wrap the structured sampler `target` in a FixedEmbeddingComposite
+        using the cached embedding for `bqm`.'''
+        from dwave.system import FixedEmbeddingComposite
+        return FixedEmbeddingComposite(target, self.get(bqm, target, **kwargs))
+
+    def report(self):
+        return f"embedding cache: {self.hits} hit(s), {self.misses} miss(es)"
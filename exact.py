@@ -0,0 +1,153 @@
+import heapq
+import itertools
+
+import numpy as np
+import dimod
+
+# Exact ground states by variable elimination (bucket elimination). Variables
+# are eliminated one at a time: every term that involves the variable is added
+# into one table over its neighbours, and the variable is minimised out of it,
+# leaving a new term over just those neighbours. The largest table built has
+# 2^(width + 1) entries, where the width is that of the elimination order, so
+# wires, inverters and the other thin layouts QCA is made of (width 2 to 6 or
+# so) are solved in time linear in their length. Eliminating in reverse, each
+# variable's best value given its (already chosen) neighbours was recorded, so
+# a ground state is read back out, and the number of ground states is counted
+# along the way.
+
+# Tables are float64 energies plus int64 counts and uint8 choices, so width 22
+# is about 100 MB for the largest table.
+MAX_WIDTH = 22
+
+# Energies closer than this are counted as the same (degenerate) level.
+TOLERANCE = 1e-9
+
+def elimination_order(neighbours):
+    '''A greedy minimum-degree elimination order for the graph `neighbours`
+    (variable index -> set of neighbour indices), which is updated in place as
+    variables are eliminated (their neighbours become a clique). Returns the
+    order and its width: the most neighbours any variable had when eliminated.'''
+    heap = [(len(adjacent), v) for (v, adjacent) in enumerate(neighbours)]
+    heapq.heapify(heap)
+    eliminated = np.zeros(len(neighbours), dtype=bool)
+    order = []
+    width = 0
+    while heap:
+        (degree, v) = heapq.heappop(heap)
+        # Stale entries (from before a neighbour's elimination) are skipped.
+        if eliminated[v] or degree != len(neighbours[v]):
+            continue
+        eliminated[v] = True
+        order.append(v)
+        width = max(width, degree)
+        adjacent = neighbours[v]
+        for u in adjacent:
+            neighbours[u].discard(v)
+            neighbours[u].update(adjacent - {u})
+            heapq.heappush(heap, (len(neighbours[u]), u))
+    return order, width
+
+def _align(table, scope, union):
+    # `table` (one axis per variable of `scope`, which like `union` is sorted)
+    # with size-1 axes for the variables of `union` it doesn't have, so that it
+    # broadcasts against the others.
+    return table.reshape([2 if v in scope else 1 for v in union])
+
+class EliminationSolver(dimod.Sampler):
+    '''Finds the exact ground state of a BQM by variable elimination, in time
+    and memory exponential only in the width of its elimination order (not in
+    its size). Raises ValueError for BQMs wider than `max_width`, such as large
+    solid blocks of cells, which should be annealed instead.
+
+    Every call returns a single sample, a ground state, and the number of
+    ground states (`degeneracy`) and the order's `width` in the info. The
+    num_reads and seed parameters are accepted, so that it can stand in for
+    the annealers, but have no effect.'''
+
+    parameters = {'num_reads': [], 'seed': []}
+    properties = {}
+
+    def __init__(self, max_width = MAX_WIDTH):
+        self.max_width = max_width
+
+    def sample(self, bqm, num_reads = 1, seed = None):
+        bqm = dimod.as_bqm(bqm).change_vartype(dimod.SPIN, inplace=False)
+        variables = list(bqm.variables)
+        n = len(variables)
+        h, (row, col, J), offset = bqm.to_numpy_vectors(variables)
+
+        neighbours = [set() for _ in range(n)]
+        for (u, v) in zip(row.tolist(), col.tolist()):
+            neighbours[u].add(v)
+            neighbours[v].add(u)
+        order, width = elimination_order(neighbours)
+        if width > self.max_width:
+            raise ValueError(f'The BQM has elimination width {width}, more than the exact solver allows '
+                             f'({self.max_width}); anneal it instead.')
+
+        # Terms are (scope, energies, counts) with a sorted scope and axis value
+        # 0 for spin -1, 1 for spin +1. Counts of None mean one way to reach
+        # every entry (no ties so far), which saves building most count tables.
+        # `terms_of` maps each variable to the terms it is in.
+        spins = np.array([-1.0, 1.0])
+        terms = {}
+        terms_of = [set() for _ in range(n)]
+        keys = itertools.count()
+        def add_term(scope, energies, counts):
+            key = next(keys)
+            terms[key] = (scope, energies, counts)
+            for v in scope:
+                terms_of[v].add(key)
+
+        # Each linear bias goes into the first coupling of its variable.
+        linear = h.copy()
+        for (u, v, j) in zip(row.tolist(), col.tolist(), J.tolist()):
+            (u, v) = (u, v) if u < v else (v, u)
+            energies = j * np.outer(spins, spins) + linear[u] * spins[:, None] + linear[v] * spins[None, :]
+            linear[u] = linear[v] = 0
+            add_term((u, v), energies, None)
+        for v in np.flatnonzero(linear).tolist():
+            add_term((v,), linear[v] * spins, None)
+
+        degeneracy = 1
+        choices = []
+        for v in order:
+            bucket_keys = terms_of[v]
+            bucket = [terms.pop(key) for key in bucket_keys]
+            for (scope, _, _) in bucket:
+                for u in scope:
+                    if u != v:
+                        terms_of[u].difference_update(bucket_keys)
+            union = tuple(sorted({u for (scope, _, _) in bucket for u in scope} | {v}))
+            axis = union.index(v)
+            rest = union[:axis] + union[axis + 1:]
+            shape = (2,) * len(union)
+
+            energies = np.zeros(shape)
+            for (scope, e, _) in bucket:
+                energies = energies + _align(e, scope, union)
+            counts = None
+            for (scope, _, c) in bucket:
+                if c is not None:
+                    counts = _align(c, scope, union) if counts is None else counts * _align(c, scope, union)
+
+            # Minimise v out, counting the ground states on both sides of any tie.
+            best = energies.min(axis=axis)
+            ties = energies <= np.expand_dims(best, axis) + TOLERANCE
+            choices.append((rest, np.argmin(energies, axis=axis).astype(np.uint8)))
+            if counts is None and not np.any(ties.all(axis=axis)):
+                reduced = None
+            else:
+                reduced = (np.broadcast_to(counts if counts is not None else 1, shape) * ties).sum(axis=axis)
+            if not rest:
+                degeneracy *= int(reduced) if reduced is not None else 1
+            else:
+                add_term(rest, best, reduced)
+
+        # Read a ground state back out, in reverse elimination order.
+        state = np.zeros(n, dtype=np.int8)
+        for (v, (scope, choice)) in zip(reversed(order), reversed(choices)):
+            state[v] = 2 * int(choice[tuple((state[u] + 1) // 2 for u in scope)]) - 1
+
+        info = {'degeneracy': degeneracy, 'width': width}
+        return dimod.SampleSet.from_samples_bqm((state[None, :], variables), bqm, info=info)
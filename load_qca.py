@@ -1,4 +1,6 @@
-from qcadtrans import QCACircuit
+from qcastream import iter_cells
+from circuit_cache import CircuitCache
+from cell_table import CellTableBuilder
 from utils import extract_polarization
 
 # Different cell IDs that QCADesigner uses
@@ -20,13 +22,24 @@ def assign_inputs(drivers, inputs, input_state):
     state_name = ', '.join([f"{input_name} = {value}" for input_name, value in input_values.items()])
     return (all_drivers, state_name)
 
-def load_qca(filename, ignore_rotated = False, spacing = 20):
-    # Supply the file name to the QCADesigner file and it will be parsed by the 
-    # QCACircuit class.
-    circuit = QCACircuit(fname=filename, verbose=False)
+# Parsed circuits are shared by every load_qca call unless it is given another
+# cache (or None, to always parse the file).
+circuit_cache = CircuitCache()
 
-    # Map from (x, y) tuples to the QCA Node data - for normal and output types only
-    cells = {}
+def load_qca(filename, ignore_rotated = False, spacing = 20, cache = circuit_cache):
+    if cache is None:
+        return parse_qca(filename, ignore_rotated, spacing)
+
+    key = cache.key(filename, ignore_rotated, spacing)
+    circuit = cache.get(key)
+    if circuit is None:
+        circuit = parse_qca(filename, ignore_rotated, spacing)
+        cache.put(key, circuit)
+    return circuit
+
+def parse_qca(filename, ignore_rotated = False, spacing = 20):
+    # The normal and output cells, added to a CellTable as they are read
+    cells = CellTableBuilder()
     # Map from (x, y) tuples of position to polarization strength
     drivers = {}
     # string name -> (location, rot). Inputs are not in the `cells` or `drivers` dictionaries: to actually
@@ -37,26 +50,25 @@ def load_qca(filename, ignore_rotated = False, spacing = 20):
     # just need to be measured at the end of simulation.
     outputs = {}
 
-    # Destructure the heterogeneous cell listing 
-    for i in range(len(circuit.nodes)):
-        node = circuit.nodes[i]
-
-        cf = node["cf"]
-        x = int(node["x"] / spacing)
-        y = int(node["y"] / spacing)
+    # Destructure the heterogeneous cell listing, streamed from the QCADesigner file
+    # one cell at a time.
+    for record in iter_cells(filename):
+        cf = record.cf
+        x = int(record.x / spacing)
+        y = int(record.y / spacing)
         pos = (x, y)
 
-        if ignore_rotated and node["rot"]:
+        if ignore_rotated and record.rot:
             continue
 
         if cf == NORMAL_T:
-            cells[pos] = node
+            cells.add(pos, record.x, record.y, cf, record.pol, record.rot, record.clock)
         elif cf == INPUT_T:
-            inputs[node["name"]] = (pos, node["rot"])
+            inputs[record.name] = (pos, record.rot)
         elif cf == OUTPUT_T:
-            cells[pos] = node
-            outputs[node["name"]] = pos
+            cells.add(pos, record.x, record.y, cf, record.pol, record.rot, record.clock, record.name)
+            outputs[record.name] = pos
         elif cf == FIXED_T:
-            drivers[pos] = (float(node["pol"]), node["rot"])
+            drivers[pos] = (float(record.pol), record.rot)
 
-    return cells, drivers, inputs, outputs
+    return cells.build(), drivers, inputs, outputs
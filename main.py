@@ -1,8 +1,10 @@
 import argparse
-from qca_plotting import plot_circuit
-from load_qca import load_qca, assign_inputs
-from qca_on_qpu import anneal
-import numpy as np
+from load_qca import load_qca, circuit_cache
+
+# The plotting stack (matplotlib) and the samplers (dimod, and the D-Wave
+# packages for QPU runs) take far longer to import than a small circuit takes to
+# run, so main() imports each only when the chosen mode needs it. Start-up time
+# for each mode is tracked by bench_startup.py.
 
 parser = argparse.ArgumentParser(
                     prog='qca_on_qpu',
@@ -11,7 +13,7 @@ parser = argparse.ArgumentParser(
 
 parser.add_argument('qca_file') # The name of the qca file
 parser.add_argument('--spacing', default=20) # The center-to-center qca cell spacing 
-parser.add_argument('--arch', default='classical') # The QPU architecture to run on (or classical)
+parser.add_argument('--arch', default='classical') # The QPU architecture to run on (or classical, metropolis for the vectorised annealer, tempering for parallel tempering, or exact for the true ground state)
 parser.add_argument('--samples', type=int, default=500) # The number of samples that should be taken to find the minimum energy state
 parser.add_argument('--ignore-rotated', action='store_true', dest="ignore_rotated") # Deletes rotated cells if true
 parser.add_argument('--only-plot', action='store_true', dest="only_plot")
@@ -19,90 +21,22 @@ parser.add_argument('--title') # The title: %s is where the state info should be
 parser.add_argument('--save') # The save filepath: %s is where the state info should be appended (unless only plot)
 parser.add_argument('--no-plot', action='store_true', dest='no_plot') # Skips plotting and just runs the analysis
 parser.add_argument('--broken', action='store_true', dest='broken') # plots the most common state whose outputs differ from the ground state
-
-args = parser.parse_args()
-
-# Load the QCA file
-cells, drivers, inputs, outputs = load_qca(args.qca_file, args.ignore_rotated, args.spacing)
-
-if args.only_plot:
-    plot_circuit(cells, drivers, inputs, outputs, title=args.title, filename=args.save)
-    exit()
-
-if args.broken and args.arch == 'classical':
-    print("The classical annealer gives results in a different format than the actual qpu. Because of this, --broken is unsupported for classical simulation. Aborting")
-    exit(1)
-
-# For each input, create a BQM and anneal it. Extract statistics, outputs, and
-# create visualizations.
-num_input_states = 2 ** len(inputs)
-for input_state in range(num_input_states):
-    (all_drivers, state_name) = assign_inputs(drivers, inputs, input_state)
-    response = anneal(cells, all_drivers, samples=args.samples, qpu_arch=args.arch)
-
-    # The classical annealer outputs very different data. Tallying is broken and
-    # energies aren't sorted.
-    if args.arch == 'classical':
-        # Find minimum energy solution
-        winning_record = response.record[0]
-        for record in response.record:
-            # Find the minimum energy state
-            if record[1] < winning_record[1]:
-                winning_record = record
-
-        count = 0
-        for record in response.record:
-            # Find the minimum energy state
-            if np.all(record[0] == winning_record[0]):
-                count += 1
-        states, energy, _ = winning_record
-    else:
-        # On real hardware, the tallying works and we can use the first (lowest energy) soln.
-        states, energy, count, _ = response.record[0]
-        # import pdb; pdb.set_trace()
-
-    ground_state_outputs = {}
-    for output, output_pos in outputs.items():
-        output_idx = [*response.variables].index(output_pos)
-        ground_state_outputs[output] = states[output_idx]
-
-    # Here, states, energy, and count all correspond to the ground state
-    # if we want to find the best broken state, we fork here
-    if args.broken:
-        found = False
-        for record in response.record:
-            if found:
-                break
-
-            states, energy, count, _ = record
-            for output, output_pos in outputs.items():
-                output_idx = [*response.variables].index(output_pos)
-                if states[output_idx] != ground_state_outputs[output]:
-                    found = True
-        print(f"{count} / {args.samples} ({100 * count / args.samples:.2f}%) of samples were in the broken state chosen")
-
-    output_state = dict(zip([*response.variables], states))
-
-    if not args.broken:
-        print(f"============= State {state_name} =================")
-        print(f"{count} / {args.samples} ({100 * count / args.samples:.2f}%) of samples found the ground state")
-        for output, output_pos in outputs.items():
-            print(f"output '{output}':")
-            print(f"  Ground state configuration: {ground_state_outputs[output]}")
-
-            pos1_count = 0
-            output_idx = [*response.variables].index(output_pos)
-            for record in response.record:
-                if record[0][output_idx] == 1:
-                    pos1_count += 1
-            neg1_count = args.samples - pos1_count
-
-            print(f"  {pos1_count}/{args.samples} ({100 * pos1_count / args.samples:.2f}%) of states had {output} = +1")
-            print(f"  {neg1_count}/{args.samples} ({100 * neg1_count / args.samples:.2f}%) of states had {output} = -1")
-            print("")
-
-    if args.no_plot:
-        continue
+parser.add_argument('--jobs', type=int, default=1) # The number of input states to anneal in parallel processes
+parser.add_argument('--seed', type=int) # Seeds the classical annealer so that runs can be reproduced
+parser.add_argument('--batch', action='store_true') # Samples every input state in a single combined problem submission
+parser.add_argument('--no-cache', action='store_true', dest='no_cache') # Parses the qca file again instead of reading the parsed-circuit cache
+parser.add_argument('--clocked', action='store_true') # Runs the four-phase clock pipeline, annealing one clock zone at a time
+parser.add_argument('--adaptive', type=float, metavar='WIDTH') # Samples each input state in chunks until every 95% confidence interval is narrower than WIDTH (e.g. 0.05); --samples is then the most taken
+parser.add_argument('--chunk', type=int, default=100) # The number of samples in each chunk of an --adaptive run
+parser.add_argument('--warm-start', action='store_true', dest='warm_start') # Visits input states in Gray code order, starting each anneal from the previous state's ground state (reverse annealing on the QPU)
+parser.add_argument('--decompose', type=int, metavar='N') # Solves circuits of more than N cells in parts of at most N cells (--jobs then runs parts in parallel)
+parser.add_argument('--symmetry', action='store_true') # Samples one input state of each set the circuit's symmetries (e.g. flipping every input, with no fixed cells) map onto each other, and mirrors the rest
+parser.add_argument('--profile', metavar='FILE') # Writes how long each stage of each input state took (with peak memory and QPU access times) to FILE as a Chrome trace
+parser.add_argument('--presolve', action='store_true') # Fixes the cells roof duality settles and eliminates cells of at most two neighbours before annealing
+
+def plot_state(args, cells, drivers, inputs, outputs, all_drivers, output_state, state_name):
+    from qca_plotting import plot_circuit
+    from profiling import span
 
     # The output state only contains the state of cells which the QPU solved. For every polarization,
     # we inject the driver states back in:
@@ -114,4 +48,161 @@ for input_state in range(num_input_states):
     title = None
     if args.title:
         title = args.title % state_name
-    plot_circuit(cells, drivers, inputs, outputs, polarizations = polarizations, title=title, filename=filename)
+    with span('plot', 'plot', state=state_name):
+        plot_circuit(cells, drivers, inputs, outputs, polarizations = polarizations, title=title, filename=filename)
+
+def main_clocked(args, cells, drivers, inputs, outputs):
+    from clocking import sweep_clocked
+
+    # Each zone is annealed on its own, driven by the zone before it, until the
+    # pipeline stops changing. The plotted state is what every cell settled to.
+    for (input_state, result, all_drivers, state_name) in sweep_clocked(cells, drivers, inputs, samples=args.samples, qpu_arch=args.arch, seed=args.seed):
+        print(f"============= State {state_name} =================")
+        settled = "settled" if result.settled else "had not settled"
+        print(f"The clock pipeline {settled} after {len(result.phases)} phases ({len(result.phases) * args.samples} samples)")
+        worst = min(result.phases, key=lambda phase: phase.ground_fraction)
+        print(f"Least reliable phase: clock zone {worst.zone} ({worst.num_cells} cells), where {100 * worst.ground_fraction:.2f}% of samples found the ground state")
+        for (output, pos) in outputs.items():
+            print(f"output '{output}': {result.state[pos]}")
+        print("")
+
+        if not args.no_plot:
+            plot_state(args, cells, drivers, inputs, outputs, all_drivers, result.state, state_name)
+
+def main_sweep(args, cells, drivers, inputs, outputs, session, jobs, adaptive):
+    from sweep import sweep
+    from analysis import ResultAnalysis
+    from qca_on_qpu import embedding_cache
+    from session import LOCAL_ARCHS
+    from profiling import span
+
+    # For each input, anneal the circuit's BQM (possibly over several processes).
+    # Extract statistics, outputs, and create visualizations in input-state order.
+    for (input_state, response, all_drivers, state_name) in sweep(cells, drivers, inputs, samples=args.samples, qpu_arch=args.arch, jobs=jobs, seed=args.seed, session=session, batch=args.batch, adaptive=adaptive, warm_start=args.warm_start, presolve=args.presolve, symmetry=args.symmetry):
+        with span('analysis', 'analysis', state=state_name):
+            analysis = ResultAnalysis(response, outputs)
+            samples = analysis.num_reads
+            row = analysis.ground_state()
+            count = analysis.occupancy(row)
+            ground_state_outputs = analysis.outputs_of(row)
+            marginals = analysis.marginals()
+
+        # Here, row and count correspond to the ground state
+        # if we want to find the best broken state, we fork here
+        if args.broken:
+            row = analysis.broken_state(row)
+            if row is None:
+                print(f"No samples had outputs that differ from the ground state for state {state_name}")
+                continue
+            count = analysis.occupancy(row)
+            print(f"{count} / {samples} ({100 * count / samples:.2f}%) of samples were in the broken state chosen")
+
+        output_state = analysis.state_of(row)
+
+        if not args.broken:
+            print(f"============= State {state_name} =================")
+            # A decomposed circuit's response is the single best state its
+            # descents found, which is not known to be the ground state.
+            decomposed = 'num_parts' in response.info
+            if decomposed:
+                print(f"Best state found by decomposition into {response.info['num_parts']} parts: energy {analysis.energies[row]:.6g} "
+                      f"after {response.info['restarts']} restarts (not verified to be the ground state)")
+            else:
+                print(f"{count} / {samples} ({100 * count / samples:.2f}%) of samples found the ground state")
+            if adaptive is not None:
+                stopped = "converged" if response.info['converged'] else "reached --samples before converging"
+                print(f"Adaptive sampling {stopped} after {response.info['effective_samples']} samples")
+            if 'degeneracy' in response.info:
+                print(f"Exact ground state energy {analysis.energies[row]:.6g}, shared by {response.info['degeneracy']} states")
+            for output in outputs:
+                print(f"output '{output}':")
+                print(f"  {'Best found' if decomposed else 'Ground state'} configuration: {ground_state_outputs[output]}")
+
+                pos1_count = marginals[output]
+                neg1_count = samples - pos1_count
+
+                print(f"  {pos1_count}/{samples} ({100 * pos1_count / samples:.2f}%) of states had {output} = +1")
+                print(f"  {neg1_count}/{samples} ({100 * neg1_count / samples:.2f}%) of states had {output} = -1")
+                print("")
+
+        if args.no_plot:
+            continue
+
+        plot_state(args, cells, drivers, inputs, outputs, all_drivers, output_state, state_name)
+
+    # Worker processes keep their own in-memory caches (and report each lookup as it
+    # happens), so the totals here only cover serial runs.
+    if args.arch not in LOCAL_ARCHS and jobs <= 1:
+        print(embedding_cache.report())
+
+def main(args):
+    import profiling
+    if args.profile is not None:
+        profiling.enable()
+
+    # Every way out of a run (including --only-plot's exit()) still writes the trace.
+    try:
+        run(args)
+    finally:
+        if args.profile is not None:
+            profiling.write(args.profile)
+
+def run(args):
+    from profiling import span
+
+    # Load the QCA file
+    with span('load_qca', 'parse', file=args.qca_file):
+        cells, drivers, inputs, outputs = load_qca(args.qca_file, args.ignore_rotated, args.spacing, cache=None if args.no_cache else circuit_cache)
+
+    if args.only_plot:
+        from qca_plotting import plot_circuit
+        plot_circuit(cells, drivers, inputs, outputs, title=args.title, filename=args.save)
+        exit()
+
+    if args.clocked:
+        # The clock pipeline runs one input state after another, annealing one
+        # zone at a time with a fixed number of samples, and reports each
+        # state's settled cells rather than a distribution of reads.
+        unsupported = [flag for (flag, used) in (('--jobs', args.jobs > 1), ('--batch', args.batch), ('--broken', args.broken),
+                                                 ('--adaptive', args.adaptive is not None), ('--decompose', args.decompose is not None),
+                                                 ('--warm-start', args.warm_start), ('--presolve', args.presolve),
+                                                 ('--symmetry', args.symmetry)) if used]
+        if unsupported:
+            parser.error(f"--clocked cannot be used with {', '.join(unsupported)}")
+        main_clocked(args, cells, drivers, inputs, outputs)
+        return
+
+    if args.adaptive is not None and args.batch:
+        parser.error('--adaptive and --batch cannot be used together')
+    if args.warm_start and args.batch:
+        parser.error('--warm-start and --batch cannot be used together')
+    if args.warm_start and args.jobs > 1 and args.decompose is None:
+        # (--decompose spends --jobs on the parts of each state instead.)
+        parser.error('--warm-start and --jobs cannot be used together')
+    if args.warm_start and args.symmetry:
+        parser.error('--warm-start and --symmetry cannot be used together')
+
+    from session import SamplerSession
+
+    # A decomposed circuit is solved one input state at a time, with --jobs
+    # spent on its parts instead.
+    session = None
+    jobs = args.jobs
+    if args.decompose is not None:
+        session = SamplerSession(args.arch, max_part_size=args.decompose, jobs=args.jobs, presolve=args.presolve)
+        jobs = 1
+
+    adaptive = None
+    if args.adaptive is not None:
+        from adaptive import AdaptiveSampling
+        adaptive = AdaptiveSampling(args.chunk, args.adaptive, outputs)
+
+    # A failed run still closes the session (and its decomposer's workers).
+    try:
+        main_sweep(args, cells, drivers, inputs, outputs, session, jobs, adaptive)
+    finally:
+        if session is not None:
+            session.close()
+
+if __name__ == '__main__':
+    main(parser.parse_args())
@@ -0,0 +1,157 @@
+import numpy as np
+from scipy.sparse import csr_matrix, hstack
+import dimod
+
+# A simulated annealer built for QCA's interaction graphs, which are sparse
+# lattices: every cell couples to at most the dozen cells within two cell
+# widths of it. The cells are split into colour classes, with no coupling
+# inside a class (a checkerboard, generalised to the radius-2 neighbourhood),
+# so every cell of a class can take its Metropolis step at once. Each step is
+# then a handful of array operations over one class of cells in every read
+# (replica) together: a sparse product for the cells' local fields, and one
+# comparison against the logs of uniform random numbers for the acceptance
+# test. Cells are renumbered class by class so that each class is a contiguous
+# block of rows in the (cells x reads) spin array.
+
+# Reads are annealed in batches of at most this many spins (cells x reads), to
+# bound the memory that large circuits take.
+BATCH_SPINS = 1 << 22
+
+# Circuits of up to this many cells use dense blocks: a dense product has far
+# less overhead per call than a sparse one, which matters more than its extra
+# arithmetic when the whole sweep is a few small products.
+DENSE_CELLS = 128
+
+def colour_classes(indptr, indices):
+    '''Greedily colour the graph in CSR form (indptr, indices) so that no two
+    neighbours share a colour. Returns each vertex's colour.'''
+    n = len(indptr) - 1
+    indptr = indptr.tolist()
+    indices = indices.tolist()
+    colours = [-1] * n
+    for v in range(n):
+        used = {colours[u] for u in indices[indptr[v]:indptr[v + 1]]}
+        c = 0
+        while c in used:
+            c += 1
+        colours[v] = c
+    return np.array(colours, dtype=np.int64)
+
+def _log_uniforms(rng, shape):
+    # log(u) for uniform u in (0, 1], as float32. Drawing float32s through the
+    # Generator is the slowest step of a sweep, so the uniforms are made from
+    # the raw 32-bit output instead: 23 random mantissa bits under the exponent
+    # of 1.0 give a float in [1, 2), and 2 minus that is in (0, 1].
+    size = int(np.prod(shape))
+    bits = rng.bit_generator.random_raw((size + 1) // 2).view(np.uint32)[:size].reshape(shape)
+    bits >>= 9
+    bits |= np.uint32(0x3f800000)
+    u = bits.view(np.float32)
+    np.subtract(2, u, out=u)
+    return np.log(u, out=u)
+
+class ColourBlocks:
+    '''A BQM set up for colour-class sweeps: its variables renumbered class by
+    class, and each class's rows of the coupling matrix (see the top of this
+    file). Spin arrays are (cells + 1) x reads float32s of +-1 in the renumbered
+    order, whose last row is all ones.'''
+
+    def __init__(self, bqm):
+        bqm = dimod.as_bqm(bqm).change_vartype(dimod.SPIN, inplace=False)
+        self.bqm = bqm
+        self.variables = list(bqm.variables)
+        n = self.n = len(self.variables)
+
+        # The symmetric coupling matrix, renumbered so that colour classes are
+        # contiguous, with the linear biases as an extra column. The spin array
+        # gets a matching last row of ones, which no block updates, so one
+        # product gives every cell's whole local field.
+        h, (row, col, J), self.offset = bqm.to_numpy_vectors(self.variables)
+        couplings = csr_matrix((np.concatenate((J, J)), (np.concatenate((row, col)), np.concatenate((col, row)))),
+                               shape=(n, n), dtype=np.float32)
+        colour = colour_classes(couplings.indptr, couplings.indices)
+        self.order = np.argsort(colour, kind='stable')
+        self.h = h[self.order].astype(np.float32)
+        self.couplings = hstack([couplings[self.order][:, self.order], csr_matrix(self.h[:, None])], format='csr')
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(colour, minlength=1))))
+        self.blocks = [(start, end, self.couplings[start:end]) for (start, end) in zip(bounds[:-1], bounds[1:])]
+        if n <= DENSE_CELLS:
+            self.blocks = [(start, end, block.toarray()) for (start, end, block) in self.blocks]
+
+    def random_spins(self, rng, reads):
+        spins = np.ones((self.n + 1, reads), dtype=np.float32)
+        spins[:self.n] = rng.choice(np.array([-1, 1], dtype=np.float32), size=(self.n, reads))
+        return spins
+
+    def sweep(self, spins, beta, rng):
+        '''One Metropolis sweep of `spins`, in place, at inverse temperature
+        `beta`: one value for every read, or an array of one per read.'''
+        # Flipping s changes the energy by dE = -2 s (h + J s'), and is
+        # accepted with probability min(1, exp(-beta dE)), i.e. when
+        # log(u) / (2 beta) < s (h + J s') for a uniform u.
+        thresholds = _log_uniforms(rng, (self.n, spins.shape[1]))
+        thresholds *= 0.5 / beta
+        for (start, end, block) in self.blocks:
+            s = spins[start:end]
+            field = block @ spins
+            field *= s
+            accept = thresholds[start:end] < field
+            # Flip the accepted spins by toggling their sign bits.
+            flip = accept.view(np.uint8).astype(np.int32)
+            flip <<= 31
+            np.bitwise_xor(s.view(np.int32), flip, out=s.view(np.int32))
+
+    def energies(self, spins):
+        '''The energy of every read in `spins`.'''
+        # The product is J s + h, so this is s . h + s . J s / 2.
+        s = spins[:self.n]
+        field = self.couplings @ spins
+        return 0.5 * np.einsum('ij,ij->j', s, field + self.h[:, None], dtype=np.float64) + self.offset
+
+    def sample_set(self, spins):
+        '''The reads of `spins` as a SampleSet of the BQM, one row per read.'''
+        samples = np.empty((spins.shape[1], self.n), dtype=np.int8)
+        samples[:, self.order] = spins[:self.n].T
+        return dimod.SampleSet.from_samples_bqm((samples, self.variables), self.bqm)
+
+class MetropolisSampler(dimod.Sampler):
+    '''Simulated annealing with colour-class Metropolis sweeps over all reads
+    at once (see the top of this file). It anneals on the same geometric
+    schedule over the same default beta range as neal, so its reads are
+    directly comparable, at several times neal's reads per second on QCA
+    circuits. Like neal, it takes `initial_states` as a (samples, labels) pair
+    with one row per read; otherwise every read starts from random spins.'''
+
+    parameters = {'num_reads': [], 'seed': [], 'num_sweeps': [], 'beta_range': [], 'initial_states': []}
+    properties = {}
+
+    def sample(self, bqm, num_reads = 10, seed = None, num_sweeps = 1000, beta_range = None, initial_states = None):
+        model = ColourBlocks(bqm)
+        if model.n == 0:
+            return model.sample_set(np.ones((1, num_reads), dtype=np.float32))
+
+        if beta_range is None:
+            from neal.sampler import default_beta_range
+            beta_range = default_beta_range(model.bqm)
+        betas = np.geomspace(beta_range[0], beta_range[-1], num_sweeps).astype(np.float32)
+
+        if initial_states is not None:
+            # Reorder the given states' columns into the sweep order.
+            (states, labels) = initial_states
+            column = {v: k for (k, v) in enumerate(labels)}
+            states = np.asarray(states)[:, [column[model.variables[v]] for v in model.order]]
+            if len(states) != num_reads:
+                raise ValueError('initial_states must have one row per read.')
+
+        rng = np.random.default_rng(seed)
+        batches = []
+        batch = max(1, BATCH_SPINS // model.n)
+        for first in range(0, num_reads, batch):
+            spins = model.random_spins(rng, min(batch, num_reads - first))
+            if initial_states is not None:
+                spins[:model.n] = states[first:first + spins.shape[1]].T
+            for beta in betas:
+                model.sweep(spins, beta, rng)
+            batches.append(spins)
+
+        return model.sample_set(np.concatenate(batches, axis=1))
@@ -0,0 +1,123 @@
+import math
+import numpy as np
+
+# Offsets of the interactions that the ICHA model in construct_bqm keeps: cells
+# along a row or column, and cells on an exact diagonal. Anything else (e.g. a
+# knight's move away) is treated as non-interacting.
+def is_axial(offset):
+    return offset[0] == 0 or offset[1] == 0
+
+def is_diagonal(offset):
+    return abs(offset[0]) == abs(offset[1])
+
+def neighbour_offsets(radius):
+    '''Integer offsets within `radius` of the origin (excluding the origin
+    itself) at which construct_bqm considers cells to interact. Returns a list
+    of (offset, r) tuples.'''
+
+    reach = int(math.floor(radius))
+    offsets = []
+    for dx in range(-reach, reach + 1):
+        for dy in range(-reach, reach + 1):
+            offset = (dx, dy)
+            if offset == (0, 0):
+                continue
+            if not (is_axial(offset) or is_diagonal(offset)):
+                continue
+            # np.linalg.norm is used (rather than math.hypot) so that the
+            # couplings are bit-for-bit the same as the old pairwise scan.
+            r = np.linalg.norm(np.array(offset))
+            if r <= radius + 1e-9:
+                offsets.append((offset, r))
+
+    return offsets
+
+class NeighbourIndex:
+    '''Grid-keyed lookup of the cells near each cell.
+
+    The integer (x, y) keys produced by load_qca already form a perfect spatial
+    hash with a bucket size of one cell, so finding every cell within a radius
+    of another is a fixed number of dict lookups. Building all neighbour pairs
+    is therefore linear in the number of cells rather than quadratic.'''
+
+    def __init__(self, cells):
+        '''Build the index from a dict keyed by integer (x, y) tuples. The
+        insertion order of `cells` is remembered so that pairs can be reported
+        in the same (earlier, later) order as a pairwise scan would.'''
+
+        self.order = {pos: i for (i, pos) in enumerate(cells)}
+
+    def __contains__(self, pos):
+        return pos in self.order
+
+    def __len__(self):
+        return len(self.order)
+
+    def pairs(self, radius=2):
+        '''Yield (pos_i, pos_j, offset, r) for every pair of indexed cells whose
+        center-to-center distance is at most `radius` (in cell units).
+
+        Pairs come out in exactly the order a scan over every (i, j > i) pair
+        of the original cell ordering would produce them. This matters because
+        dimod orders a BQM's variables by their first appearance.'''
+
+        offsets = neighbour_offsets(radius)
+        order = self.order
+        for pos_i, i in order.items():
+            x, y = pos_i
+            later = []
+            for (dx, dy), r in offsets:
+                pos_j = (x + dx, y + dy)
+                j = order.get(pos_j)
+                if j is not None and j > i:
+                    later.append((j, pos_j, (dx, dy), r))
+
+            # At most a handful of neighbours, so this sort is constant time.
+            later.sort(key=lambda item: item[0])
+            for (_, pos_j, offset, r) in later:
+                yield pos_i, pos_j, offset, r
+
+def neighbour_pairs(positions, radius=2):
+    '''Array version of NeighbourIndex.pairs for an (n, 2) integer array of
+    cell positions. Every position is packed into a single integer key on a
+    padded grid, so the lookup for each offset is one batched searchsorted.
+
+    Returns (i, j, offsets, r): index arrays with i < j for each interacting
+    pair, and the (dx, dy) offset from i to j and distance between them.'''
+
+    offsets = neighbour_offsets(radius)
+    positions = np.asarray(positions, dtype=np.int64).reshape(-1, 2)
+    n = positions.shape[0]
+    if n == 0 or not offsets:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros((0, 2), dtype=np.int64), np.zeros(0)
+
+    # Pad the grid by the reach of the offsets so that stepping off one column
+    # never lands on a valid key in the next.
+    reach = int(math.floor(radius))
+    low = positions.min(axis=0) - reach
+    width = int(positions[:, 1].max() - low[1]) + reach + 1
+    keys = (positions[:, 0] - low[0]) * width + (positions[:, 1] - low[1])
+
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    all_i, all_j, all_k = [], [], []
+    for k, ((dx, dy), _) in enumerate(offsets):
+        target = keys + (dx * width + dy)
+        idx = np.searchsorted(sorted_keys, target)
+        idx[idx == n] = 0
+        found = sorted_keys[idx] == target
+        i = np.nonzero(found)[0]
+        j = order[idx[found]]
+        later = j > i
+        all_i.append(i[later])
+        all_j.append(j[later])
+        all_k.append(np.full(np.count_nonzero(later), k, dtype=np.int64))
+
+    i = np.concatenate(all_i)
+    j = np.concatenate(all_j)
+    k = np.concatenate(all_k)
+    offset_table = np.array([offset for (offset, _) in offsets], dtype=np.int64)
+    r_table = np.array([r for (_, r) in offsets])
+    return i, j, offset_table[k], r_table[k]
@@ -0,0 +1,71 @@
+import numpy as np
+
+class PackedSamples:
+    '''Spin samples stored eight cells to a byte.
+
+    Row i of `bits` holds read i, with cell j in bit (j % 8) of byte (j // 8);
+    a set bit is a +1 spin. Rows can be compared, hashed and deduplicated
+    without unpacking them, and per-cell +1 counts are read straight off the
+    packed bits. Samples are packed from a sampler's int8 response, which has
+    to exist first, so packing doesn't lower the peak memory of a run.'''
+
+    def __init__(self, bits, num_variables):
+        self.bits = np.ascontiguousarray(bits, dtype=np.uint8)
+        self.num_variables = num_variables
+
+    @classmethod
+    def from_spins(cls, samples):
+        '''Pack an (N, n) array of +/-1 spins.'''
+        samples = np.asarray(samples)
+        return cls(np.packbits(samples > 0, axis=1, bitorder='little'), samples.shape[1])
+
+    def __len__(self):
+        return self.bits.shape[0]
+
+    @property
+    def nbytes(self):
+        return self.bits.nbytes
+
+    def __eq__(self, other):
+        return (isinstance(other, PackedSamples) and self.num_variables == other.num_variables
+                and np.array_equal(self.bits, other.bits))
+
+    def __getitem__(self, rows):
+        '''The packed samples of a subset of reads (an index array or mask).'''
+        return PackedSamples(self.bits[rows], self.num_variables)
+
+    def spins(self, rows=slice(None)):
+        '''Unpack reads back to int8 +/-1 spins.'''
+        bits = np.unpackbits(self.bits[rows], axis=-1, count=self.num_variables, bitorder='little')
+        return (2 * bits.astype(np.int8) - 1)
+
+    def columns(self, columns):
+        '''The +/-1 spins of a few cells (by column index), as an (N, k) int8 array.'''
+        columns = np.asarray(columns, dtype=np.int64)
+        bits = (self.bits[:, columns >> 3] >> (columns & 7).astype(np.uint8)) & 1
+        return 2 * bits.astype(np.int8) - 1
+
+    def keys(self):
+        '''One hashable, comparable fixed-width bytes value per read.'''
+        width = self.bits.shape[1]
+        return self.bits.view(np.dtype((np.void, width))).ravel()
+
+    def equal_to(self, row):
+        '''Mask of the reads that are identical to read `row`.'''
+        return np.all(self.bits == self.bits[row], axis=1)
+
+    def unique(self):
+        '''Deduplicate reads. Returns (first, inverse): the index of the first
+        read of each distinct sample, and the distinct sample of each read.'''
+        _, first, inverse = np.unique(self.keys(), return_index=True, return_inverse=True)
+        return first, inverse.ravel()
+
+    def popcount(self, weights=None):
+        '''The number of reads (or total weight, e.g. num_occurrences) in which
+        each cell is +1.'''
+        if weights is None:
+            weights = np.ones(len(self), dtype=np.int64)
+        counts = np.zeros(self.bits.shape[1] * 8, dtype=np.asarray(weights).dtype)
+        for bit in range(8):
+            counts[bit::8] = weights @ ((self.bits >> bit) & 1)
+        return counts[:self.num_variables]
@@ -0,0 +1,98 @@
+import itertools
+
+import numpy as np
+import dimod
+
+# Shrinks a circuit's BQM before it is sampled, without changing its ground
+# states, and expands the samples of the smaller BQM back to every cell:
+#
+#   1. roof duality fixes every variable whose value it can prove is the same
+#      in all ground states (strong persistency), e.g. cells pinned by a driver;
+#   2. variables with at most two neighbours are eliminated. The best value of
+#      such a cell depends only on its neighbours, so it is minimised out and
+#      its neighbours get the bias and coupling that leave the rest of the
+#      energy landscape's minima unchanged. Eliminating the first cell of a
+#      wire (whose other neighbours are a driver or nothing) leaves the next one
+#      with two neighbours, so whole wires collapse one cell at a time, into
+#      the gates they connect.
+#
+# A sample of the smaller BQM is expanded by setting each eliminated cell, in
+# reverse order, to its best value given its neighbours. Ties (a cell that its
+# neighbours leave free) are broken at random, as an annealer would.
+
+class Presolve:
+    '''The presolved form of `bqm` (a SPIN BQM). `bqm` is the smaller BQM to
+    sample, `fixed` maps the variables roof duality fixed to their values, and
+    `eliminated` lists (variable, linear bias, {neighbour: coupling}) for the
+    eliminated variables, in the order they were eliminated.'''
+
+    def __init__(self, bqm, seed = None):
+        self.original = dimod.as_bqm(bqm).change_vartype(dimod.SPIN, inplace=False)
+        self.rng = np.random.default_rng(seed)
+        reduced = self.original.copy()
+
+        from dwave.preprocessing import roof_duality
+        _, self.fixed = roof_duality(reduced, strict=True)
+        self.fixed = {v: int(value) for (v, value) in self.fixed.items()}
+        reduced.fix_variables(self.fixed)
+
+        self.eliminated = []
+        pending = [v for v in reduced.variables if reduced.degree(v) <= 2]
+        while pending:
+            v = pending.pop()
+            if v not in reduced.variables or reduced.degree(v) > 2:
+                continue
+            neighbours = {u: reduced.quadratic[(v, u)] for u in reduced.adj[v]}
+            self.eliminated.append((v, reduced.linear[v], neighbours))
+            self._eliminate(reduced, v, reduced.linear[v], neighbours)
+            pending.extend(u for u in neighbours if reduced.degree(u) <= 2)
+
+        self.bqm = reduced
+
+    @staticmethod
+    def _eliminate(bqm, v, bias, neighbours):
+        # The lowest energy of v's terms for each assignment of its neighbours,
+        # -|h + sum J s|, as a constant plus biases and a coupling on the
+        # neighbours (any function of two spins can be written this way).
+        labels = list(neighbours)
+        spins = np.array(list(itertools.product([-1, 1], repeat=len(labels))), dtype=np.float64).reshape(2 ** len(labels), len(labels)).T
+        couplings = np.array([neighbours[u] for u in labels], dtype=np.float64)
+        best = -np.abs(bias + couplings @ spins)
+
+        bqm.remove_variable(v)
+        bqm.offset += best.mean()
+        for (k, u) in enumerate(labels):
+            bqm.add_linear(u, (best * spins[k]).mean())
+        if len(labels) == 2:
+            bqm.add_quadratic(labels[0], labels[1], (best * spins[0] * spins[1]).mean())
+
+    def expand(self, response):
+        '''A SampleSet over every variable of the original BQM, with one row
+        per read of `response` (a SampleSet of `bqm`) and energies of the
+        original BQM.'''
+        record = response.record
+        reads = np.repeat(np.arange(len(record)), record.num_occurrences)
+        variables = list(self.original.variables)
+        column = {v: k for (k, v) in enumerate(variables)}
+
+        samples = np.zeros((len(reads), len(variables)), dtype=np.int8)
+        for (k, v) in enumerate(response.variables):
+            samples[:, column[v]] = record.sample[reads, k]
+        for (v, value) in self.fixed.items():
+            samples[:, column[v]] = value
+        for (v, bias, neighbours) in reversed(self.eliminated):
+            field = bias + sum(coupling * samples[:, column[u]] for (u, coupling) in neighbours.items())
+            field = np.broadcast_to(field, len(reads))
+            ties = np.isclose(field, 0)
+            samples[:, column[v]] = np.where(ties, self.rng.choice([-1, 1], size=len(reads)), -np.sign(field))
+
+        # An exact solver's count of ground states is of the smaller BQM, and
+        # no longer counts those of the original, so it is dropped.
+        info = {key: value for (key, value) in response.info.items() if key != 'degeneracy'}
+        vectors = {name: record[name][reads] for name in record.dtype.names if name not in ('sample', 'energy', 'num_occurrences')}
+        return dimod.SampleSet.from_samples_bqm((samples, variables), self.original, info=info, **vectors)
+
+    def empty_response(self, samples):
+        '''A response of `samples` reads of `bqm` for when presolving left no
+        variables to sample.'''
+        return dimod.SampleSet.from_samples_bqm((np.empty((samples, 0), dtype=np.int8), []), self.bqm)
@@ -0,0 +1,107 @@
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+
+# Span timing for a run, written out as a Chrome trace (open it in
+# chrome://tracing or https://ui.perfetto.dev). Every stage of a run (parsing,
+# building BQMs, presolving, embedding, sampling, analysis and plotting) is
+# wrapped in a span, which is recorded as one complete ('X') event with the
+# process's peak memory when it ended. QPU responses add an event for their
+# QPU access time, with the rest of their timing info as its arguments.
+#
+# Profiling is off unless enable() is called. Until then span() hands back one
+# shared do-nothing context manager, so instrumented code costs a function call
+# and a test per span.
+
+# The recorded events, or None when profiling is off.
+_events = None
+
+def enable():
+    '''Start recording spans in this process.'''
+    global _events
+    if _events is None:
+        _events = []
+
+def enabled():
+    return _events is not None
+
+def _now():
+    # Microseconds on the monotonic clock, which worker processes share.
+    return time.perf_counter_ns() / 1000
+
+def peak_memory_mb():
+    '''The peak resident memory of this process so far, in MB, or None where
+    that isn't available.'''
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes and macOS bytes.
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / (1 << 10)
+
+class _Span:
+    __slots__ = ('name', 'cat', 'args', 'start')
+
+    def __init__(self, name, cat, args):
+        self.name = name
+        self.cat = cat
+        self.args = args
+
+    def __enter__(self):
+        self.start = _now()
+        return self
+
+    def __exit__(self, *exc):
+        end = _now()
+        self.args['peak_memory_mb'] = peak_memory_mb()
+        _events.append({'name': self.name, 'cat': self.cat, 'ph': 'X', 'ts': self.start, 'dur': end - self.start,
+                        'pid': os.getpid(), 'tid': threading.get_ident(), 'args': self.args})
+
+_NULL_SPAN = contextlib.nullcontext()
+
+def span(name, cat = 'run', **args):
+    '''A context manager that records the time spent in its block as a span
+    named `name` in category `cat`, with `args` attached (e.g. the input
+    state). Does nothing when profiling is off.'''
+    if _events is None:
+        return _NULL_SPAN
+    return _Span(name, cat, args)
+
+def record_qpu_timing(response):
+    '''Record the QPU access time of a response that has just come back, as an
+    event ending now, with its whole timing info (in microseconds, as the
+    D-Wave service reports it) as the arguments.'''
+    if _events is None:
+        return
+    timing = response.info.get('timing')
+    if not timing or 'qpu_access_time' not in timing:
+        return
+    duration = float(timing['qpu_access_time'])
+    _events.append({'name': 'qpu access', 'cat': 'qpu', 'ph': 'X', 'ts': _now() - duration, 'dur': duration,
+                    'pid': os.getpid(), 'tid': threading.get_ident(), 'args': dict(timing)})
+
+def drain():
+    '''The events recorded so far (an empty list when profiling is off), which
+    are then forgotten. Worker processes hand these back with their results.'''
+    global _events
+    if _events is None:
+        return []
+    events, _events = _events, []
+    return events
+
+def extend(events):
+    '''Add events recorded by another process.'''
+    if _events is not None:
+        _events.extend(events)
+
+def write(path):
+    '''Write every event recorded so far to `path` in the Chrome trace format.'''
+    pids = sorted({event['pid'] for event in _events or []})
+    names = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'args': {'name': 'main' if pid == os.getpid() else f'worker {pid}'}}
+             for pid in pids]
+    with open(path, 'w') as fp:
+        json.dump({'traceEvents': names + (_events or []), 'displayTimeUnit': 'ms'}, fp)
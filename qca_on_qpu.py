@@ -1,146 +1,252 @@
-import math
 import numpy as np
-import itertools
-
-import dwave
-import dwave.embedding
-import dwave.inspector
-from dwave.system import DWaveSampler, EmbeddingComposite
-from dwave.cloud import Client
-from dwave.cloud.exceptions import SolverNotFoundError
+from collections import namedtuple
+
 import dimod
-from dimod.reference.samplers import ExactSolver
-from minorminer import find_embedding
-import neal
+
+from neighbours import NeighbourIndex, is_axial, neighbour_pairs
+from cell_table import as_cell_table
+from embedding_cache import EmbeddingCache
+from session import SamplerSession
+from analysis import aggregate
+from profiling import span, record_qpu_timing
 
 ADJACENT_DIRECTIONS = np.array([[-1, 0], [0, 1], [1, 0], [0, -1]])
 DIAGONAL_DIRECTIONS = np.array([[-1, -1], [-1, 1], [1, -1], [1, 1]])
 
+# The same directions paired with their lengths, for the driver lookups in
+# construct_bqm.
+ADJACENT_OFFSETS = [(tuple(int(d) for d in direction), np.linalg.norm(direction)) for direction in ADJACENT_DIRECTIONS]
+DIAGONAL_OFFSETS = [(tuple(int(d) for d in direction), np.linalg.norm(direction)) for direction in DIAGONAL_DIRECTIONS]
+
 # The kink energy for adjacent cells (i.e. cells with a center to center distance
 # of 1 unit)
 Ek0 = 1.0
 # Tunnelling Energy
 t = 0.01 * Ek0
 
-def anneal(cells, drivers, samples = 500, qpu_arch = 'classical'):
-    # get DWave sampler and target mapping edgelist
-    if qpu_arch == 'classical':
-        # print('Choosing classical sampler...')
-        sampler = neal.SimulatedAnnealingSampler()
+# Embeddings found for QPU runs, shared by every anneal in this process (and
+# kept on disk between runs).
+embedding_cache = EmbeddingCache()
+
+# The QPU schedule of a warm-started (reverse) anneal, as (time in us, s)
+# points: from the initial state at s = 1 back to s = 0.45, where the
+# transverse field is strong enough for cells to tunnel but the initial state's
+# structure survives, a pause there, and forward to s = 1 again.
+REVERSE_ANNEAL_SCHEDULE = [[0.0, 1.0], [5.0, 0.45], [15.0, 0.45], [20.0, 1.0]]
+
+def warm_start_params(sampler, bqm, initial_state, samples):
+    '''The sampler parameters that start every read of `bqm` from
+    `initial_state` (variable -> spin), for samplers that support it. Classical
+    samplers start each read there, with a schedule that begins halfway
+    (geometrically) between their default hot and cold temperatures so as not
+    to melt it straight away; QPU samplers reverse anneal from it. Samplers
+    that can't be warm started get no parameters.'''
+    if 'initial_states' in sampler.parameters:
+        variables = list(bqm.variables)
+        states = np.tile(np.array([initial_state[v] for v in variables], dtype=np.int8), (samples, 1))
+        params = {'initial_states': (states, variables)}
+        if 'beta_range' in sampler.parameters:
+            from neal.sampler import default_beta_range
+            hot, cold = default_beta_range(bqm)
+            params['beta_range'] = (np.sqrt(hot * cold), cold)
+        return params
+    if 'initial_state' in sampler.parameters:
+        return {'initial_state': dict(initial_state), 'anneal_schedule': REVERSE_ANNEAL_SCHEDULE, 'reinitialize_state': True}
+    return {}
+
+def anneal(cells, drivers, samples = 500, qpu_arch = 'classical', bqm = None, seed = None, embeddings = None, session = None, initial_state = None):
+    # A prebuilt BQM (e.g. from a CircuitModel) can be passed in to skip construction.
+    if bqm is None:
+        with span('construct_bqm', 'build'):
+            bqm = construct_bqm(cells, drivers)
+
+    # Runs that anneal more than once should share one SamplerSession, so that the
+    # solver is only chosen and connected to once. Otherwise, set one up just for
+    # this call.
+    if session is None:
+        with SamplerSession(qpu_arch, embeddings=embeddings) as session:
+            return anneal(cells, drivers, samples, qpu_arch, bqm, seed, embeddings, session, initial_state)
+
+    # A presolving session anneals the smaller BQM left once every cell that
+    # can be settled without sampling has been (see presolve.py).
+    presolved = None
+    if session.presolve:
+        from presolve import Presolve
+        with span('presolve', 'build', variables=bqm.num_variables):
+            presolved = Presolve(bqm, seed)
+        bqm = presolved.bqm
+
+    if presolved is not None and bqm.num_variables == 0:
+        response = presolved.empty_response(samples)
     else:
-        # print('Choosing solver...')
-        client = Client.from_config()
-        solver = None
-        qca_arch = 'pegasus'
-        try:
-            if qpu_arch == 'zephyr':
-                solver = client.get_solver('Advantage2_prototype1.1').id
-            elif qpu_arch == 'pegasus':
-                solver = client.get_solver('Advantage_system4.1').id
-            elif qpu_arch == 'chimera':
-                solver = client.get_solver('DW_2000Q_6').id
-            else:
-                raise ValueError('Specified QPU architecture is not supported.')
-        except SolverNotFoundError:
-            # print(f'The pre-programmed D-Wave solver name for architecture '
-            #         '\'{qpu_arch}\' is not available. Find the latest available '
-            #         'solvers by:\n'
-            #         'from dwave.cloud import Client\nclient = Client.from_config()\n'
-            #         'client.get_solvers()\nAnd update this script.')
-            raise
-
-        # get the specified QPU
-        dwave_sampler = DWaveSampler(solver=solver)
-
-        # run the problem
-        use_result = []
-        sampler = None
-        response = None
-        # print('Choosing D-Wave QPU as sampler...')
-        sampler = EmbeddingComposite(dwave_sampler)
-
-    bqm = construct_bqm(cells, drivers)
-    response = sampler.sample(bqm, num_reads=samples)
-    # print('Problem completed from selected sampler.')
+        # get the sampler (the QPU is wrapped in the circuit's cached embedding)
+        sampler = session.sampler_for(bqm)
+
+        # Only the classical annealer can be seeded; the QPU is not reproducible.
+        params = {}
+        if seed is not None and session.classical:
+            params['seed'] = seed
+        # A known good state (e.g. the ground state of a neighbouring input state)
+        # can be given as a starting point.
+        if initial_state is not None:
+            params.update(warm_start_params(sampler, bqm, initial_state, samples))
+        with span('sample', 'sample', reads=samples, variables=bqm.num_variables):
+            response = sampler.sample(bqm, num_reads=samples, **params)
+            # Realised here, as QPU responses are resolved lazily.
+            response.resolve()
+        record_qpu_timing(response)
+        # print('Problem completed from selected sampler.')
+
+    # The classical annealer gives one unsorted row per read. Tally and sort them
+    # so that its results have the same format as the QPU's. Expanded responses
+    # have one row per read too, whichever sampler they came from.
+    if presolved is not None:
+        with span('expand', 'build'):
+            response = presolved.expand(response)
+    if session.classical or presolved is not None:
+        with span('aggregate', 'analysis'):
+            response = aggregate(response)
 
     return response
 
-
-def construct_bqm(cells, drivers):
+def construct_bqm(cells, drivers, radius = 2):
     # Using ICHA, and only considering direct neighbours (diagonals included)
     linear = {}
     quadratic = {}
 
-    def sum_neighbours(pos, rot, directions, cb):
-        pos = np.array(pos)
+    def sum_neighbours(pos, rot, directions):
         total = 0
-        for i in range(directions.shape[0]):
-            total += cb(pos, rot, pos + directions[i, :])
+        for (direction, r) in directions:
+            total += driver_contribution(rot, (pos[0] + direction[0], pos[1] + direction[1]), r)
         return total
 
-    def driver_contribution(pos, rot, other_pos):
-        other_pos_tuple = (other_pos[0], other_pos[1])
-
-        if other_pos_tuple in drivers:
-            other_pol, other_rot = drivers[other_pos_tuple]
+    def driver_contribution(rot, other_pos, r):
+        if other_pos in drivers:
+            other_pol, other_rot = drivers[other_pos]
 
             # We only consider interaction if the cells have the same
             # rotation. Alternately rotated cells have no interaction
             # due to the symmetry of the problem.
             if other_rot == rot:
-                r = np.linalg.norm(pos - other_pos)
-
                 # The cells should alternate if they're in a rotated wire
                 if rot:
                     relationship = -1
                 else:
                     relationship = 1
 
-                return relationship * other_pol / r ** 5
+                # A driver pulls this cell towards its own polarization, so it
+                # enters the linear term with the opposite sign.
+                return -relationship * other_pol / r ** 5
 
         return 0
 
-    def scale_func(f, multiplier):
-       return lambda *args, **kwargs: -f(*args, **kwargs)
+    # Each cell's rotation, by position, read off the cell table once.
+    cells = as_cell_table(cells)
+    rotated = dict(zip(cells, cells.rot.tolist()))
 
-    cell_order = list(cells)
-    for (i, pos_i) in enumerate(cells):
+    for (pos_i, rot_i) in rotated.items():
         # The linear term includes the effect of drivers on this cell.
         linear[pos_i] = 0
-        rot_i = cells[pos_i]["rot"]
-        linear[pos_i] += sum_neighbours(pos_i, rot_i, ADJACENT_DIRECTIONS, scale_func(driver_contribution, -Ek0))
-        linear[pos_i] += sum_neighbours(pos_i, rot_i, DIAGONAL_DIRECTIONS, scale_func(driver_contribution, Ek0))
-
-        # Cells that are adjacent to this one should have a negative energy
-        # contribution when the quadratic term is positive (i.e. they are of
-        # the same sign) and a positive sign when the quadratic term is negative.
-
-        # The quadratic term includes the effect of adjacent non-driver cells. This could also
-        # be computed by a fixed-time neighbour lookup as we do for the linear case,
-        # but the code would get more complex because we need to know the indexes
-        # and avoid double-counting embedding graph edges. Instead we just eat this O(n^2),
-        # because n is small.
-        for j in range(i+1, len(cells)):
-            pos_j = cell_order[j]
-            # We assume (and it is true when cell i and j are directly adjacent) that
-            # there is no interaction between rotated and unrotated cells.
-            if cells[pos_j]["rot"] != rot_i:
-                continue
-
-            # -1 if the cells want to alternate, 1 if they don't alternate.
-            relationship = -1 if rot_i else 1
-
-            # If cells i and j are adjacent, 
-            r = np.linalg.norm(np.array(pos_i) - np.array(pos_j))
-            if (r > 0.99 and r < 1.01) or (r > 1.99 and r < 2.01): # r ~= 1, r ~= 2
-                # adjacent (negative energy terms means they should be the same signs)
-                quadratic[(pos_i, pos_j)] = -Ek0 / r ** 5 * relationship
-            elif r > 1.4 and r < 1.42: # r ~= sqrt(2)
-                # diagonal (positive energy term means they should be opposite signs)
-                quadratic[(pos_i, pos_j)] = Ek0 / r ** 5 * relationship
+        linear[pos_i] += sum_neighbours(pos_i, rot_i, ADJACENT_OFFSETS)
+        linear[pos_i] += sum_neighbours(pos_i, rot_i, DIAGONAL_OFFSETS)
+
+    # Cells that are adjacent to this one should have a negative energy
+    # contribution when the quadratic term is positive (i.e. they are of
+    # the same sign) and a positive sign when the quadratic term is negative.
+
+    # The quadratic term includes the effect of nearby non-driver cells. These
+    # are found through a grid-keyed neighbour index, so this is linear in the
+    # number of cells rather than a scan over every pair.
+    for (pos_i, pos_j, offset, r) in NeighbourIndex(rotated).pairs(radius):
+        rot_i = rotated[pos_i]
+        # We assume (and it is true when cell i and j are directly adjacent) that
+        # there is no interaction between rotated and unrotated cells.
+        if rotated[pos_j] != rot_i:
+            continue
+
+        # -1 if the cells want to alternate, 1 if they don't alternate.
+        relationship = -1 if rot_i else 1
+
+        if is_axial(offset):
+            # adjacent (negative energy terms means they should be the same signs)
+            quadratic[(pos_i, pos_j)] = -Ek0 / r ** 5 * relationship
+        else:
+            # diagonal (positive energy term means they should be opposite signs)
+            quadratic[(pos_i, pos_j)] = Ek0 / r ** 5 * relationship
 
     # construct a bqm containing the provided self-biases (linear) and couplings
     # (quadratic). Specify the problem as SPIN (Ising).
     # print('Constructing BQM...')
     bqm = dimod.BinaryQuadraticModel(linear, quadratic, 0, dimod.SPIN)
     return bqm
+
+
+# Contiguous array form of a cell layout. Row k of every array describes the
+# same cell: its integer (x, y) position, whether it is rotated, whether it is
+# a driver (fixed or input) and, for drivers, its polarization. Non-driver cells
+# come first, in the order of the cell table, so their row index doubles as
+# their BQM variable label.
+CellArrays = namedtuple('CellArrays', ['positions', 'rot', 'driver', 'pol'])
+
+def cell_arrays(cells, drivers):
+    cells = as_cell_table(cells)
+    n_cells = len(cells)
+    n = n_cells + len(drivers)
+
+    positions = np.empty((n, 2), dtype=np.int64)
+    rot = np.empty(n, dtype=bool)
+    pol = np.zeros(n, dtype=np.float64)
+    driver = np.zeros(n, dtype=bool)
+    driver[n_cells:] = True
+
+    positions[:n_cells] = cells.positions
+    rot[:n_cells] = cells.rot
+
+    for (k, (pos, (driver_pol, driver_rot))) in enumerate(drivers.items(), n_cells):
+        positions[k] = pos
+        rot[k] = driver_rot
+        pol[k] = driver_pol
+
+    return CellArrays(positions, rot, driver, pol)
+
+def driver_weights(layout, i, j, r):
+    # The bias that each driver puts on each nearby cell, per unit of driver
+    # polarization. Only drivers directly adjacent or diagonal to a cell count.
+    # Given the (i < j) pairs from neighbour_pairs, returns the cell indices,
+    # driver indices and weights of every driver-cell interaction. Since drivers
+    # come after every cell in a CellArrays, the driver is always j.
+    driven = (layout.rot[i] == layout.rot[j]) & ~layout.driver[i] & layout.driver[j] & (r < 1.5)
+    # -1 if the cells want to alternate, 1 if they don't alternate.
+    relationship = np.where(layout.rot[i[driven]], -1.0, 1.0)
+    # A driver pulls a cell towards its own polarization, so it enters the
+    # linear term with the opposite sign.
+    return i[driven], j[driven], -relationship / r[driven] ** 5
+
+def construct_bqm_arrays(cells, drivers, radius = 2):
+    # The same Hamiltonian as construct_bqm, but built with batched array operations
+    # and handed to dimod as COO vectors. Variables are labelled 0..n-1 rather than
+    # by position; the returned (n, 2) positions array maps each label back to its
+    # (x, y) cell.
+    layout = cell_arrays(cells, drivers)
+    n_cells = len(cells)
+
+    i, j, offsets, r = neighbour_pairs(layout.positions, radius)
+
+    # There is no interaction between rotated and unrotated cells.
+    same_rot = layout.rot[i] == layout.rot[j]
+    # -1 if the cells want to alternate, 1 if they don't alternate.
+    relationship = np.where(layout.rot[i], -1.0, 1.0)
+
+    # Couplings between two non-driver cells. Adjacent cells (in a line) want the
+    # same sign, and diagonal cells want opposite signs.
+    coupled = same_rot & ~layout.driver[i] & ~layout.driver[j]
+    axial = (offsets[:, 0] == 0) | (offsets[:, 1] == 0)
+    sign = np.where(axial[coupled], -1.0, 1.0)
+    quadratic = sign * Ek0 / r[coupled] ** 5 * relationship[coupled]
+
+    cell_idx, driver_idx, weights = driver_weights(layout, i, j, r)
+    linear = np.bincount(cell_idx, weights=weights * layout.pol[driver_idx], minlength=n_cells)
+
+    bqm = dimod.BinaryQuadraticModel.from_numpy_vectors(
+        linear, (i[coupled], j[coupled], quadratic), 0, dimod.SPIN)
+    return bqm, layout.positions[:n_cells]
@@ -1,9 +1,8 @@
 import numpy as np
 from matplotlib.patches import FancyBboxPatch
 from matplotlib import pyplot as plt
-from scipy.optimize import curve_fit
-import itertools
 from utils import *
+from cell_table import as_cell_table
 
 # These are ordered such that angle 0 and 2 being in the "on" state indicates
 # the polarization is +1, and vice versa for the -1 and angles 1 and 3
@@ -47,9 +46,9 @@ def plot_circuit(cells, drivers, inputs, outputs, polarizations = {}, title = No
     for pos, (pol, rot) in drivers.items():
         draw_cell(ax, pos, pol, rot, bg_color="#797C8C", dot_color="#637AF9", active_edge_color="#ADB8F7", edge_color="#2a2f58", **kwargs)
 
-    for pos, cell in cells.items():
+    cells = as_cell_table(cells)
+    for pos, rot in zip(cells, cells.rot.tolist()):
         pol = polarizations.get(pos)
-        rot = cell["rot"]
 
         name = output_lookup.get(pos)
         if name == None:
@@ -0,0 +1,307 @@
+'''
+Streaming reader for QCADesigner files.
+
+Unlike qcadtrans.ParserNode, which builds a tree of the whole file before any
+cell can be read, this reads the file in chunks and yields each cell as soon as
+it has been read. Only the current chunk and cell are held in memory, and there
+is no recursion, so designs of any size can be loaded. The cells it yields are
+identical to those QCACircuit extracts.
+'''
+
+from collections import namedtuple
+import gc
+import re
+
+# cell-type flags, as in qcadtrans._CFs
+CFs = {'normal': 0, 'input': 1, 'output': 2, 'fixed': 3}
+
+# cell-type tags in QCADesigner files
+QCAD_CFs = {'QCAD_CELL_NORMAL': CFs['normal'],
+            'QCAD_CELL_INPUT':  CFs['input'],
+            'QCAD_CELL_OUTPUT': CFs['output'],
+            'QCAD_CELL_FIXED':  CFs['fixed']}
+
+DESIGN_TAG = 'TYPE:DESIGN'
+CELL_TAG = 'TYPE:QCADCell'
+OBJECT_TAG = 'TYPE:QCADDesignObject'
+DOT_TAG = 'TYPE:CELL_DOT'
+
+Q0 = 1.60218e-19    # elementary charge
+
+QCADot = namedtuple('QCADot', ['x', 'y', 'q'])
+
+# One cell of a design. x and y are in QCADesigner's units (nm), cf is one of
+# CFs, pol is the polarization of fixed cells, rot is True for 45 degree rotated
+# cells, dots are the cell's four QCADots, name is the label of an input or
+# output (else None) and clock is the cell's clock zone (0-3).
+CellRecord = namedtuple('CellRecord', ['x', 'y', 'cf', 'pol', 'rot', 'dots', 'name', 'clock'])
+
+# key=val pair, with the same character set as ParserNode so that values with
+# other characters (e.g. names like "N(AANDB)") are cut short the same way
+_rgx_val = re.compile(r'([a-zA-Z0-9_\.\-\+]+)=([a-zA-Z0-9_\.\-\+]+)')
+
+# keys read at each level of a cell
+_CELL_KEYS = frozenset(['cell_function', 'cell_options.clock'])
+_XY_KEYS = frozenset(['x', 'y'])
+_DOT_KEYS = frozenset(['x', 'y', 'charge'])
+
+class _Cell:
+    '''The parts of a cell seen so far'''
+
+    __slots__ = ['depth', 'd', 'xy', 'in_object', 'object_done', 'dot', 'dot_depth', 'dots', 'name']
+
+    def __init__(self, depth):
+        self.depth = depth          # tag stack depth of the cell itself
+        self.d = {}                 # cell-level values
+        self.xy = {}                # values of the cell's first design object
+        self.in_object = False
+        self.object_done = False
+        self.dot = None             # values of the dot being read
+        self.dot_depth = 0
+        self.dots = []
+        self.name = None
+
+    def record(self):
+        if not self.object_done:
+            # QCACircuit skips cells without a design object
+            return None
+        return _make_record(self.xy['x'], self.xy['y'], self.d.get('cell_function'),
+                            self.d.get('cell_options.clock'), self.dots, self.name)
+
+def _make_record(x, y, cell_function, clock, dots, name):
+    '''Build a CellRecord from the raw string values of a cell (as QCACircuit
+    does from its parser nodes).'''
+
+    x, y = float(x), float(y)
+    cf = QCAD_CFs[cell_function]
+
+    # only inputs and outputs are named
+    if cf != CFs['input'] and cf != CFs['output']:
+        name = None
+
+    assert len(dots) == 4, 'Invalid dot layout'
+    dots = [QCADot(float(d['x']), float(d['y']), float(d['charge'])/Q0) for d in dots]
+
+    pol = round((dots[0].q+dots[2].q-dots[1].q-dots[3].q)/2, 5)
+    rot = len(set(round(d.x, 2) for d in dots))==3
+
+    clock = int(clock) if clock is not None else 0
+
+    return CellRecord(x, y, cf, pol, rot, dots, name, clock)
+
+def _value(line):
+    m = _rgx_val.match(line)
+    if m is not None and m.lastindex == 2:
+        return m.group(1), m.group(2)
+    return None, None
+
+class _LineScanner:
+    '''Line-by-line reader, tracking the stack of open tags. Handles any
+    layout of the file, however cells are nested or their children ordered.'''
+
+    def __init__(self):
+        self.stack = []
+        self.cell = None
+        self.found_design = False
+        self.found_cell = False
+
+    def feed(self, line):
+        '''Read one line. Returns a CellRecord if the line closed a cell.'''
+
+        stack = self.stack
+        cell = self.cell
+
+        if line[:1] == '[':
+            end = line.find(']')
+            if end < 0:
+                return None
+
+            if line[1:2] == '#':
+                # closing tag
+                if not stack:
+                    return None
+                depth = len(stack)
+                stack.pop()
+                if cell is None:
+                    return None
+                if depth == cell.depth:
+                    self.cell = None
+                    return cell.record()
+                elif cell.dot is not None and depth == cell.dot_depth:
+                    cell.dots.append(cell.dot)
+                    cell.dot = None
+                elif cell.in_object and depth == cell.depth + 1:
+                    cell.in_object = False
+                    cell.object_done = True
+                return None
+
+            # opening tag
+            tag = line[1:end]
+            stack.append(tag)
+            depth = len(stack)
+            if cell is None:
+                if tag == CELL_TAG:
+                    self.cell = _Cell(depth)
+                    self.found_cell = True
+                elif tag == DESIGN_TAG and depth == 1:
+                    self.found_design = True
+            elif tag == OBJECT_TAG and depth == cell.depth + 1 and not cell.object_done:
+                cell.in_object = True
+            elif tag == DOT_TAG and cell.dot is None:
+                cell.dot = {}
+                cell.dot_depth = depth
+            return None
+
+        if cell is None:
+            return None
+
+        key, _, _ = line.partition('=')
+        depth = len(stack)
+        if cell.dot is not None:
+            # only values directly inside the dot belong to it
+            if depth == cell.dot_depth and key in _DOT_KEYS:
+                key, val = _value(line)
+                if key is not None:
+                    cell.dot[key] = val
+        elif depth == cell.depth:
+            if key in _CELL_KEYS:
+                key, val = _value(line)
+                if key is not None:
+                    cell.d[key] = val
+        elif depth == cell.depth + 1:
+            if cell.in_object and key in _XY_KEYS:
+                key, val = _value(line)
+                if key is not None:
+                    cell.xy[key] = val
+            elif key == 'psz':
+                # the name of an i/o cell comes from a direct child (its label)
+                _, val = _value(line)
+                if val:
+                    cell.name = val
+        return None
+
+# A whole cell laid out exactly as QCADesigner writes it: its design object,
+# its own values, four dots and an optional label, with the values that matter
+# captured directly. Every other line is checked not to repeat one of those keys
+# (or to carry a psz name), so a match always gives the same values as reading
+# the cell line by line would; any other cell simply fails to match.
+# (the value stops at the first character outside ParserNode's set; whatever
+# follows it must then start with such a character, so there is only one way
+# to split a line and a failed match can't backtrack through every split)
+_VAL = r'([a-zA-Z0-9_\.\-\+]+)(?:[^a-zA-Z0-9_\.\-\+\n][^\n]*)?\n'
+def _others(*keys):
+    # any number of value lines that don't start with one of `keys`
+    return r'(?:(?!' + '|'.join(re.escape(k + '=') for k in keys) + r')[^\[\n][^\n]*\n)*'
+_OBJECT_OTHERS = _others('x', 'y', 'psz')
+_CELL_OTHERS = _others('cell_function', 'cell_options.clock')
+_DOT_OTHERS = _others('x', 'y', 'charge', 'psz')
+_LABEL_OTHERS = _others('psz')
+_rgx_cell = re.compile(
+    r'\[TYPE:QCADCell\]\n'
+    r'\[TYPE:QCADDesignObject\]\nx=' + _VAL + 'y=' + _VAL + _OBJECT_OTHERS + r'\[#TYPE:QCADDesignObject\]\n'
+    + _CELL_OTHERS + r'cell_options\.clock=' + _VAL + _CELL_OTHERS + 'cell_function=' + _VAL + _CELL_OTHERS
+    + (r'\[TYPE:CELL_DOT\]\nx=' + _VAL + 'y=' + _VAL + _DOT_OTHERS + 'charge=' + _VAL + _DOT_OTHERS + r'\[#TYPE:CELL_DOT\]\n') * 4 +
+    r'(?:\[TYPE:QCADLabel\]\n\[TYPE:QCADStretchyObject\]\n'
+    r'\[TYPE:QCADDesignObject\]\n[^\[]*\[#TYPE:QCADDesignObject\]\n'
+    r'\[#TYPE:QCADStretchyObject\]\n' + _LABEL_OTHERS + '(?:psz=' + _VAL + _LABEL_OTHERS + r')?\[#TYPE:QCADLabel\]\n)?'
+    r'\[#TYPE:QCADCell\]\n')
+
+_CELL_OPEN = '[TYPE:QCADCell]\n'
+_CELL_CLOSE = '[#TYPE:QCADCell]\n'
+
+_NAMED_CFs = frozenset([CFs['input'], CFs['output']])
+
+def _record_from_match(m):
+    '''Build the CellRecord of a cell matched by _rgx_cell; the same as
+    _make_record, but without its per-value overheads.'''
+    g = m.groups()
+    cf = QCAD_CFs[g[3]]
+    x0, y0, q0, x1, y1, q1, x2, y2, q2, x3, y3, q3 = map(float, g[4:16])
+    q0 /= Q0; q1 /= Q0; q2 /= Q0; q3 /= Q0
+    dots = [QCADot(x0, y0, q0), QCADot(x1, y1, q1), QCADot(x2, y2, q2), QCADot(x3, y3, q3)]
+    pol = round((q0+q2-q1-q3)/2, 5)
+    # rounding can only merge x values, so fewer than 3 distinct ones can't be rotated
+    xs = {x0, x1, x2, x3}
+    rot = len(xs) >= 3 and len(set(round(x, 2) for x in xs)) == 3
+    name = g[16] if cf in _NAMED_CFs else None
+    return CellRecord(float(g[0]), float(g[1]), cf, pol, rot, dots, name, int(g[2]))
+
+def _match_cells(buffer, pos):
+    '''Read the run of cells in the standard layout that starts at `pos`.
+    Returns their CellRecords and the position after the last of them.'''
+    records = []
+    # Records hold no reference cycles, so the garbage collector is kept from
+    # running over and over while thousands of them are built.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        m = _rgx_cell.match(buffer, pos)
+        while m is not None:
+            records.append(_record_from_match(m))
+            pos = m.end()
+            m = _rgx_cell.match(buffer, pos)
+    finally:
+        if enabled:
+            gc.enable()
+    return records, pos
+
+def iter_cells(fname, chunk_size=1 << 20):
+    '''Yield a CellRecord for every cell of a QCADesigner file, in file order.
+
+    The file is read in chunks of `chunk_size` characters. Cells in the standard
+    QCADesigner layout are read whole with one regex match; anything else goes
+    through the line-by-line scanner, so the result is the same either way.'''
+
+    scanner = _LineScanner()
+    with open(fname, 'r') as fp:
+        buffer = ''
+        pos = 0
+        while True:
+            chunk = fp.read(chunk_size)
+            final = chunk == ''
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+            while True:
+                if scanner.cell is None and buffer.startswith(_CELL_OPEN, pos):
+                    records, pos = _match_cells(buffer, pos)
+                    if records:
+                        scanner.found_cell = True
+                        yield from records
+                        continue
+                    if not final and buffer.find(_CELL_CLOSE, pos) < 0:
+                        # the rest of this cell is in the next chunk
+                        break
+
+                end = buffer.find('\n', pos)
+                if end < 0:
+                    if final and pos < len(buffer):
+                        record = scanner.feed(buffer[pos:])
+                        pos = len(buffer)
+                        if record is not None:
+                            yield record
+                    break
+
+                record = scanner.feed(buffer[pos:end + 1])
+                pos = end + 1
+                if record is not None:
+                    yield record
+
+            if final:
+                break
+
+    assert scanner.found_design, 'Invalid QCADesigner file format'
+    assert scanner.found_cell, 'Empty QCADesigner file'
+
+def iter_cells_from_lines(lines):
+    '''Yield a CellRecord for every cell in an iterable of QCADesigner file
+    lines, using the line-by-line scanner only.'''
+
+    scanner = _LineScanner()
+    for line in lines:
+        record = scanner.feed(line)
+        if record is not None:
+            yield record
+
+    assert scanner.found_design, 'Invalid QCADesigner file format'
+    assert scanner.found_cell, 'Empty QCADesigner file'
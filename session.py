@@ -0,0 +1,101 @@
+# The samplers' packages are imported only when a session needs them: neal for
+# classical runs, and dwave.system (which pulls in the cloud client) for QPU runs.
+
+# Architectures that run on this machine, rather than on a D-Wave QPU. 'exact'
+# finds the true ground state by variable elimination (see exact.py),
+# 'metropolis' anneals every read at once with array operations (see
+# metropolis.py), and 'tempering' runs parallel tempering (see tempering.py).
+LOCAL_ARCHS = ('classical', 'exact', 'metropolis', 'tempering')
+
+# The D-Wave solver used for each QPU architecture.
+SOLVERS = {'zephyr': 'Advantage2_prototype1.1',
+           'pegasus': 'Advantage_system4.1',
+           'chimera': 'DW_2000Q_6'}
+
+class SamplerSession:
+    '''The sampler for a run, set up once and shared by every anneal in it.
+
+    For QPU architectures this picks the solver and opens the connection to the
+    D-Wave service once, instead of for every input state. Any sampler (e.g. a
+    dwave.system.testing.MockDWaveSampler, or a dimod reference sampler) can be
+    passed in to stand in for the service. Sessions should be closed when the
+    run is done, either with close() or by using them as a context manager.
+
+    With `max_part_size`, BQMs of more variables than that are handed to a
+    DecompositionSampler, which solves them in parts of at most that size on
+    this session's sampler (over `jobs` processes).
+
+    With `presolve`, every anneal on the session first shrinks its BQM by roof
+    duality and low-degree elimination, and expands the samples back to every
+    cell afterwards (see presolve.py). The exact solver is never presolved: it
+    returns one row per ground state with their count, which expanding to
+    every read would repeat and lose.'''
+
+    def __init__(self, qpu_arch='classical', sampler=None, embeddings=None, max_part_size=None, jobs=1, presolve=False):
+        self.qpu_arch = qpu_arch
+        self.classical = qpu_arch in LOCAL_ARCHS
+        self.presolve = presolve and qpu_arch != 'exact'
+        self._embeddings = embeddings
+
+        self.decomposer = None
+        if max_part_size is not None:
+            from decompose import DecompositionSampler
+            self.decomposer = DecompositionSampler(self, max_part_size, jobs)
+
+        if sampler is not None:
+            self.sampler = sampler
+        elif qpu_arch == 'exact':
+            from exact import EliminationSolver
+            self.sampler = EliminationSolver()
+        elif qpu_arch == 'metropolis':
+            from metropolis import MetropolisSampler
+            self.sampler = MetropolisSampler()
+        elif qpu_arch == 'tempering':
+            from tempering import TemperingSampler
+            self.sampler = TemperingSampler()
+        elif self.classical:
+            import neal
+            self.sampler = neal.SimulatedAnnealingSampler()
+        else:
+            if qpu_arch not in SOLVERS:
+                raise ValueError('Specified QPU architecture is not supported.')
+            # Raises SolverNotFoundError if the pre-programmed solver name is no
+            # longer available. Find the latest available solvers by:
+            # from dwave.cloud import Client
+            # Client.from_config().get_solvers()
+            # and update SOLVERS.
+            from dwave.system import DWaveSampler
+            self.sampler = DWaveSampler(solver=SOLVERS[qpu_arch])
+
+    @property
+    def embeddings(self):
+        if self._embeddings is None:
+            # Deferred so that the process-wide cache is shared by default.
+            from qca_on_qpu import embedding_cache
+            self._embeddings = embedding_cache
+        return self._embeddings
+
+    def sampler_for(self, bqm):
+        '''The sampler to run `bqm` on. QPU samplers are wrapped in the cached
+        embedding for the circuit's graph, and BQMs too large for them are
+        decomposed if the session allows it.'''
+        if self.decomposer is not None and bqm.num_variables > self.decomposer.max_part_size:
+            return self.decomposer
+        if self.classical:
+            return self.sampler
+        from profiling import span
+        with span('embedding', 'embed', variables=bqm.num_variables):
+            return self.embeddings.sampler(bqm, self.sampler)
+
+    def close(self):
+        if self.decomposer is not None:
+            self.decomposer.close()
+        close = getattr(self.sampler, 'close', None)
+        if close is not None:
+            close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
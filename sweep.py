@@ -0,0 +1,193 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+import numpy as np
+
+from circuit_model import CircuitModel
+from batch import batched_bqm, split_response
+from qca_on_qpu import anneal
+from analysis import ResultAnalysis
+from session import SamplerSession
+from load_qca import assign_inputs
+import profiling
+
+# Runs a circuit's whole truth table, either one input state after another or
+# spread over a pool of worker processes. Each input state is independent, so
+# the only things the workers need are the compiled CircuitModel and a
+# SamplerSession, which each one sets up once when it starts.
+
+# The CircuitModel and SamplerSession of a worker process, set up by _init_worker.
+_model = None
+_session = None
+
+def state_seed(seed, input_state, *keys):
+    # Every input state gets its own seed, derived from the run's seed and the
+    # state alone. A seeded run therefore gives the same samples whether it is
+    # serial or parallel, and whichever worker each state lands on. Runs that
+    # anneal a state more than once tell the anneals apart with extra `keys`.
+    if seed is None:
+        return None
+    # SeedSequence ignores trailing zeros, which would give keys ending in 0
+    # the seed of the same keys without it, so keyed seeds end with their count.
+    entropy = [seed, input_state, *keys, len(keys)] if keys else [seed, input_state]
+    # neal rejects seeds of 2^31 and above, despite documenting 32 bits.
+    return int(np.random.SeedSequence(entropy).generate_state(1)[0] >> 1)
+
+def gray_code(num_inputs):
+    '''Every input state of `num_inputs` inputs, ordered so that each differs
+    from the one before it in a single input.'''
+    return [k ^ (k >> 1) for k in range(2 ** num_inputs)]
+
+def _init_worker(cells, drivers, inputs, qpu_arch, presolve, profile):
+    global _model, _session
+    if profile:
+        profiling.enable()
+        # Forked workers start with a copy of the parent's events so far.
+        profiling.drain()
+    _model = CircuitModel(cells, drivers, inputs)
+    _session = SamplerSession(qpu_arch, presolve=presolve)
+    # Pool workers skip atexit handlers, so close the session through
+    # multiprocessing's own exit hooks.
+    Finalize(_session, _session.close, exitpriority=10)
+
+def _solve(model, session, input_state, samples, seed, adaptive = None, initial_state = None):
+    with profiling.span('input state', 'run', state=input_state):
+        return _solve_state(model, session, input_state, samples, seed, adaptive, initial_state)
+
+def _solve_state(model, session, input_state, samples, seed, adaptive, initial_state):
+    with profiling.span('assign inputs', 'build'):
+        (bqm, all_drivers, state_name) = model.assign(input_state)
+    if adaptive is not None:
+        # Imported here, as adaptive imports state_seed from this module.
+        from adaptive import anneal_adaptive
+        response = anneal_adaptive(model.cells, all_drivers, adaptive, max_samples=samples, bqm=bqm, seed=state_seed(seed, input_state),
+                                   session=session, initial_state=initial_state)
+    else:
+        response = anneal(model.cells, all_drivers, samples=samples, bqm=bqm, seed=state_seed(seed, input_state), session=session,
+                          initial_state=initial_state)
+    return (input_state, response, all_drivers, state_name)
+
+def _sweep_serial(model, session, input_states, samples, seed, batch, adaptive, warm_start):
+    if batch:
+        yield from _solve_batched(model, session, input_states, samples, seed)
+        return
+
+    if not warm_start:
+        for input_state in input_states:
+            yield _solve(model, session, input_state, samples, seed, adaptive)
+        return
+
+    # Each state in Gray code order starts from the ground state of the one
+    # before it, which differs from it in only one input.
+    initial_state = None
+    for input_state in gray_code(len(model.inputs)):
+        result = _solve(model, session, input_state, samples, seed, adaptive, initial_state)
+        analysis = ResultAnalysis(result[1], {})
+        initial_state = analysis.state_of(analysis.ground_state())
+        yield result
+
+def _with_mirrors(model, results, source):
+    # Every input state's result in order: the sampled states' from `results`
+    # (in order), and the rest read off them as `source` says (see symmetry.py).
+    from symmetry import mirror_response
+    responses = {}
+    for (input_state, state_source) in enumerate(source):
+        if state_source is None:
+            result = next(results)
+            responses[input_state] = result[1]
+            yield result
+        else:
+            (sampled_state, symmetry) = state_source
+            all_drivers, state_name = assign_inputs(model.drivers, model.inputs, input_state)
+            yield (input_state, mirror_response(responses[sampled_state], symmetry), all_drivers, state_name)
+
+def _solve_in_worker(task):
+    # The worker's profiling events (if any) go back with each result.
+    return _solve(_model, _session, *task), profiling.drain()
+
+def _solve_batched(model, session, input_states, samples, seed):
+    # One anneal of every input state at once (see batch.py). The batch as a
+    # whole gets the seed of its first state.
+    with profiling.span('batched bqm', 'build', states=len(input_states)):
+        bqm = batched_bqm(model, input_states)
+    response = anneal(model.cells, None, samples=samples, bqm=bqm, seed=state_seed(seed, input_states[0]), session=session)
+
+    # Responses come back aggregated and sorted by energy, so the split
+    # responses should be too.
+    with profiling.span('split response', 'analysis'):
+        responses = split_response(response, model, input_states, aggregate=True)
+    for (input_state, state_response) in zip(input_states, responses):
+        (_, all_drivers, state_name) = model.assign(input_state)
+        yield (input_state, state_response, all_drivers, state_name)
+
+def sweep(cells, drivers, inputs, samples = 500, qpu_arch = 'classical', jobs = 1, seed = None, session = None, batch = False, adaptive = None,
+          warm_start = False, presolve = False, symmetry = False):
+    '''Anneal every input state of a circuit. Yields (input_state, response,
+    all_drivers, state_name) tuples in input-state order, as each one becomes
+    available.
+
+    Serial sweeps run on `session` if one is given, or else on a new
+    SamplerSession for `qpu_arch`. With jobs > 1 the states are handed to a
+    pool of that many processes, each with its own session for `qpu_arch`. Any
+    script that calls this with jobs > 1 must guard its top level with
+    `if __name__ == '__main__'`, as worker processes may re-import it.
+
+    With `batch`, every input state is instead sampled in a single submission
+    of one combined BQM, and `jobs` is ignored.
+
+    With `adaptive` (an AdaptiveSampling), each input state takes reads in
+    chunks until its statistics are known well enough, and `samples` is the
+    most it may take (see adaptive.py). Batched sweeps don't support this.
+
+    With `warm_start`, the input states are instead visited in Gray code order
+    (see gray_code), each one annealed from the previous one's ground state,
+    and yielded in that order. This chains the states one after another, so
+    `jobs` is ignored, and batched sweeps don't support it.
+
+    With `presolve`, the sessions this sets up presolve every BQM before it is
+    annealed (see presolve.py); a given `session` keeps its own setting.
+
+    With `symmetry`, only one input state of each set that the circuit's
+    symmetries map onto each other is sampled, and the others' responses are
+    its own with the symmetry applied (see symmetry.py). Warm-started sweeps
+    don't support this, as they chain every state.'''
+
+    if batch and adaptive is not None:
+        raise ValueError('Batched sweeps take a fixed number of samples, so they cannot sample adaptively.')
+    if batch and warm_start:
+        raise ValueError('Batched sweeps anneal every input state at once, so they cannot be warm started.')
+    if warm_start and symmetry:
+        raise ValueError('Warm-started sweeps chain every input state, so they cannot skip symmetric ones.')
+
+    num_input_states = 2 ** len(inputs)
+    with profiling.span('compile circuit model', 'build', cells=len(cells)):
+        model = CircuitModel(cells, drivers, inputs)
+    if not symmetry:
+        yield from _sweep_states(model, list(range(num_input_states)), samples, qpu_arch, jobs, seed, session, batch, adaptive,
+                                 warm_start, presolve)
+        return
+
+    from symmetry import find_symmetries, representatives
+    source = representatives(find_symmetries(model), num_input_states)
+    input_states = [input_state for (input_state, state_source) in enumerate(source) if state_source is None]
+    results = _sweep_states(model, input_states, samples, qpu_arch, jobs, seed, session, batch, adaptive, warm_start, presolve)
+    yield from _with_mirrors(model, results, source)
+
+def _sweep_states(model, input_states, samples, qpu_arch, jobs, seed, session, batch, adaptive, warm_start, presolve):
+    # Results for `input_states`, in order (or in Gray code order for warm
+    # starts, which always cover every state), as sweep describes.
+    if jobs <= 1 or batch or warm_start:
+        if session is not None:
+            yield from _sweep_serial(model, session, input_states, samples, seed, batch, adaptive, warm_start)
+            return
+
+        with SamplerSession(qpu_arch, presolve=presolve) as session:
+            yield from _sweep_serial(model, session, input_states, samples, seed, batch, adaptive, warm_start)
+        return
+
+    tasks = [(input_state, samples, seed, adaptive) for input_state in input_states]
+    initargs = (model.cells, model.drivers, model.inputs, qpu_arch, presolve, profiling.enabled())
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=initargs) as executor:
+        # map hands results back in submission order, whichever finishes first.
+        for (result, events) in executor.map(_solve_in_worker, tasks):
+            profiling.extend(events)
+            yield result
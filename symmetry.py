@@ -0,0 +1,132 @@
+from collections import namedtuple
+import numpy as np
+import dimod
+
+# Symmetries of a circuit's truth table. A circuit with no FIXED_T drivers has
+# every bias set by an input, so flipping every input flips every bias, and the
+# BQM of an input state's complement is the same BQM with every spin flipped:
+# its samples are the original's, flipped. A layout that is its own mirror image
+# (or rotation) maps input states onto each other in the same way, with its
+# cells moved rather than flipped. Each such symmetry is a map of cells onto
+# cells, a sign (-1 to flip every spin, 1 to keep them), and the input each
+# input becomes. Only one input state of every class of states that the
+# symmetries map onto each other has to be sampled; the rest are read off it.
+#
+# Candidates are the eight reflections and rotations of the layout's bounding
+# box, each with and without a global flip. A candidate is only a symmetry if
+# the BQM it gives for every input state is exactly that state's image's BQM,
+# which is checked against the CircuitModel's couplings and biases, so a
+# design's FIXED_T drivers (or anything else that breaks a symmetry) rule it
+# out without needing to be looked at.
+
+# The reflections and rotations of the plane, as maps of offsets from a centre.
+PLANE_MAPS = [lambda dx, dy: (dx, dy), lambda dx, dy: (-dx, dy), lambda dx, dy: (dx, -dy), lambda dx, dy: (-dx, -dy),
+              lambda dx, dy: (dy, dx), lambda dx, dy: (-dy, dx), lambda dx, dy: (dy, -dx), lambda dx, dy: (-dy, -dx)]
+
+# A symmetry: `cells` maps every cell's label to the label of the cell it
+# becomes, `sign` multiplies every spin, and `inputs[k]` is the index of the
+# input that input k becomes.
+Symmetry = namedtuple('Symmetry', ['cells', 'sign', 'inputs'])
+
+def _plane_map(plane_map, centre, positions):
+    # The image of every position under `plane_map` about `centre` (given
+    # doubled, as bounding box centres can fall between cells), or None if any
+    # image is off the grid.
+    images = []
+    for (x, y) in positions:
+        (dx, dy) = plane_map(2 * x - centre[0], 2 * y - centre[1])
+        (x2, y2) = (dx + centre[0], dy + centre[1])
+        if x2 % 2 or y2 % 2:
+            return None
+        images.append((x2 // 2, y2 // 2))
+    return images
+
+def find_symmetries(model):
+    '''Every symmetry (other than doing nothing) of the truth table of the
+    circuit compiled into `model`, a CircuitModel.'''
+    labels = model.labels
+    index = {label: k for (k, label) in enumerate(labels)}
+    input_positions = [pos for (pos, _) in model.inputs.values()]
+    input_index = {pos: k for (k, pos) in enumerate(input_positions)}
+    if len(input_index) < len(input_positions):
+        # Inputs that share a position can't be told apart by where they go.
+        return []
+
+    everything = labels + input_positions + list(model.drivers)
+    if not everything:
+        return []
+    xs = [x for (x, _) in everything]
+    ys = [y for (_, y) in everything]
+    centre = (min(xs) + max(xs), min(ys) + max(ys))
+
+    h, (row, col, J), _ = model.bqm.to_numpy_vectors(labels)
+    couplings = dict(zip(zip(row.tolist(), col.tolist()), J.tolist()))
+    base = model.base_linear
+    input_biases = model.input_biases.toarray()
+
+    symmetries = []
+    for plane_map in PLANE_MAPS:
+        cell_images = _plane_map(plane_map, centre, labels)
+        input_images = _plane_map(plane_map, centre, input_positions)
+        if cell_images is None or input_images is None:
+            continue
+        if any(image not in index for image in cell_images) or any(image not in input_index for image in input_images):
+            continue
+        perm = np.array([index[image] for image in cell_images], dtype=np.int64)
+        inputs = [input_index[image] for image in input_images]
+
+        # The couplings must map onto themselves whatever the sign.
+        if any(not np.isclose(couplings.get((perm[u], perm[v]), couplings.get((perm[v], perm[u]), 0.0)), j)
+               for ((u, v), j) in couplings.items()):
+            continue
+
+        for sign in (1, -1):
+            if plane_map is PLANE_MAPS[0] and sign == 1:
+                continue
+            # Cell perm[i] of the image state must have sign times cell i's
+            # bias, for every input state. Biases are linear in the inputs'
+            # polarizations, and input inputs[k] of the image has sign times
+            # input k's polarization, so this is one check for the biases the
+            # FIXED_T drivers set and one for each input's.
+            if not np.allclose(base[perm], sign * base):
+                continue
+            if not np.allclose(input_biases[perm][:, inputs], input_biases):
+                continue
+            symmetries.append(Symmetry(dict(zip(labels, cell_images)), sign, inputs))
+    return symmetries
+
+def image_state(symmetry, input_state):
+    '''The input state that `symmetry` maps `input_state` to.'''
+    image = 0
+    for (k, target) in enumerate(symmetry.inputs):
+        bit = (input_state >> k) & 1
+        if symmetry.sign < 0:
+            bit ^= 1
+        image |= bit << target
+    return image
+
+def representatives(symmetries, num_input_states):
+    '''For every input state, None if it is to be sampled, or (state,
+    symmetry) if its results are to be read off an earlier state's by
+    `symmetry`.'''
+    source = [None] * num_input_states
+    sampled = np.zeros(num_input_states, dtype=bool)
+    for input_state in range(num_input_states):
+        if source[input_state] is not None:
+            continue
+        sampled[input_state] = True
+        for symmetry in symmetries:
+            image = image_state(symmetry, input_state)
+            if not sampled[image] and source[image] is None:
+                source[image] = (input_state, symmetry)
+    return source
+
+def mirror_response(response, symmetry):
+    '''The response of the image of an input state under `symmetry`, given
+    the state's own `response`: the same samples, with every cell moved to its
+    image and multiplied by the symmetry's sign, at the same energies.'''
+    record = response.record
+    variables = [symmetry.cells.get(v, v) for v in response.variables]
+    vectors = {name: record[name] for name in record.dtype.names if name not in ('sample', 'energy', 'num_occurrences')}
+    return dimod.SampleSet.from_samples((symmetry.sign * record.sample, variables), response.vartype, energy=record.energy,
+                                        num_occurrences=record.num_occurrences, info=dict(response.info), **vectors)
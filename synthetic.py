@@ -0,0 +1,135 @@
+import math
+from load_qca import NORMAL_T, INPUT_T, OUTPUT_T, FIXED_T
+from cell_table import CellTableBuilder, as_cell_table
+
+# Synthetic circuit layouts, in the same (cells, drivers, inputs, outputs) format
+# that load_qca produces, for benchmarking at sizes that nobody would draw by
+# hand in QCADesigner.
+
+def _add_cell(cells, pos, rot = False, cf = NORMAL_T, name = None, spacing = 20):
+    x, y = pos
+    cells.add(pos, float(x * spacing), float(y * spacing), cf, 0.0, rot, 0, name)
+
+def wire(n, rot = False, input_name = "A", output_name = "Y"):
+    '''A straight horizontal wire of n cells, driven by an input at its left end
+    and read out by an output cell at its right end.'''
+    cells = CellTableBuilder()
+    for x in range(1, n + 1):
+        _add_cell(cells, (x, 0), rot)
+
+    outputs = {output_name: (n, 0)}
+    _add_cell(cells, (n, 0), rot, OUTPUT_T, output_name)
+    inputs = {input_name: ((0, 0), rot)}
+    return cells.build(), {}, inputs, outputs
+
+def grid(n, input_name = "A", output_name = "Y"):
+    '''A solid block of about n cells, filled row by row into a square. Every
+    cell couples to all eight of its neighbours, which makes this a worst case
+    for neighbour counts. The input sits to the left of the top-left cell and
+    the output is the last cell placed.'''
+    side = max(1, math.ceil(math.sqrt(n)))
+    cells = CellTableBuilder()
+    pos = None
+    for i in range(n):
+        pos = (1 + i % side, i // side)
+        _add_cell(cells, pos)
+
+    outputs = {output_name: pos}
+    _add_cell(cells, pos, cf = OUTPUT_T, name = output_name)
+    inputs = {input_name: ((0, 0), False)}
+    return cells.build(), {}, inputs, outputs
+
+def majority_grid(n, arm = 2):
+    """An n x n array of majority gates. Each gate is a cross of cells with
+    `arm` cells in each arm: the left, top and bottom arms are driven by fixed
+    cells, and the right arm ends in an output cell named Y<row>_<column>.
+    Gate k of the array (counting row by row) has its three drivers set to the
+    bits of k % 8 (0 for -1, 1 for +1, left arm first), so the array covers
+    every row of the majority truth table. Gates are far enough apart not to
+    interact, so every output is the majority of its own gate's drivers."""
+    pitch = 2 * arm + 5
+    cells = CellTableBuilder()
+    drivers = {}
+    outputs = {}
+    for k in range(n * n):
+        (row, column) = divmod(k, n)
+        (cx, cy) = (arm + 1 + column * pitch, arm + 1 + row * pitch)
+        for d in range(-arm, arm + 1):
+            _add_cell(cells, (cx + d, cy))
+            if d != 0:
+                _add_cell(cells, (cx, cy + d))
+        name = f"Y{row}_{column}"
+        outputs[name] = (cx + arm, cy)
+        _add_cell(cells, (cx + arm, cy), cf = OUTPUT_T, name = name)
+        for (bit, pos) in enumerate([(cx - arm - 1, cy), (cx, cy - arm - 1), (cx, cy + arm + 1)]):
+            drivers[pos] = (float(2 * ((k >> bit) & 1) - 1), False)
+    return cells.build(), drivers, {}, outputs
+
+# QCADesigner file output, so that synthetic layouts can also exercise the parser.
+
+_QCA_HEADER = '''[VERSION]
+qcadesigner_version=2.000000
+[#VERSION]
+[TYPE:DESIGN]
+[TYPE:QCADLayer]
+type=1
+status=0
+pszDescription=Main Cell Layer
+'''
+
+_QCA_FOOTER = '''[#TYPE:QCADLayer]
+[#TYPE:DESIGN]
+'''
+
+_QCAD_CELL_FUNCTIONS = ['QCAD_CELL_NORMAL', 'QCAD_CELL_INPUT', 'QCAD_CELL_OUTPUT', 'QCAD_CELL_FIXED']
+
+# Elementary charge, and the charge QCADesigner gives a dot of an unpolarized cell.
+_Q0 = 1.60218e-19
+_HALF_CHARGE = 0.5 * _Q0
+
+def _qca_cell(x, y, cf, pol, rot, name, clock, size = 18.0, dot_spacing = 4.5):
+    # Dots are listed in QCADesigner's order, so that the polarization works out
+    # as (q0 + q2 - q1 - q3) / 2.
+    if rot:
+        dd = dot_spacing * math.sqrt(2)
+        dots = [(x - dd, y), (x, y - dd), (x + dd, y), (x, y + dd)]
+    else:
+        dots = [(x + dot_spacing, y - dot_spacing), (x + dot_spacing, y + dot_spacing), (x - dot_spacing, y + dot_spacing), (x - dot_spacing, y - dot_spacing)]
+    charges = [_HALF_CHARGE * (1 + pol), _HALF_CHARGE * (1 - pol)] * 2
+
+    # Every field QCADesigner writes is included, so that files have the same
+    # shape (and parse cost) as real designs.
+    half = size / 2
+    lines = ['[TYPE:QCADCell]', '[TYPE:QCADDesignObject]', f'x={x:f}', f'y={y:f}', 'bSelected=FALSE',
+             'clr.red=0', 'clr.green=65535', 'clr.blue=0',
+             f'bounding_box.xWorld={x - half:f}', f'bounding_box.yWorld={y - half:f}',
+             f'bounding_box.cxWorld={size:f}', f'bounding_box.cyWorld={size:f}', '[#TYPE:QCADDesignObject]',
+             f'cell_options.cxCell={size:f}', f'cell_options.cyCell={size:f}', 'cell_options.dot_diameter=5.000000',
+             f'cell_options.clock={clock}', 'cell_options.mode=QCAD_CELL_MODE_NORMAL',
+             f'cell_function={_QCAD_CELL_FUNCTIONS[cf]}', 'number_of_dots=4']
+    for ((dot_x, dot_y), charge) in zip(dots, charges):
+        lines += ['[TYPE:CELL_DOT]', f'x={dot_x:f}', f'y={dot_y:f}', 'diameter=5.000000', f'charge={charge:e}',
+                  'spin=0.000000', 'potential=0.000000', '[#TYPE:CELL_DOT]']
+    if name is not None:
+        lines += ['[TYPE:QCADLabel]', '[TYPE:QCADStretchyObject]', '[TYPE:QCADDesignObject]', f'x={x:f}', f'y={y - size:f}',
+                  'bSelected=FALSE', 'clr.red=0', 'clr.green=0', 'clr.blue=65535',
+                  '[#TYPE:QCADDesignObject]', '[#TYPE:QCADStretchyObject]', f'psz={name}', '[#TYPE:QCADLabel]']
+    lines.append('[#TYPE:QCADCell]')
+    return '\n'.join(lines) + '\n'
+
+def write_qca(filename, cells, drivers, inputs, outputs, spacing = 20, clock = lambda pos: 0):
+    '''Write a layout in load_qca's format out as a QCADesigner file. `clock`
+    maps each cell position to its clock zone.'''
+    output_names = {pos: name for (name, pos) in outputs.items()}
+    with open(filename, 'w') as fp:
+        fp.write(_QCA_HEADER)
+        for (name, (pos, rot)) in inputs.items():
+            fp.write(_qca_cell(pos[0] * spacing, pos[1] * spacing, INPUT_T, 0.0, rot, name, clock(pos)))
+        for (pos, (pol, rot)) in drivers.items():
+            fp.write(_qca_cell(pos[0] * spacing, pos[1] * spacing, FIXED_T, pol, rot, None, clock(pos)))
+        cells = as_cell_table(cells)
+        for (pos, rot) in zip(cells, cells.rot.tolist()):
+            name = output_names.get(pos)
+            cf = OUTPUT_T if name is not None else NORMAL_T
+            fp.write(_qca_cell(pos[0] * spacing, pos[1] * spacing, cf, 0.0, rot, name, clock(pos)))
+        fp.write(_QCA_FOOTER)
@@ -0,0 +1,118 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import dimod
+
+from metropolis import ColourBlocks
+
+# Parallel tempering (replica exchange) for frustrated circuits such as the
+# crossovers, where a plain anneal often freezes into an excited state. Every
+# read runs a ladder of replicas at fixed temperatures, from hot enough to
+# cross any barrier to cold enough to sit in the ground state. After each sweep,
+# neighbouring replicas on the ladder swap temperatures with the Metropolis
+# probability min(1, exp((beta_i - beta_j)(E_i - E_j))), so that states found
+# while hot are carried down to be cooled, and the cold replicas can escape the
+# states they are stuck in. A read's sample is the lowest energy state that any
+# of its replicas was in after a sweep.
+#
+# Replicas are the columns of one spin array and take their sweeps together
+# (see metropolis.py). Swapping two replicas' temperatures only swaps their
+# entries in the ladder, so no spins are ever copied to make an exchange.
+
+def _tempering_run(bqm, variables, num_reads, num_sweeps, betas, seed):
+    # num_reads independent reads of parallel tempering on the ladder `betas`.
+    # Returns their best samples (with columns in the order of `variables`, as
+    # a BQM sent to a worker process may come back with its variables in
+    # another order) and energies, and how many exchanges were tried and
+    # accepted between each pair of neighbouring temperatures.
+    model = ColourBlocks(bqm)
+    rng = np.random.default_rng(seed)
+    num_replicas = len(betas)
+
+    # Column r * num_replicas + k starts out as read r's replica at betas[k];
+    # column[r, k] is whichever of read r's columns is at betas[k] now.
+    spins = model.random_spins(rng, num_reads * num_replicas)
+    column = np.arange(num_reads * num_replicas).reshape(num_reads, num_replicas)
+    beta_of = np.empty(num_reads * num_replicas, dtype=np.float32)
+    beta_of[column] = betas
+
+    best = spins[:, ::num_replicas].copy()
+    best_energy = np.full(num_reads, np.inf)
+    tried = np.zeros(num_replicas - 1, dtype=np.int64)
+    accepted = np.zeros(num_replicas - 1, dtype=np.int64)
+
+    for sweep in range(num_sweeps):
+        model.sweep(spins, beta_of, rng)
+        energy = model.energies(spins)
+
+        # Keep each read's lowest energy state so far.
+        lowest = np.argmin(energy.reshape(num_reads, num_replicas), axis=1) + np.arange(num_reads) * num_replicas
+        improved = energy[lowest] < best_energy - 1e-9
+        best_energy[improved] = energy[lowest[improved]]
+        best[:, improved] = spins[:, lowest[improved]]
+
+        # Try to exchange the even pairs of temperatures after even sweeps and
+        # the odd pairs after odd ones.
+        k = np.arange(sweep % 2, num_replicas - 1, 2)
+        cold, hot = column[:, k], column[:, k + 1]
+        delta = (betas[k] - betas[k + 1]) * (energy[cold] - energy[hot])
+        swap = np.log(rng.random(delta.shape)) < delta
+        column[:, k], column[:, k + 1] = np.where(swap, hot, cold), np.where(swap, cold, hot)
+        beta_of[column] = betas
+        tried[k] += num_reads
+        accepted[k] += swap.sum(axis=0)
+
+    samples = np.empty((num_reads, model.n), dtype=np.int8)
+    samples[:, model.order] = best[:model.n].T
+    column = {v: k for (k, v) in enumerate(model.variables)}
+    samples = samples[:, [column[v] for v in variables]]
+    return samples, model.bqm.energies((samples, variables)), tried, accepted
+
+class TemperingSampler(dimod.Sampler):
+    '''Parallel tempering over a geometric ladder of `num_replicas` inverse
+    temperatures spanning `beta_range` (neal's default range if not given), or
+    over the explicit ladder `betas`. Each read runs for `num_sweeps` sweeps, so
+    a read costs num_replicas * num_sweeps replica sweeps. With jobs > 1 the
+    reads are split over a pool of that many processes.
+
+    The info of the SampleSet it returns holds the ladder ('betas') and the
+    fraction of exchanges accepted between each pair of neighbouring
+    temperatures ('exchange_rates'). Rates near 0 mean the ladder has a gap
+    that replicas can't cross, and needs more (or closer) temperatures.'''
+
+    parameters = {'num_reads': [], 'seed': [], 'num_sweeps': [], 'num_replicas': [], 'beta_range': [], 'betas': []}
+    properties = {}
+
+    def __init__(self, jobs = 1):
+        self.jobs = jobs
+
+    def sample(self, bqm, num_reads = 10, seed = None, num_sweeps = 100, num_replicas = 8, beta_range = None, betas = None):
+        bqm = dimod.as_bqm(bqm).change_vartype(dimod.SPIN, inplace=False)
+        if betas is None:
+            if beta_range is None:
+                from neal.sampler import default_beta_range
+                beta_range = default_beta_range(bqm)
+            betas = np.geomspace(beta_range[-1], beta_range[0], num_replicas)
+        # Coldest first.
+        betas = np.sort(np.asarray(betas, dtype=np.float32))[::-1].copy()
+        if len(betas) < 2:
+            raise ValueError('Parallel tempering needs at least two temperatures.')
+
+        # Every job gets its own share of the reads and its own seed.
+        jobs = max(1, min(self.jobs, num_reads))
+        shares = [len(share) for share in np.array_split(np.arange(num_reads), jobs)]
+        seeds = np.random.SeedSequence(seed).generate_state(jobs)
+        variables = list(bqm.variables)
+        tasks = [(bqm, variables, share, num_sweeps, betas, int(s)) for (share, s) in zip(shares, seeds)]
+        if jobs == 1:
+            results = [_tempering_run(*tasks[0])]
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                results = list(executor.map(_tempering_run, *zip(*tasks)))
+
+        samples = np.concatenate([r[0] for r in results])
+        energies = np.concatenate([r[1] for r in results])
+        tried = sum(r[2] for r in results)
+        accepted = sum(r[3] for r in results)
+        info = {'betas': betas.tolist(), 'exchange_rates': (accepted / np.maximum(tried, 1)).tolist()}
+        return dimod.SampleSet.from_samples((samples, variables), dimod.SPIN, energy=energies, info=info)
@@ -0,0 +1,36 @@
+import glob
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository rather than in a package.
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+
+from load_qca import load_qca
+
+# Every design bundled with the repository, by its path within it.
+BUNDLED_DESIGNS = sorted(os.path.relpath(path, REPO) for pattern in ('validation/*/*.qca', 'crossovers/*.qca', 'sparse XOR/*/*.qca', 'dense XOR/*/*.qca')
+                         for path in glob.glob(os.path.join(REPO, pattern)))
+
+def pytest_generate_tests(metafunc):
+    # A test that takes a `design` runs once for every bundled design.
+    if 'design' in metafunc.fixturenames:
+        metafunc.parametrize('design', BUNDLED_DESIGNS)
+
+@pytest.fixture
+def design_path():
+    '''The absolute path of a file given by its path within the repository.'''
+    return lambda name: os.path.join(REPO, name)
+
+@pytest.fixture
+def load_design(design_path):
+    '''Loads a design given by its path within the repository, bypassing the
+    parsed-circuit cache.'''
+    return lambda name: load_qca(design_path(name), cache=None)
+
+@pytest.fixture
+def majority(load_design):
+    '''The (cells, drivers, inputs, outputs) of the majority gate.'''
+    return load_design('validation/majority/majority.qca')
@@ -0,0 +1,32 @@
+import numpy as np
+
+from analysis import wilson_interval
+from adaptive import AdaptiveSampling, anneal_adaptive
+from circuit_model import CircuitModel
+
+def test_wilson_interval():
+    assert np.allclose(wilson_interval(0, 10), (0.0, 0.2775), atol=1e-4)
+    assert np.allclose(wilson_interval(10, 10), (0.7225, 1.0), atol=1e-4)
+    assert np.allclose(wilson_interval(5, 10), (0.2366, 0.7634), atol=1e-4)
+    assert wilson_interval(0, 0) == (0.0, 1.0)
+    # Narrower with more reads, and always inside [0, 1].
+    (lower, upper) = wilson_interval(500, 1000)
+    assert upper - lower < 0.07
+    assert all(0 <= bound <= 1 for count in range(11) for bound in wilson_interval(count, 10))
+
+def test_stops_once_converged(majority):
+    cells, drivers, inputs, outputs = majority
+    (bqm, all_drivers, _) = CircuitModel(cells, drivers, inputs).assign(0)
+    response = anneal_adaptive(cells, all_drivers, AdaptiveSampling(100, 0.1, outputs), max_samples=2000, bqm=bqm, seed=1)
+    # (Nearly) every read of this easy state agrees, so one chunk pins it down.
+    assert response.info['converged']
+    assert response.info['effective_samples'] == 100
+    assert response.record.num_occurrences.sum() == response.info['effective_samples']
+
+def test_stops_at_max_samples(majority):
+    cells, drivers, inputs, outputs = majority
+    (bqm, all_drivers, _) = CircuitModel(cells, drivers, inputs).assign(0)
+    response = anneal_adaptive(cells, all_drivers, AdaptiveSampling(100, 0.001, outputs), max_samples=250, bqm=bqm, seed=1)
+    assert not response.info['converged']
+    assert response.info['effective_samples'] == 250
+    assert response.record.num_occurrences.sum() == 250
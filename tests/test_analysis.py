@@ -0,0 +1,52 @@
+import numpy as np
+import dimod
+
+from analysis import aggregate, ResultAnalysis
+
+def test_aggregate_tallies_reads():
+    response = dimod.SampleSet.from_samples(([[1, -1], [-1, 1], [1, -1]], ['a', 'b']), dimod.SPIN, energy=[0.5, -1.0, 0.5])
+    aggregated = aggregate(response)
+    assert list(aggregated.record.num_occurrences) == [1, 2]
+    assert list(aggregated.record.energy) == [-1.0, 0.5]
+
+def test_aggregate_without_variables():
+    # e.g. a design whose every cell was dropped by --ignore-rotated
+    response = dimod.SampleSet.from_samples((np.empty((5, 0), dtype=np.int8), []), dimod.SPIN, energy=[2.0] * 5)
+    aggregated = aggregate(response)
+    assert len(aggregated) == 1
+    assert aggregated.record.num_occurrences[0] == 5
+    assert aggregated.record.energy[0] == 2.0
+
+    analysis = ResultAnalysis(aggregated, {})
+    row = analysis.ground_state()
+    assert analysis.occupancy(row) == 5
+
+def test_analysis_matches_a_row_by_row_count():
+    rng = np.random.default_rng(1)
+    variables = [(x, 0) for x in range(10)]
+    samples = rng.choice([-1, 1], size=(40, 10)).astype(np.int8)
+    # Row 0 is the ground state. Rows 3 and 5-11 repeat one broken sample,
+    # once each, so it is the most common one overall but never in one row.
+    samples[5:12] = samples[3]
+    samples[3, 9] = samples[5:12, 9] = -samples[0, 9]
+    energies = rng.normal(size=40)
+    energies[0] = -10
+    energies[5:12] = energies[3]
+    occurrences = rng.integers(1, 4, size=40)
+    occurrences[3] = occurrences[5:12] = 1
+    response = dimod.SampleSet.from_samples((samples, variables), dimod.SPIN, energy=energies, num_occurrences=occurrences)
+    outputs = {'Y': (9, 0), 'Z': (2, 0)}
+    analysis = ResultAnalysis(response, outputs)
+
+    assert analysis.num_reads == occurrences.sum()
+    row = analysis.ground_state()
+    assert energies[row] == energies.min()
+    assert analysis.occupancy(3) == sum(n for (sample, n) in zip(samples, occurrences) if np.array_equal(sample, samples[3]))
+    assert analysis.outputs_of(row) == {'Y': samples[row, 9], 'Z': samples[row, 2]}
+    assert analysis.state_of(row) == dict(zip(variables, samples[row]))
+    assert analysis.marginals() == {name: sum(n for (sample, n) in zip(samples, occurrences) if sample[pos[0]] == 1) for (name, pos) in outputs.items()}
+    assert analysis.cell_marginals() == {v: int(occurrences @ (samples[:, k] == 1)) for (k, v) in enumerate(variables)}
+
+    assert row == 0
+    assert analysis.occupancy(analysis.broken_state(row)) == 8
+    assert np.array_equal(samples[analysis.broken_state(row)], samples[3])
@@ -0,0 +1,32 @@
+import numpy as np
+import neal
+
+from circuit_model import CircuitModel
+from session import SamplerSession
+from sweep import sweep
+
+class CountingSampler:
+    '''Stands in for a session's sampler, counting the anneals it is given.'''
+
+    def __init__(self):
+        self.sampler = neal.SimulatedAnnealingSampler()
+        self.calls = 0
+
+    def sample(self, bqm, **kwargs):
+        self.calls += 1
+        return self.sampler.sample(bqm, **kwargs)
+
+def test_batch_splits_per_state(majority):
+    cells, drivers, inputs, outputs = majority
+    model = CircuitModel(cells, drivers, inputs)
+    stub = CountingSampler()
+    with SamplerSession('classical', sampler=stub) as session:
+        results = list(sweep(cells, drivers, inputs, samples=20, seed=1, session=session, batch=True))
+
+    assert stub.calls == 1
+    assert [input_state for (input_state, _, _, _) in results] == list(range(2 ** len(inputs)))
+    for (input_state, response, _, _) in results:
+        (bqm, _, _) = model.assign(input_state)
+        assert set(response.variables) == set(bqm.variables)
+        assert np.allclose(response.record.energy, bqm.energies(response))
+        assert response.record.num_occurrences.sum() == 20
@@ -0,0 +1,41 @@
+import pickle
+
+import numpy as np
+
+from cell_table import CellTable, CellTableBuilder
+
+def node(x, y, cf=0, pol=0.0, rot=False, clock=0, name=None):
+    return {"x": x, "y": y, "cf": cf, "pol": pol, "rot": rot, "clock": clock, "name": name}
+
+def test_reads_like_a_dict_of_nodes():
+    nodes = {(3, 1): node(60.0, 20.0), (1, 1): node(20.0, 20.0, rot=True, clock=2), (5, 0): node(100.0, 0.0, cf=2, name='Y')}
+    cells = CellTable.from_cells(nodes)
+    assert len(cells) == 3
+    assert list(cells) == list(nodes)
+    assert dict(cells) == nodes
+    assert (5, 0) in cells and (0, 0) not in cells
+    assert cells.names == {'Y': 2}
+    assert np.array_equal(cells.positions, [[3, 1], [1, 1], [5, 0]])
+
+def test_builder_replaces_in_place():
+    builder = CellTableBuilder()
+    builder.add((0, 0), 0.0, 0.0, 2, 0.0, False, name='Y')
+    builder.add((1, 0), 20.0, 0.0, 0, 0.0, False)
+    builder.add((0, 0), 0.0, 0.0, 0, 0.0, True, 3)
+    cells = builder.build()
+    # Like assigning into a dict: the first position keeps its row, and the
+    # replaced cell's name goes with it.
+    assert list(cells) == [(0, 0), (1, 0)]
+    assert cells[(0, 0)] == node(0.0, 0.0, rot=True, clock=3)
+    assert cells.names == {}
+
+def test_take_and_pickle():
+    cells = CellTable.from_cells({(k, 0): node(20.0 * k, 0.0, name='Y' if k == 3 else None, cf=2 if k == 3 else 0) for k in range(5)})
+    taken = cells.take(np.array([3, 1]))
+    assert list(taken) == [(3, 0), (1, 0)]
+    assert taken.names == {'Y': 0}
+    assert cells.take(cells.x > 40).names == {'Y': 0}
+
+    restored = pickle.loads(pickle.dumps(cells))
+    assert dict(restored) == dict(cells)
+    assert restored.names == cells.names
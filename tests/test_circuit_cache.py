@@ -0,0 +1,70 @@
+import os
+import shutil
+
+import numpy as np
+
+import circuit_cache
+from circuit_cache import CircuitCache, encode_circuit
+from load_qca import load_qca, parse_qca
+
+def assert_same_circuit(circuit, expected):
+    arrays, expected_arrays = encode_circuit(*circuit), encode_circuit(*expected)
+    assert arrays.keys() == expected_arrays.keys()
+    for name in arrays:
+        assert np.array_equal(arrays[name], expected_arrays[name]), name
+    # The order of the inputs decides which bit of an input state drives each.
+    assert list(circuit[2].items()) == list(expected[2].items())
+
+def copy_design(design_path, tmp_path, name):
+    path = str(tmp_path / 'design.qca')
+    shutil.copy(design_path(name), path)
+    return path
+
+def test_round_trip(design_path, design, tmp_path):
+    cache = CircuitCache(str(tmp_path / 'cache'))
+    path = design_path(design)
+    for ignore_rotated in (False, True):
+        parsed = load_qca(path, ignore_rotated, cache=cache)
+        assert_same_circuit(load_qca(path, ignore_rotated, cache=cache), parsed)
+        assert_same_circuit(parsed, parse_qca(path, ignore_rotated))
+    assert (cache.hits, cache.misses) == (2, 2)
+
+def test_edited_file_is_parsed_again(design_path, tmp_path):
+    cache = CircuitCache(str(tmp_path / 'cache'))
+    path = copy_design(design_path, tmp_path, 'validation/majority/majority.qca')
+    load_qca(path, cache=cache)
+
+    # A newer mtime alone doesn't change the contents, so the cache still holds.
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime + 100, stat.st_mtime + 100))
+    load_qca(path, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # Editing it does.
+    with open(path) as fp:
+        text = fp.read()
+    with open(path, 'w') as fp:
+        fp.write(text.replace('QCAD_CELL_OUTPUT', 'QCAD_CELL_NORMAL', 1))
+    cells, drivers, inputs, outputs = load_qca(path, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert outputs == {}
+
+def test_format_version_change_parses_again(design_path, tmp_path, monkeypatch):
+    cache = CircuitCache(str(tmp_path / 'cache'))
+    path = design_path('validation/majority/majority.qca')
+    load_qca(path, cache=cache)
+    monkeypatch.setattr(circuit_cache, 'FORMAT_VERSION', circuit_cache.FORMAT_VERSION + 1)
+    assert_same_circuit(load_qca(path, cache=cache), parse_qca(path))
+    assert (cache.hits, cache.misses) == (0, 2)
+    load_qca(path, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 2)
+
+def test_unreadable_entry_is_parsed_again(design_path, tmp_path):
+    cache = CircuitCache(str(tmp_path / 'cache'))
+    path = design_path('validation/majority/majority.qca')
+    key = cache.key(path, False, 20)
+    os.makedirs(cache.directory)
+    with open(cache._path(key), 'w') as fp:
+        fp.write('not an npz file')
+    assert_same_circuit(load_qca(path, cache=cache), parse_qca(path))
+    assert cache.misses == 1
@@ -0,0 +1,19 @@
+import numpy as np
+
+from load_qca import assign_inputs
+from qca_on_qpu import construct_bqm
+from circuit_model import CircuitModel
+
+def test_assign_matches_construct_bqm(load_design, design):
+    cells, drivers, inputs, outputs = load_design(design)
+    model = CircuitModel(cells, drivers, inputs)
+    # Visit every state twice, so that each is rewritten over another's biases.
+    states = list(range(2 ** len(inputs)))
+    for input_state in states + states[::-1]:
+        (bqm, all_drivers, state_name) = model.assign(input_state)
+        reference = construct_bqm(cells, all_drivers)
+        assert (all_drivers, state_name) == assign_inputs(drivers, inputs, input_state)
+        assert set(bqm.variables) == set(reference.variables)
+        assert all(np.isclose(bqm.linear[v], bias) for (v, bias) in reference.linear.items())
+        assert all(np.isclose(bqm.get_quadratic(u, v), bias) for ((u, v), bias) in reference.quadratic.items())
+        assert bqm.num_interactions == reference.num_interactions
@@ -0,0 +1,12 @@
+from clocking import sweep_clocked
+from utils import extract_polarization
+
+def test_sparse_xor_truth_table(load_design):
+    cells, drivers, inputs, outputs = load_design('sparse XOR/clocked/design.qca')
+    results = list(sweep_clocked(cells, drivers, inputs, samples=100, seed=1))
+    assert [input_state for (input_state, _, _, _) in results] == list(range(2 ** len(inputs)))
+    for (input_state, result, _, _) in results:
+        (a, b) = (extract_polarization(input_state, k) for k in range(2))
+        assert result.settled
+        # Y is +1 exactly when the inputs differ.
+        assert result.state[outputs['Y']] == -a * b
@@ -0,0 +1,24 @@
+from load_qca import assign_inputs
+from qca_on_qpu import construct_bqm, construct_bqm_arrays
+import synthetic
+
+def assert_same_bqm(cells, drivers):
+    bqm = construct_bqm(cells, drivers)
+    array_bqm, positions = construct_bqm_arrays(cells, drivers)
+    array_bqm.relabel_variables({k: tuple(pos) for (k, pos) in enumerate(positions.tolist())})
+    assert dict(array_bqm.linear) == dict(bqm.linear)
+    # Either end of a coupling may come first.
+    assert {frozenset(uv): bias for (uv, bias) in array_bqm.quadratic.items()} == {frozenset(uv): bias for (uv, bias) in bqm.quadratic.items()}
+    assert array_bqm.offset == bqm.offset
+
+def test_arrays_match_construct_bqm(load_design, design):
+    cells, drivers, inputs, outputs = load_design(design)
+    for input_state in range(2 ** len(inputs)):
+        (all_drivers, _) = assign_inputs(drivers, inputs, input_state)
+        assert_same_bqm(cells, all_drivers)
+
+def test_arrays_match_construct_bqm_on_synthetic():
+    for layout in (synthetic.wire(50), synthetic.wire(50, rot=True), synthetic.grid(100), synthetic.majority_grid(2)):
+        cells, drivers, inputs, outputs = layout
+        (all_drivers, _) = assign_inputs(drivers, inputs, 1)
+        assert_same_bqm(cells, all_drivers)
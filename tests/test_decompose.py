@@ -0,0 +1,32 @@
+import numpy as np
+
+from load_qca import assign_inputs
+from qca_on_qpu import construct_bqm
+from circuit_model import CircuitModel
+from session import SamplerSession
+from exact import EliminationSolver
+from analysis import ResultAnalysis
+import synthetic
+
+def test_matches_exact_on_sparse_xor(load_design):
+    # Parts of 10 cells cut this design where a single descent stops in a
+    # local minimum with the wrong outputs for two of its input states.
+    cells, drivers, inputs, outputs = load_design('sparse XOR/unclocked/design.qca')
+    model = CircuitModel(cells, drivers, inputs)
+    with SamplerSession('classical', max_part_size=10) as session:
+        for input_state in range(2 ** len(inputs)):
+            (bqm, _, _) = model.assign(input_state)
+            response = session.decomposer.sample(bqm, num_reads=50, seed=1)
+            exact = EliminationSolver().sample(bqm)
+            assert response.info['num_parts'] > 1
+            assert np.isclose(response.first.energy, exact.first.energy)
+            assert ResultAnalysis(response, outputs).outputs_of(0) == ResultAnalysis(exact, outputs).outputs_of(0)
+
+def test_long_wire():
+    cells, drivers, inputs, outputs = synthetic.wire(300)
+    (all_drivers, _) = assign_inputs(drivers, inputs, 1)
+    bqm = construct_bqm(cells, all_drivers)
+    with SamplerSession('classical', max_part_size=60) as session:
+        response = session.decomposer.sample(bqm, num_reads=20, seed=1)
+    assert np.isclose(response.first.energy, EliminationSolver().sample(bqm).first.energy)
+    assert ResultAnalysis(response, outputs).outputs_of(0) == {'Y': 1}
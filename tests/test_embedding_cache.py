@@ -0,0 +1,37 @@
+import dwave_networkx as dnx
+from dwave.system.testing import MockDWaveSampler
+
+from circuit_model import CircuitModel
+from embedding_cache import EmbeddingCache
+
+def majority_bqm(majority, input_state=0):
+    cells, drivers, inputs, outputs = majority
+    (bqm, _, _) = CircuitModel(cells, drivers, inputs).assign(input_state)
+    return bqm
+
+def test_miss_hit_and_reload(majority, tmp_path):
+    target = dnx.pegasus_graph(6)
+    bqm = majority_bqm(majority)
+
+    cache = EmbeddingCache(directory=str(tmp_path), verbose=False)
+    embedding = cache.get(bqm, target, random_seed=1)
+    assert (cache.hits, cache.misses) == (0, 1)
+    assert set(embedding) == set(bqm.variables)
+
+    # Another input state has the same graph, so the same embedding.
+    assert cache.get(majority_bqm(majority, 5), target) == embedding
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    reloaded = EmbeddingCache(directory=str(tmp_path), verbose=False)
+    assert reloaded.get(bqm, target) == embedding
+    assert (reloaded.hits, reloaded.misses) == (1, 0)
+
+def test_sampler_on_mock_qpu(majority, tmp_path):
+    mock = MockDWaveSampler(topology_type='pegasus', topology_shape=[6])
+    bqm = majority_bqm(majority)
+    cache = EmbeddingCache(directory=str(tmp_path), verbose=False)
+    response = cache.sampler(bqm, mock).sample(bqm, num_reads=10)
+    assert set(response.variables) == set(bqm.variables)
+    # The mock's nodes are pegasus_graph(6)'s, so the graph shares its key.
+    cache.get(bqm, dnx.pegasus_graph(6))
+    assert (cache.hits, cache.misses) == (1, 1)
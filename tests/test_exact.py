@@ -0,0 +1,47 @@
+import numpy as np
+import dimod
+import pytest
+
+from circuit_model import CircuitModel
+from exact import EliminationSolver, elimination_order, TOLERANCE
+
+def assert_matches_exact_solver(bqm):
+    response = EliminationSolver().sample(bqm)
+    reference = dimod.ExactSolver().sample(bqm)
+    ground = reference.first.energy
+    assert np.isclose(response.first.energy, ground)
+    assert np.isclose(bqm.energy(response.first.sample), ground)
+    assert response.info['degeneracy'] == np.count_nonzero(np.abs(reference.record.energy - ground) < TOLERANCE)
+
+def test_random_bqms():
+    rng = np.random.default_rng(1)
+    for n in range(1, 11):
+        # Biases of whole units give many degenerate ground states.
+        linear = {v: float(rng.integers(-1, 2)) for v in range(n)}
+        quadratic = {(u, v): float(rng.integers(-1, 2)) for u in range(n) for v in range(u + 1, n) if rng.random() < 0.4}
+        assert_matches_exact_solver(dimod.BinaryQuadraticModel(linear, quadratic, 0.5, dimod.SPIN))
+
+def test_crossovers(load_design):
+    # Rotated and normal cells don't interact, so the crossings with a rotated
+    # wire have more than one ground state in every input state.
+    degeneracies = {'crossovers/1 cell crossover.qca': 1, 'crossovers/A (rot) B (normal) single crossing.qca': 2,
+                    'crossovers/normal rot.qca': 4}
+    for (design, degeneracy) in degeneracies.items():
+        cells, drivers, inputs, outputs = load_design(design)
+        model = CircuitModel(cells, drivers, inputs)
+        for input_state in range(2 ** len(inputs)):
+            (bqm, _, _) = model.assign(input_state)
+            assert_matches_exact_solver(bqm)
+            assert EliminationSolver().sample(bqm).info['degeneracy'] == degeneracy
+
+def test_elimination_order_of_a_path():
+    neighbours = [{1}, {0, 2}, {1, 3}, {2}]
+    order, width = elimination_order(neighbours)
+    assert sorted(order) == [0, 1, 2, 3]
+    assert width == 1
+
+def test_too_wide():
+    bqm = dimod.generators.randint(6, dimod.SPIN, seed=1)
+    with pytest.raises(ValueError, match='elimination width 5'):
+        EliminationSolver(max_width=4).sample(bqm)
+    assert_matches_exact_solver(bqm)
@@ -0,0 +1,43 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from circuit_model import CircuitModel
+from exact import EliminationSolver
+import metropolis
+from metropolis import MetropolisSampler, colour_classes
+import synthetic
+from load_qca import assign_inputs
+from qca_on_qpu import construct_bqm
+
+def test_colour_classes_are_independent(load_design):
+    cells, drivers, inputs, outputs = load_design('dense XOR/unclocked/design.qca')
+    (bqm, _, _) = CircuitModel(cells, drivers, inputs).assign(0)
+    _, (row, col, _), _ = bqm.to_numpy_vectors()
+    n = bqm.num_variables
+    graph = csr_matrix((np.ones(2 * len(row)), (np.concatenate([row, col]), np.concatenate([col, row]))), shape=(n, n))
+    colours = np.asarray(colour_classes(graph.indptr, graph.indices))
+    assert np.all(colours[row] != colours[col])
+
+def test_finds_ground_states(load_design, design):
+    cells, drivers, inputs, outputs = load_design(design)
+    model = CircuitModel(cells, drivers, inputs)
+    for input_state in range(2 ** len(inputs)):
+        (bqm, _, _) = model.assign(input_state)
+        response = MetropolisSampler().sample(bqm, num_reads=50, seed=1)
+        assert response.record.sample.shape == (50, bqm.num_variables)
+        assert np.allclose(response.record.energy, bqm.energies(response))
+        assert np.isclose(response.first.energy, EliminationSolver().sample(bqm).first.energy)
+
+def test_seeded_and_batched(monkeypatch):
+    cells, drivers, inputs, outputs = synthetic.wire(40)
+    (all_drivers, _) = assign_inputs(drivers, inputs, 1)
+    bqm = construct_bqm(cells, all_drivers)
+    first = MetropolisSampler().sample(bqm, num_reads=30, seed=3, num_sweeps=200)
+    again = MetropolisSampler().sample(bqm, num_reads=30, seed=3, num_sweeps=200)
+    assert np.array_equal(first.record.sample, again.record.sample)
+    # Reads annealed in several batches are as good as reads annealed in one.
+    monkeypatch.setattr(metropolis, 'BATCH_SPINS', 40 * 7)
+    batched = MetropolisSampler().sample(bqm, num_reads=30, seed=3, num_sweeps=200)
+    assert len(batched) == 30
+    assert np.allclose(batched.record.energy, bqm.energies(batched))
+    assert np.isclose(batched.first.energy, EliminationSolver().sample(bqm).first.energy)
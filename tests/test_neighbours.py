@@ -0,0 +1,35 @@
+import numpy as np
+
+from neighbours import NeighbourIndex, neighbour_pairs, is_axial, is_diagonal
+
+def scattered_cells(seed=1, n=300, side=25):
+    # Distinct grid positions in no particular order, with gaps between them.
+    rng = np.random.default_rng(seed)
+    flat = rng.choice(side * side, size=n, replace=False)
+    return [(int(k % side) - 3, int(k // side) - 7) for k in flat]
+
+def pairwise_scan(positions, radius=2):
+    # Every (i, j > i) pair at an axial or diagonal offset within `radius`.
+    pairs = []
+    for (i, pos_i) in enumerate(positions):
+        for j in range(i + 1, len(positions)):
+            offset = (positions[j][0] - pos_i[0], positions[j][1] - pos_i[1])
+            r = np.linalg.norm(np.array(offset))
+            if (is_axial(offset) or is_diagonal(offset)) and r <= radius + 1e-9:
+                pairs.append((pos_i, positions[j], offset, r))
+    return pairs
+
+def test_index_matches_pairwise_scan():
+    positions = scattered_cells()
+    assert list(NeighbourIndex(positions).pairs(2)) == pairwise_scan(positions)
+
+def test_arrays_match_pairwise_scan():
+    positions = scattered_cells(seed=2)
+    i, j, offsets, r = neighbour_pairs(np.array(positions), 2)
+    found = {(positions[a], positions[b], tuple(offset), d) for (a, b, offset, d) in zip(i.tolist(), j.tolist(), offsets.tolist(), r.tolist())}
+    assert len(found) == len(i)
+    assert found == set(pairwise_scan(positions))
+
+def test_no_cells():
+    assert list(NeighbourIndex([]).pairs(2)) == []
+    assert len(neighbour_pairs(np.zeros((0, 2)), 2)[0]) == 0
@@ -0,0 +1,38 @@
+import numpy as np
+
+from packed import PackedSamples
+
+def random_spins(seed=1, reads=200, cells=19):
+    # A few distinct rows, repeated, over a width that doesn't fill its last byte.
+    rng = np.random.default_rng(seed)
+    rows = rng.choice([-1, 1], size=(12, cells)).astype(np.int8)
+    return rows[rng.integers(0, len(rows), size=reads)]
+
+def test_round_trip():
+    spins = random_spins()
+    packed = PackedSamples.from_spins(spins)
+    assert packed.bits.shape == (200, 3)
+    assert np.array_equal(packed.spins(), spins)
+    assert np.array_equal(packed.columns([0, 7, 8, 18]), spins[:, [0, 7, 8, 18]])
+    assert packed[5:9] == PackedSamples.from_spins(spins[5:9])
+    assert packed != PackedSamples.from_spins(-spins)
+
+def test_equal_to():
+    spins = random_spins()
+    packed = PackedSamples.from_spins(spins)
+    for row in (0, 17, 199):
+        assert np.array_equal(packed.equal_to(row), np.all(spins == spins[row], axis=1))
+
+def test_unique():
+    spins = random_spins()
+    first, inverse = PackedSamples.from_spins(spins).unique()
+    assert len(first) == len(np.unique(spins, axis=0))
+    # Every read maps to a distinct sample identical to it.
+    assert np.array_equal(spins[first][inverse], spins)
+
+def test_weighted_popcount():
+    spins = random_spins()
+    weights = np.random.default_rng(2).integers(1, 10, size=len(spins))
+    packed = PackedSamples.from_spins(spins)
+    assert np.array_equal(packed.popcount(weights), weights @ (spins == 1))
+    assert np.array_equal(packed.popcount(), (spins == 1).sum(axis=0))
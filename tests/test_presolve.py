@@ -0,0 +1,36 @@
+import numpy as np
+
+from analysis import ResultAnalysis
+from circuit_model import CircuitModel
+from exact import EliminationSolver
+from presolve import Presolve
+
+def test_keeps_ground_energy(load_design, design):
+    cells, drivers, inputs, outputs = load_design(design)
+    model = CircuitModel(cells, drivers, inputs)
+    for input_state in range(2 ** len(inputs)):
+        (bqm, _, _) = model.assign(input_state)
+        ground = EliminationSolver().sample(bqm).first.energy
+        presolved = Presolve(bqm, seed=1)
+        # The reduced BQM is solved exactly, so its ground state must expand to one of the original's.
+        reduced = EliminationSolver().sample(presolved.bqm)
+        assert np.isclose(reduced.first.energy, ground)
+        expanded = presolved.expand(reduced)
+        assert set(expanded.variables) == set(bqm.variables)
+        assert np.allclose(expanded.record.energy, bqm.energies(expanded))
+        assert np.isclose(expanded.first.energy, ground)
+
+def test_settled_circuit(majority):
+    # Every cell of the majority gate is settled by presolving, so its
+    # outputs come from expanding an empty sample.
+    cells, drivers, inputs, outputs = majority
+    model = CircuitModel(cells, drivers, inputs)
+    for input_state in range(2 ** len(inputs)):
+        (bqm, _, _) = model.assign(input_state)
+        presolved = Presolve(bqm, seed=1)
+        assert presolved.bqm.num_variables == 0
+        expanded = presolved.expand(presolved.empty_response(10))
+        exact = EliminationSolver().sample(bqm)
+        assert len(expanded) == 10
+        assert np.allclose(expanded.record.energy, exact.first.energy)
+        assert ResultAnalysis(expanded, outputs).outputs_of(0) == ResultAnalysis(exact, outputs).outputs_of(0)
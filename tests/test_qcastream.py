@@ -0,0 +1,50 @@
+import re
+
+import pytest
+
+from qcastream import iter_cells, iter_cells_from_lines
+from qcadtrans import QCACircuit
+
+def circuit_cells(path):
+    # The cells QCACircuit extracts through its ParserNode tree, in file order.
+    circuit = QCACircuit(fname=path, verbose=False)
+    return [(d['x'], d['y'], d['cf'], d['pol'], d['rot'], list(d['dots']), d['name']) for (_, d) in circuit.nodes(data=True)]
+
+def streamed_cells(records):
+    return [(r.x, r.y, r.cf, r.pol, r.rot, [tuple(dot) for dot in r.dots], r.name) for r in records]
+
+def test_matches_qcacircuit(design_path, design):
+    path = design_path(design)
+    expected = circuit_cells(path)
+    assert streamed_cells(iter_cells(path)) == expected
+    # Small chunks cut cells, lines and values at every point.
+    assert streamed_cells(iter_cells(path, chunk_size=37)) == expected
+    with open(path) as fp:
+        assert streamed_cells(iter_cells_from_lines(fp)) == expected
+
+def test_unusual_layout(design_path, tmp_path):
+    # Cells with their design object after their own values don't match the
+    # whole-cell regex, so they are read by the line scanner instead.
+    path = design_path('validation/majority/majority.qca')
+    with open(path) as fp:
+        text = fp.read()
+    moved = re.sub(r'(\[TYPE:QCADCell\]\n)(\[TYPE:QCADDesignObject\]\n.*?\[#TYPE:QCADDesignObject\]\n)(cell_options[^\[]*)',
+                   r'\1\3\2', text, flags=re.S)
+    assert moved != text
+    unusual = tmp_path / 'unusual.qca'
+    unusual.write_text(moved)
+
+    expected = list(iter_cells(path))
+    assert list(iter_cells(str(unusual))) == expected
+    assert list(iter_cells(str(unusual), chunk_size=37)) == expected
+
+def test_malformed(tmp_path):
+    no_design = tmp_path / 'no_design.qca'
+    no_design.write_text('[VERSION]\nqcadesigner_version=2.000000\n[#VERSION]\n')
+    with pytest.raises(AssertionError, match='Invalid QCADesigner file format'):
+        list(iter_cells(str(no_design)))
+
+    no_cells = tmp_path / 'no_cells.qca'
+    no_cells.write_text('[TYPE:DESIGN]\n[TYPE:QCADLayer]\ntype=1\n[#TYPE:QCADLayer]\n[#TYPE:DESIGN]\n')
+    with pytest.raises(AssertionError, match='Empty QCADesigner file'):
+        list(iter_cells(str(no_cells)))
@@ -0,0 +1,21 @@
+from dwave.system.testing import MockDWaveSampler
+
+from embedding_cache import EmbeddingCache
+from session import SamplerSession
+from sweep import sweep
+
+def test_embedding_reused_across_input_states(majority, tmp_path):
+    cells, drivers, inputs, outputs = majority
+    embeddings = EmbeddingCache(directory=str(tmp_path), verbose=False)
+    mock = MockDWaveSampler(topology_type='pegasus', topology_shape=[6])
+    with SamplerSession('pegasus', sampler=mock, embeddings=embeddings) as session:
+        results = list(sweep(cells, drivers, inputs, samples=10, seed=1, session=session))
+    assert len(results) == 2 ** len(inputs)
+    assert (embeddings.misses, embeddings.hits) == (1, 2 ** len(inputs) - 1)
+
+def test_exact_ignores_presolve(majority):
+    cells, drivers, inputs, outputs = majority
+    with SamplerSession('exact', presolve=True) as session:
+        assert not session.presolve
+        for (_, response, _, _) in sweep(cells, drivers, inputs, samples=200, session=session):
+            assert len(response) == 1 and 'degeneracy' in response.info
@@ -0,0 +1,36 @@
+import numpy as np
+
+from sweep import sweep, state_seed, gray_code
+
+def test_state_seeds():
+    seeds = [state_seed(1, input_state) for input_state in range(8)]
+    assert len(set(seeds)) == 8
+    assert all(0 <= seed < 2 ** 31 for seed in seeds)
+    assert seeds == [state_seed(1, input_state) for input_state in range(8)]
+    # Keys ending in 0 must not share the seed of the keys before them.
+    assert len({state_seed(1, 3), state_seed(1, 3, 0), state_seed(1, 3, 0, 0)}) == 3
+    assert state_seed(None, 3) is None
+
+def test_seeded_sweep_is_the_same_over_any_jobs(majority):
+    cells, drivers, inputs, outputs = majority
+    serial = list(sweep(cells, drivers, inputs, samples=30, seed=7))
+    parallel = list(sweep(cells, drivers, inputs, samples=30, seed=7, jobs=2))
+    assert [input_state for (input_state, _, _, _) in parallel] == list(range(2 ** len(inputs)))
+    for ((state, response, _, name), (parallel_state, parallel_response, _, parallel_name)) in zip(serial, parallel):
+        assert (state, name) == (parallel_state, parallel_name)
+        assert list(response.variables) == list(parallel_response.variables)
+        assert np.array_equal(response.record.sample, parallel_response.record.sample)
+        assert np.array_equal(response.record.num_occurrences, parallel_response.record.num_occurrences)
+
+def test_gray_code():
+    for num_inputs in range(5):
+        order = gray_code(num_inputs)
+        assert sorted(order) == list(range(2 ** num_inputs))
+        assert all(bin(a ^ b).count('1') == 1 for (a, b) in zip(order, order[1:]))
+
+def test_warm_start_visits_gray_code_order(majority):
+    cells, drivers, inputs, outputs = majority
+    results = list(sweep(cells, drivers, inputs, samples=20, seed=1, warm_start=True))
+    assert [input_state for (input_state, _, _, _) in results] == gray_code(len(inputs))
+    for (input_state, response, _, _) in results:
+        assert response.record.num_occurrences.sum() == 20
@@ -0,0 +1,38 @@
+import numpy as np
+import dimod
+
+from circuit_model import CircuitModel
+from symmetry import find_symmetries, image_state, representatives, mirror_response
+from sweep import sweep
+
+def test_mirrored_energies(load_design, design):
+    cells, drivers, inputs, outputs = load_design(design)
+    model = CircuitModel(cells, drivers, inputs)
+    rng = np.random.default_rng(1)
+    for symmetry in find_symmetries(model):
+        for input_state in range(2 ** len(inputs)):
+            (bqm, _, _) = model.assign(input_state)
+            samples = rng.choice([-1, 1], size=(20, bqm.num_variables)).astype(np.int8)
+            response = dimod.SampleSet.from_samples_bqm((samples, list(bqm.variables)), bqm)
+            mirrored = mirror_response(response, symmetry)
+            (image, _, _) = model.assign(image_state(symmetry, input_state))
+            assert np.allclose(mirrored.record.energy, image.energies(mirrored))
+
+def test_majority_samples_three_states(majority):
+    cells, drivers, inputs, outputs = majority
+    model = CircuitModel(cells, drivers, inputs)
+    source = representatives(find_symmetries(model), 2 ** len(inputs))
+    assert sum(state_source is None for state_source in source) == 3
+
+    # Mirrored states report the outputs of a majority gate.
+    for (input_state, response, _, _) in sweep(cells, drivers, inputs, samples=50, seed=1, symmetry=True):
+        (bqm, _, _) = model.assign(input_state)
+        assert np.allclose(response.record.energy, bqm.energies(response))
+        votes = sum(model.input_polarizations(input_state))
+        assert response.first.sample[outputs['Y']] == np.sign(votes)
+
+def test_fixed_driver_has_no_flip(load_design):
+    # The sparse XOR's FIXED_T cells hold their polarization whatever the inputs.
+    cells, drivers, inputs, outputs = load_design('sparse XOR/unclocked/design.qca')
+    assert drivers
+    assert all(symmetry.sign == 1 for symmetry in find_symmetries(CircuitModel(cells, drivers, inputs)))
@@ -0,0 +1,26 @@
+import numpy as np
+import dimod
+
+from tempering import TemperingSampler
+
+def unsorted_chain():
+    # A weakly coupled chain whose cells are pulled to alternating signs, so
+    # that its ground state is not symmetric under relabelling, with labels
+    # inserted far from sorted order.
+    labels = [(5, 0), (1, 0), (9, 0), (0, 0), (7, 0), (3, 0)]
+    linear = {v: (-1) ** k * (1 + 0.1 * k) for (k, v) in enumerate(labels)}
+    quadratic = {(u, v): 0.2 for (u, v) in zip(labels, labels[1:])}
+    return dimod.BinaryQuadraticModel(linear, quadratic, 0, dimod.SPIN)
+
+def test_labels_match_energies():
+    bqm = unsorted_chain()
+    for jobs in (1, 2):
+        response = TemperingSampler(jobs=jobs).sample(bqm, num_reads=4, seed=1, num_sweeps=50)
+        assert np.allclose(response.record.energy, bqm.energies(response))
+
+def test_ground_state_by_label():
+    bqm = unsorted_chain()
+    response = TemperingSampler(jobs=2).sample(bqm, num_reads=4, seed=1, num_sweeps=50)
+    ground = dimod.ExactSolver().sample(bqm).first
+    assert np.isclose(response.first.energy, ground.energy)
+    assert response.first.sample == ground.sample